@@ -1,54 +1,36 @@
 import streamlit as st
 import os
 import time
-import json
 
-from core.loader import load_and_split_document
-from core.embedder import add_to_vector_db, get_all_notebooks, delete_notebook, delete_file_from_notebook, get_notebook_stats, get_total_db_size
-from core.generator import query_rag_system
-from core.summarizer import generate_notebook_summary
+from core.embedder import get_all_notebooks, delete_notebook, delete_file_from_notebook, get_notebook_stats, get_total_db_size, get_source_index
+from core.jobs import submit_batch_ingest_job, duplicate_filenames, get_job, new_upload_path
+from core.generator import stream_rag_system
+from core.summarizer import summarize_notebook
+from core import chat_store
+from core import llm_pool
 
+# Longest the upload panel waits on an ingestion batch before leaving it to run in the background
+INGEST_WAIT_TIMEOUT_S = int(os.getenv("EASYRESEARCH_INGEST_WAIT_TIMEOUT", "1800"))
 
 # ---------------------------------------------------------
 # Helper: persistent chat history per workspace
 # ---------------------------------------------------------
-CHAT_DIR = "database/chat_history"
-os.makedirs(CHAT_DIR, exist_ok=True)
-
-
-def _chat_path(notebook_name):
-    return os.path.join(CHAT_DIR, f"{notebook_name}.json")
-
-
-def save_chat(notebook_name, messages):
-    """Save full conversation to disk."""
-    with open(_chat_path(notebook_name), "w", encoding="utf-8") as f:
-        json.dump(messages, f, ensure_ascii=False, indent=2)
-
+# Messages are appended to core/chat_store.py as they happen; only the tail
+# of a conversation is loaded.
 
 def load_chat(notebook_name):
-    """Load full conversation from disk (or return None)."""
-    path = _chat_path(notebook_name)
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return None
+    """Load the recent conversation from disk (or return None)."""
+    return chat_store.load_messages(notebook_name)
 
 
 def delete_chat(notebook_name):
     """Delete saved conversation."""
-    path = _chat_path(notebook_name)
-    if os.path.exists(path):
-        os.remove(path)
+    chat_store.clear(notebook_name)
 
 
 def get_recent_questions(notebook_name, limit=5):
-    """Extract recent user questions from saved chat."""
-    msgs = load_chat(notebook_name)
-    if not msgs:
-        return []
-    questions = [m["content"] for m in msgs if m["role"] == "user"]
-    return questions[-limit:][::-1]  # newest first
+    """Recent user questions of a workspace, newest first."""
+    return chat_store.recent_questions(notebook_name, limit)
 
 
 # ---------------------------------------------------------
@@ -556,38 +538,58 @@ with st.sidebar:
 
         if process_btn and uploaded_files:
             progress_bar = st.progress(0, text="Processing…")
-            for i, uploaded_file in enumerate(uploaded_files):
-                temp_path = f"uploads/{uploaded_file.name}"
+
+            # Queue the files as one parallel ingestion batch, then poll per-file progress
+            # File names become the chunk `source`, so keep only the first file of each name
+            unique_files = {}
+            for uploaded_file in uploaded_files:
+                unique_files.setdefault(uploaded_file.name, uploaded_file)
+            if len(unique_files) < len(uploaded_files):
+                st.warning(f"Skipped duplicate file name(s): {', '.join(duplicate_filenames(f.name for f in uploaded_files))}")
+
+            temp_paths = []
+            for uploaded_file in unique_files.values():
+                temp_path = new_upload_path(uploaded_file.name)
                 with open(temp_path, "wb") as f:
                     f.write(uploaded_file.getbuffer())
+                temp_paths.append(temp_path)
+            job_ids = submit_batch_ingest_job(temp_paths, final_notebook_name)
+
+            deadline = time.monotonic() + INGEST_WAIT_TIMEOUT_S
+            while True:
+                jobs = [get_job(job_id) for job_id in job_ids]
+                jobs = [j or {"filename": "?", "status": "failed", "error": "Job not found", "progress": 1.0,
+                              "chunks_embedded": 0} for j in jobs]
+                finished = [j for j in jobs if j["status"] in ("done", "failed")]
+                overall = sum(j["progress"] for j in jobs) / len(jobs)
+                embedded = sum(j["chunks_embedded"] for j in jobs)
+                progress_bar.progress(
+                    min(overall, 1.0),
+                    text=f"Processing… {len(finished)}/{len(jobs)} files · {embedded} chunks embedded",
+                )
+                if len(finished) == len(jobs):
+                    break
+                if time.monotonic() > deadline:
+                    st.warning("Still processing in the background — check back in a moment.")
+                    break
+                time.sleep(0.5)
 
-                try:
-                    chunks = load_and_split_document(temp_path)
-                    add_to_vector_db(chunks, collection_name=final_notebook_name)
-
-                    if "all_chunks" not in st.session_state:
-                        st.session_state.all_chunks = []
-                    st.session_state.all_chunks.extend(chunks)
-
-                    os.remove(temp_path)
-                except Exception as e:
-                    st.error(f"Error: {e}")
-
-                progress_bar.progress((i + 1) / len(uploaded_files))
+            for job in jobs:
+                if job["status"] == "failed":
+                    st.error(f"Error ({job['filename']}): {job['error']}")
 
             # Auto summary
             progress_bar.progress(1.0, text="Generating summary…")
             try:
-                if "all_chunks" in st.session_state and st.session_state.all_chunks:
-                    summary = generate_notebook_summary(
-                        st.session_state.all_chunks,
+                if any(j["status"] == "done" for j in jobs):
+                    summary = summarize_notebook(
+                        final_notebook_name,
                         api_key=st.session_state.get("user_api_key", ""),
                         llm_provider=st.session_state.get("llm_provider", "groq"),
                     )
                     summary_path = f"database/chroma_db/{final_notebook_name}_summary.txt"
                     with open(summary_path, "w", encoding="utf-8") as f:
                         f.write(summary)
-                    st.session_state.all_chunks = []
             except Exception:
                 pass
 
@@ -604,13 +606,14 @@ with st.sidebar:
 
         # File list
         if selected_option != "➕ New workspace…":
-            _stats = get_notebook_stats(final_notebook_name)
-            if _stats["files"]:
-                with st.expander(f"📁 Files ({len(_stats['files'])})", expanded=False):
-                    for i, fname in enumerate(_stats["files"], 1):
+            _sources = get_source_index(final_notebook_name)
+            if _sources:
+                with st.expander(f"📁 Files ({len(_sources)})", expanded=False):
+                    for i, source in enumerate(_sources, 1):
+                        fname = source["source"]
                         col_name, col_del = st.columns([0.85, 0.15])
                         display_name = fname if len(fname) <= 30 else fname[:27] + "…"
-                        col_name.caption(f"{i}. {display_name}")
+                        col_name.caption(f"{i}. {display_name} · {source['chunk_count'] or 0} chunks")
                         if col_del.button("✕", key=f"del_file_{hash(fname)}", help=f"Delete {fname}"):
                             deleted = delete_file_from_notebook(final_notebook_name, fname)
                             if deleted:
@@ -625,20 +628,25 @@ with st.sidebar:
                     display = q if len(q) <= 35 else q[:35] + "…"
                     if st.button(display, key=f"hist_{hash(q)}", use_container_width=True):
                         st.session_state.messages.append({"role": "user", "content": q})
+                        chat_store.append_message(final_notebook_name, "user", q)
                         st.rerun()
     with tab_cfg:
         # LLM Provider
         llm_provider = st.selectbox(
             "LLM Provider",
-            ["Groq (LLaMA 3.3 70B)", "Google Gemini"],
+            ["Groq (LLaMA 3.3 70B)", "Google Gemini", "Local (offline)"],
         )
 
         if "Groq" in llm_provider:
             user_key = st.text_input("API Key", type="password", placeholder="gsk_…")
             st.session_state.llm_provider = "groq"
-        else:
+        elif "Gemini" in llm_provider:
             user_key = st.text_input("API Key", type="password", placeholder="AIza…")
             st.session_state.llm_provider = "gemini"
+        else:
+            user_key = ""
+            st.session_state.llm_provider = "local"
+            st.caption(f"🖥️ {llm_pool.describe_provider('local')}")
 
         st.session_state.user_api_key = user_key
 
@@ -686,8 +694,7 @@ if "current_notebook" not in st.session_state:
     saved = load_chat(final_notebook_name)
     st.session_state.messages = saved if saved else list(_default_welcome)
 elif st.session_state.current_notebook != final_notebook_name:
-    # Workspace switched — save old, load new
-    save_chat(st.session_state.current_notebook, st.session_state.messages)
+    # Workspace switched — every turn is already saved, just load the new one
     saved = load_chat(final_notebook_name)
     st.session_state.messages = saved if saved else [
         {
@@ -728,6 +735,7 @@ search_k = SEARCH_MODES[selected_mode]
 
 if prompt:
     st.session_state.messages.append({"role": "user", "content": prompt})
+    chat_store.append_message(final_notebook_name, "user", prompt)
     with st.chat_message("user", avatar="👤"):
         st.markdown(prompt)
 
@@ -735,51 +743,52 @@ if prompt:
         message_placeholder = st.empty()
         full_response = ""
 
-        with st.spinner("Searching documents…"):
-            try:
-                result = query_rag_system(
-                    prompt,
-                    collection_name=final_notebook_name,
-                    chat_history=st.session_state.messages,
-                    k_target=search_k,
-                    user_api_key=user_key,
-                    llm_provider=st.session_state.get("llm_provider", "groq"),
-                )
-
-                answer = result["answer"]
-                sources = result["sources"]
-                standalone_q = result.get("standalone_question")
-                pipeline_info = result.get("pipeline_info", {})
-
-                # Typing effect
-                words = answer.split()
-                for i, word in enumerate(words):
-                    full_response += word + " "
-                    if i % 3 == 0:
-                        message_placeholder.markdown(full_response + "▌")
-                        time.sleep(0.02)
-
-                message_placeholder.markdown(full_response)
-
-                if standalone_q:
-                    st.caption(f'🔍 Interpreted as: "{standalone_q}"')
-
-                if sources:
-                    with st.expander(f"📚 Sources ({len(sources)})", expanded=False):
-                        for i, src in enumerate(sources, 1):
-                            st.markdown(f"{i}. `{src}`")
-
-                if pipeline_info:
-                    with st.expander("🔬 Pipeline info", expanded=False):
-                        cols = st.columns(3)
-                        cols[0].metric("Retrieved", pipeline_info.get("total_retrieved", 0))
-                        cols[1].metric("Used", pipeline_info.get("final_docs", 0))
-                        cols[2].metric("Context", "✅" if pipeline_info.get("contextualized") else "—")
-
-            except Exception as e:
-                st.error(f"Error: {str(e)}")
-                full_response = "An error occurred. Please try again."
-                message_placeholder.markdown(full_response)
+        try:
+            stream = stream_rag_system(
+                prompt,
+                collection_name=final_notebook_name,
+                chat_history=st.session_state.messages,
+                k_target=search_k,
+                user_api_key=user_key,
+                llm_provider=st.session_state.get("llm_provider", "groq"),
+            )
+
+            # Retrieval metadata arrives first; tokens follow as the LLM produces them
+            with st.spinner("Searching documents…"):
+                result = next(stream)
+
+            for event in stream:
+                if event["type"] == "token":
+                    full_response += event["content"]
+                    message_placeholder.markdown(full_response + "▌")
+                elif event["type"] == "done":
+                    full_response = event["answer"]
+
+            message_placeholder.markdown(full_response)
+
+            sources = result["sources"]
+            standalone_q = result.get("standalone_question")
+            pipeline_info = result.get("pipeline_info", {})
+
+            if standalone_q:
+                st.caption(f'🔍 Interpreted as: "{standalone_q}"')
+
+            if sources:
+                with st.expander(f"📚 Sources ({len(sources)})", expanded=False):
+                    for i, src in enumerate(sources, 1):
+                        st.markdown(f"{i}. `{src}`")
+
+            if pipeline_info:
+                with st.expander("🔬 Pipeline info", expanded=False):
+                    cols = st.columns(3)
+                    cols[0].metric("Retrieved", pipeline_info.get("total_retrieved", 0))
+                    cols[1].metric("Used", pipeline_info.get("final_docs", 0))
+                    cols[2].metric("Context", "✅" if pipeline_info.get("contextualized") else "—")
+
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
+            full_response = "An error occurred. Please try again."
+            message_placeholder.markdown(full_response)
 
     st.session_state.messages.append({"role": "assistant", "content": full_response})
-    save_chat(final_notebook_name, st.session_state.messages)
+    chat_store.append_message(final_notebook_name, "assistant", full_response)
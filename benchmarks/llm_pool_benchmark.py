@@ -0,0 +1,137 @@
+"""
+LLM client pool vs a new client per call, against a local mock LLM server.
+
+    python -m benchmarks.llm_pool_benchmark --calls 200 --concurrency 8 --rate-limit-every 10
+
+The mock server speaks the OpenAI-style chat completions API that the Groq
+client uses, counts the TCP connections it accepts and can answer every Nth
+request with 429 (Retry-After) to exercise backoff. No network or API key needed.
+"""
+import os
+import json
+import time
+import argparse
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockLLMServer:
+    def __init__(self, latency_ms=20, rate_limit_every=0, retry_after_s=0.05):
+        self.latency_s = latency_ms / 1000
+        self.rate_limit_every = rate_limit_every
+        self.retry_after_s = retry_after_s
+        self.connections = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reset(self):
+        with self._lock:
+            self.connections = self.requests = self.rate_limited = 0
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def setup(self):
+                super().setup()
+                with mock._lock:
+                    mock.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=()):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with mock._lock:
+                    mock.requests += 1
+                    limited = mock.rate_limit_every and mock.requests % mock.rate_limit_every == 0
+                    mock.rate_limited += bool(limited)
+                if limited:
+                    self._send(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                               [("Retry-After", str(mock.retry_after_s))])
+                    return
+                time.sleep(mock.latency_s)
+                self._send(200, {
+                    "id": "mock", "object": "chat.completion", "created": int(time.time()),
+                    "model": request.get("model", "mock"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "ok"}}],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+                })
+
+        return Handler
+
+
+def _run(label, call, calls, concurrency, server):
+    server.reset()
+    latencies, errors = [], 0
+
+    def _one(_):
+        start = time.perf_counter()
+        call()
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(_one, i) for i in range(calls)]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except Exception:
+                errors += 1
+    total_s = time.perf_counter() - start
+    p50 = statistics.median(latencies) if latencies else 0.0
+    p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+    print(f"{label:<8} {total_s:>7.2f}s {p50:>8.1f} {p95:>8.1f} {server.connections:>6} "
+          f"{server.rate_limited:>5} {errors:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth request with 429")
+    args = parser.parse_args()
+
+    server = MockLLMServer(args.latency_ms, args.rate_limit_every)
+    os.environ["EASYRESEARCH_GROQ_BASE_URL"] = server.url
+    from langchain_groq import ChatGroq
+    from core import llm_pool
+
+    def fresh_call():
+        # What every request did before the pool: new client, new connection
+        ChatGroq(model="mock", api_key="mock", base_url=server.url).invoke("hi")
+
+    def pooled_call():
+        llm, error = llm_pool.get_llm("groq", "mock", model="mock")
+        llm.invoke("hi")
+
+    print(f"{args.calls} calls, concurrency {args.concurrency}, mock latency {args.latency_ms:.0f}ms")
+    print(f"{'client':<8} {'total':>8} {'p50 ms':>8} {'p95 ms':>8} {'conns':>6} {'429s':>5} {'errors':>6}")
+    _run("fresh", fresh_call, args.calls, args.concurrency, server)
+    _run("pooled", pooled_call, args.calls, args.concurrency, server)
+    print(json.dumps(llm_pool.pool_stats()["groq"]))
+
+
+if __name__ == "__main__":
+    main()
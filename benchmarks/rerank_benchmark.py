@@ -0,0 +1,99 @@
+"""
+Reranker benchmark: latency and NDCG@k per backend on a real notebook.
+
+    python -m benchmarks.rerank_benchmark --collection my_notebook --questions questions.txt
+
+questions.txt holds one question per line, or JSON lines with
+{"question": ..., "relevant_sources": [...]} for labelled relevance. Without
+labels, gains come from the fp32 torch model at full length (the reference),
+so NDCG measures how faithfully each faster backend reproduces its ranking.
+"""
+import argparse
+import json
+import math
+import time
+import numpy as np
+from core import reranker
+from core.embedder import get_vector_db
+
+
+def _load_questions(path):
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                item = json.loads(line)
+                questions.append((item["question"], set(item.get("relevant_sources", []))))
+            else:
+                questions.append((line, set()))
+    return questions
+
+
+def _ndcg(gains_in_ranked_order, all_gains, k):
+    def dcg(gains):
+        return sum(g / math.log2(i + 2) for i, g in enumerate(gains[:k]))
+    ideal = dcg(sorted(all_gains, reverse=True))
+    return dcg(gains_in_ranked_order) / ideal if ideal > 0 else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", required=True)
+    parser.add_argument("--questions", required=True)
+    parser.add_argument("--backends", default=",".join(reranker.RERANK_BACKENDS))
+    parser.add_argument("--candidates", type=int, default=36, help="candidates per question (k_target * 2 + keyword hits)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    db = get_vector_db(args.collection)
+    questions = _load_questions(args.questions)
+    candidate_sets = [
+        [(doc.id, doc.page_content, doc.metadata.get("source")) for doc in db.similarity_search(q, k=args.candidates)]
+        for q, _ in questions
+    ]
+
+    # Reference: fp32 torch at the model's full length
+    configured_length = reranker.RERANK_MAX_LENGTH
+    reranker.RERANK_MAX_LENGTH = 512
+    reference_model = reranker._load_model("torch")
+    reranker.RERANK_MAX_LENGTH = configured_length
+    reference = [
+        reference_model.predict([[q, text] for _, text, _ in cands]) if cands else np.empty(0)
+        for (q, _), cands in zip(questions, candidate_sets)
+    ]
+
+    print(f"{'backend':<8} {'p50 ms':>8} {'p95 ms':>8} {f'NDCG@{args.k}':>9}")
+    for backend in args.backends.split(","):
+        # A backend whose runtime is missing is served by torch: its numbers would be torch's
+        reranker.get_reranker(backend)
+        loaded = reranker.loaded_backend(backend)
+        if loaded != backend:
+            print(f"{backend:<8} {'skipped: not available, fell back to ' + loaded:>27}")
+            continue
+        latencies, ndcgs = [], []
+        for (q, relevant), cands, ref_scores in zip(questions, candidate_sets, reference):
+            if not cands:
+                continue
+            pairs = [(chunk_id, text) for chunk_id, text, _ in cands]
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                scores = reranker.score(q, pairs, backend=backend, use_cache=False)
+                latencies.append((time.perf_counter() - start) * 1000)
+            if relevant:
+                gains = [1.0 if source in relevant else 0.0 for _, _, source in cands]
+            else:
+                gains = list(1.0 / (1.0 + np.exp(-np.asarray(ref_scores, dtype=np.float64))))
+            order = np.argsort(-np.asarray(scores))
+            ndcgs.append(_ndcg([gains[i] for i in order], gains, args.k))
+        if not latencies:
+            continue
+        print(f"{backend:<8} {np.percentile(latencies, 50):>8.1f} {np.percentile(latencies, 95):>8.1f} "
+              f"{np.mean(ndcgs):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
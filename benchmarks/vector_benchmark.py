@@ -0,0 +1,60 @@
+"""
+Compact vector modes: recall@k vs memory on a real notebook.
+
+    python -m benchmarks.vector_benchmark --collection my_notebook --questions heldout.txt
+
+heldout.txt holds one question per line (questions not used to tune anything).
+Ground truth is exact float32 search over the vectors stored in Chroma; every
+compact mode is scored against it without touching the notebook.
+"""
+import argparse
+import time
+import numpy as np
+from core import compact_vectors
+from core.embedder import get_collection, get_embedding_model
+from core.fusion import top_k
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", required=True)
+    parser.add_argument("--questions", required=True)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    collection = get_collection(args.collection)
+    if collection is None:
+        raise SystemExit(f"Notebook '{args.collection}' does not exist")
+    ids, vectors = [], []
+    for offset in range(0, collection.count(), 1000):
+        page = collection.get(limit=1000, offset=offset, include=["embeddings"])
+        ids.extend(page["ids"])
+        vectors.extend(page["embeddings"])
+    vectors = np.asarray(vectors, dtype=np.float32)
+
+    with open(args.questions, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+    queries = np.asarray(get_embedding_model().embed_documents(questions), dtype=np.float32)
+    truth = [set(top_k(vectors @ q, args.k)) for q in queries]
+    by_id = {chunk_id: i for i, chunk_id in enumerate(ids)}
+
+    def rescore(candidate_ids):
+        return candidate_ids, vectors[[by_id[chunk_id] for chunk_id in candidate_ids]]
+
+    print(f"{len(ids)} vectors, {len(questions)} held-out queries")
+    print(f"{'mode':<8} {'MB':>8} {f'recall@{args.k}':>10} {'ms/query':>9}")
+    print(f"{'float32':<8} {vectors.nbytes / 2**20:>8.2f} {1.0:>10.3f} {'-':>9}")
+    for mode in compact_vectors.VECTOR_MODES:
+        codes, scales = compact_vectors.encode(vectors, mode)
+        recalls = []
+        start = time.perf_counter()
+        for query, expected in zip(queries, truth):
+            hits = compact_vectors.search_codes(ids, codes, scales, query, mode, args.k, rescore=rescore)
+            recalls.append(len({by_id[chunk_id] for chunk_id, _ in hits} & expected) / args.k)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / max(1, len(queries))
+        megabytes = (codes.nbytes + scales.nbytes) / 2**20
+        print(f"{mode:<8} {megabytes:>8.2f} {np.mean(recalls):>10.3f} {elapsed_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import os
+import re
+import time
+import copy
+import threading
+import unicodedata
+import numpy as np
+from collections import OrderedDict
+from core.storage import SQLiteStore
+
+# =============================================================================
+# SEMANTIC ANSWER CACHE
+# =============================================================================
+# Answers keyed on (collection, collection version, normalized standalone
+# question, scope) with optional near-duplicate lookup over cached question
+# embeddings. The collection version lives in SQLite and is bumped on every
+# ingest/delete, so the Streamlit and FastAPI processes both see invalidations.
+ANSWER_CACHE_PATH = "database/answer_cache.db"
+ANSWER_CACHE_ENABLED = os.getenv("EASYRESEARCH_ANSWER_CACHE", "1") == "1"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("EASYRESEARCH_ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL_S = float(os.getenv("EASYRESEARCH_ANSWER_CACHE_TTL", "3600"))
+# Cosine similarity needed for a semantic hit. Off (0) by default: near-identical
+# questions can still ask different things ("2019" vs "2020"); set e.g. 0.95 to enable
+ANSWER_CACHE_SIMILARITY = float(os.getenv("EASYRESEARCH_ANSWER_CACHE_SIMILARITY", "0"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS collection_versions (
+    collection TEXT PRIMARY KEY,
+    version    INTEGER NOT NULL
+);
+"""
+
+_store = SQLiteStore(ANSWER_CACHE_PATH, _SCHEMA)
+_entries = OrderedDict()  # key -> {"result", "embedding", "created_at"}
+_lock = threading.Lock()
+_stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+
+
+def normalize_question(question):
+    text = unicodedata.normalize("NFC", question).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def get_collection_version(collection_name):
+    rows = _store.query("SELECT version FROM collection_versions WHERE collection = ?", (collection_name,))
+    return rows[0][0] if rows else 0
+
+
+def bump_collection_version(collection_name):
+    """Invalidate every cached answer of a collection (called on ingest/delete)."""
+    _store.execute(
+        "INSERT INTO collection_versions (collection, version) VALUES (?, 1) "
+        "ON CONFLICT(collection) DO UPDATE SET version = version + 1",
+        (collection_name,)
+    )
+    with _lock:
+        for key in [k for k in _entries if k[0] == collection_name]:
+            del _entries[key]
+
+
+def _embed(question):
+    from core.embedder import get_embedding_model
+    return get_embedding_model().embed_query(question)
+
+
+def _expired(entry, now):
+    return now - entry["created_at"] > ANSWER_CACHE_TTL_S
+
+
+def lookup(collection_name, question, scope=()):
+    """Return (result, "exact" | "semantic") or None."""
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    version = get_collection_version(collection_name)
+    key = (collection_name, version, tuple(scope), normalize_question(question))
+    now = time.time()
+
+    with _lock:
+        entry = _entries.get(key)
+        if entry and not _expired(entry, now):
+            _entries.move_to_end(key)
+            _stats["exact_hits"] += 1
+            return copy.deepcopy(entry["result"]), "exact"
+        if entry:
+            del _entries[key]
+        candidates = [
+            (k, e) for k, e in _entries.items()
+            if k[:3] == key[:3] and e["embedding"] is not None and not _expired(e, now)
+        ]
+
+    if ANSWER_CACHE_SIMILARITY > 0 and candidates:
+        query_vec = np.asarray(_embed(question), dtype=np.float32)
+        # Embeddings are L2-normalized, so the dot products are the cosine similarities
+        sims = np.stack([cand["embedding"] for _, cand in candidates]) @ query_vec
+        best = int(np.argmax(sims))
+        best_sim = float(sims[best])
+        if best_sim >= ANSWER_CACHE_SIMILARITY:
+            best_key, best_entry = candidates[best]
+            with _lock:
+                if best_key in _entries:
+                    _entries.move_to_end(best_key)
+                _stats["semantic_hits"] += 1
+            print(f"💾 Semantic answer-cache hit (similarity {best_sim:.3f})")
+            return copy.deepcopy(best_entry["result"]), "semantic"
+
+    with _lock:
+        _stats["misses"] += 1
+    return None
+
+
+def store(collection_name, question, result, scope=()):
+    """Cache a successful answer for the collection's current version."""
+    if not ANSWER_CACHE_ENABLED or str(result.get("answer", "")).startswith("❌"):
+        return
+    version = get_collection_version(collection_name)
+    key = (collection_name, version, tuple(scope), normalize_question(question))
+    embedding = np.asarray(_embed(question), dtype=np.float32) if ANSWER_CACHE_SIMILARITY > 0 else None
+    with _lock:
+        _entries[key] = {"result": copy.deepcopy(result), "embedding": embedding, "created_at": time.time()}
+        _entries.move_to_end(key)
+        while len(_entries) > ANSWER_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def cache_stats():
+    with _lock:
+        return {**_stats, "entries": len(_entries)}
@@ -0,0 +1,115 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from langchain_core.embeddings import Embeddings
+
+# =============================================================================
+# CROSS-REQUEST MICRO-BATCHING
+# =============================================================================
+# Concurrent callers (API requests on different threads) each submit a small
+# list of items; one worker thread per model collects them for up to
+# MICROBATCH_WAIT_MS (or MICROBATCH_MAX_SIZE items), runs a single batched
+# forward pass and hands every caller its slice of the results.
+MICROBATCH_ENABLED = os.getenv("EASYRESEARCH_MICROBATCH", "1") == "1"
+MICROBATCH_WAIT_MS = float(os.getenv("EASYRESEARCH_MICROBATCH_WAIT_MS", "3"))
+MICROBATCH_MAX_SIZE = int(os.getenv("EASYRESEARCH_MICROBATCH_MAX_SIZE", "128"))
+
+_batchers = {}
+
+
+class MicroBatcher:
+    """Coalesces concurrent fn(items) -> results calls into one call per batch window."""
+
+    def __init__(self, name, fn, max_batch_size=MICROBATCH_MAX_SIZE, max_wait_ms=MICROBATCH_WAIT_MS):
+        self.name = name
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self.stats = {"requests": 0, "batches": 0, "items": 0}
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        _batchers[name] = self
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=f"easyresearch-batch-{self.name}", daemon=True)
+                self._worker.start()
+
+    def submit_future(self, items):
+        """Queue items; returns a concurrent.futures.Future of the results list (asyncio: wrap_future)."""
+        future = Future()
+        if not items:
+            future.set_result([])
+            return future
+        self._ensure_worker()
+        self._queue.put((list(items), future))
+        return future
+
+    def submit(self, items):
+        """Blocking: results for items, computed in a shared batch."""
+        return self.submit_future(items).result()
+
+    def _run(self):
+        while True:
+            requests = [self._queue.get()]
+            size = len(requests[0][0])
+            deadline = time.perf_counter() + self.max_wait_s
+            while size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                requests.append(request)
+                size += len(request[0])
+            self._execute(requests)
+
+    def _execute(self, requests):
+        items = [item for request_items, _ in requests for item in request_items]
+        try:
+            results = list(self.fn(items))
+        except Exception as e:
+            for _, future in requests:
+                future.set_exception(e)
+            return
+        offset = 0
+        for request_items, future in requests:
+            future.set_result(results[offset:offset + len(request_items)])
+            offset += len(request_items)
+        with self._lock:
+            self.stats["requests"] += len(requests)
+            self.stats["batches"] += 1
+            self.stats["items"] += len(items)
+
+
+def batcher_stats():
+    """Per-model counters; items / batches is the average batch size achieved."""
+    stats = {}
+    for name, batcher in list(_batchers.items()):
+        with batcher._lock:
+            counts = dict(batcher.stats)
+        counts["avg_batch_items"] = round(counts["items"] / counts["batches"], 2) if counts["batches"] else 0.0
+        stats[name] = counts
+    return stats
+
+
+class BatchedEmbeddings(Embeddings):
+    """Routes queries and small text lists through a MicroBatcher; ingestion-sized batches go straight through."""
+
+    def __init__(self, inner, name="embedding"):
+        self.inner = inner
+        self.batcher = MicroBatcher(name, inner.embed_documents)
+
+    def embed_documents(self, texts):
+        if len(texts) < self.batcher.max_batch_size:
+            return self.batcher.submit(texts)
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.batcher.submit([text])[0]
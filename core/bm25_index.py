@@ -0,0 +1,205 @@
+import math
+import re
+from collections import Counter
+from core.storage import SQLiteStore, chunked
+
+# =============================================================================
+# PERSISTENT BM25 INVERTED INDEX (one logical index per collection)
+# =============================================================================
+# Built at ingest time and updated on delete, so keyword search covers the
+# whole notebook and a query only tokenizes/reads its own terms. Notebooks
+# ingested before the index existed are backfilled once from the collection
+# (`complete` marks an index known to cover every chunk).
+BM25_INDEX_PATH = "database/bm25_index.db"
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    collection TEXT NOT NULL,
+    chunk_id   TEXT NOT NULL,
+    source     TEXT,
+    length     INTEGER NOT NULL,
+    PRIMARY KEY (collection, chunk_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_docs_source ON docs (collection, source);
+
+CREATE TABLE IF NOT EXISTS postings (
+    collection TEXT NOT NULL,
+    term       TEXT NOT NULL,
+    chunk_id   TEXT NOT NULL,
+    tf         INTEGER NOT NULL,
+    PRIMARY KEY (collection, term, chunk_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings (collection, chunk_id);
+
+CREATE TABLE IF NOT EXISTS collection_stats (
+    collection   TEXT PRIMARY KEY,
+    doc_count    INTEGER NOT NULL,
+    total_length INTEGER NOT NULL,
+    complete     INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_store = SQLiteStore(
+    BM25_INDEX_PATH, _SCHEMA,
+    columns={"collection_stats": [("complete", "INTEGER NOT NULL DEFAULT 0")]}
+)
+
+
+def tokenize(text: str) -> list:
+    """Tokenize text for BM25."""
+    return re.findall(r'\w+', text.lower())
+
+
+def _adjust_stats(conn, collection_name, doc_delta, length_delta):
+    conn.execute(
+        "INSERT INTO collection_stats (collection, doc_count, total_length) VALUES (?, 0, 0) "
+        "ON CONFLICT(collection) DO NOTHING",
+        (collection_name,)
+    )
+    conn.execute(
+        "UPDATE collection_stats SET doc_count = doc_count + ?, total_length = total_length + ? "
+        "WHERE collection = ?",
+        (doc_delta, length_delta, collection_name)
+    )
+
+
+def _remove_chunks(conn, collection_name, chunk_ids):
+    removed_docs = 0
+    removed_length = 0
+    for batch in chunked(chunk_ids):
+        placeholders = ",".join("?" * len(batch))
+        params = [collection_name, *batch]
+        row = conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs "
+            f"WHERE collection = ? AND chunk_id IN ({placeholders})",
+            params
+        ).fetchone()
+        removed_docs += row[0]
+        removed_length += row[1]
+        conn.execute(f"DELETE FROM postings WHERE collection = ? AND chunk_id IN ({placeholders})", params)
+        conn.execute(f"DELETE FROM docs WHERE collection = ? AND chunk_id IN ({placeholders})", params)
+    if removed_docs:
+        _adjust_stats(conn, collection_name, -removed_docs, -removed_length)
+    return removed_docs
+
+
+def index_chunks(collection_name, ids, texts, metadatas):
+    """Add (or re-index) chunks in the collection's inverted index."""
+    doc_rows = []
+    posting_rows = []
+    total_length = 0
+    for chunk_id, text, meta in zip(ids, texts, metadatas):
+        tokens = tokenize(text)
+        doc_rows.append((collection_name, chunk_id, (meta or {}).get("source"), len(tokens)))
+        total_length += len(tokens)
+        for term, tf in Counter(tokens).items():
+            posting_rows.append((collection_name, term, chunk_id, tf))
+
+    with _store.transaction() as conn:
+        _remove_chunks(conn, collection_name, ids)
+        conn.executemany(
+            "INSERT INTO docs (collection, chunk_id, source, length) VALUES (?, ?, ?, ?)", doc_rows
+        )
+        conn.executemany(
+            "INSERT INTO postings (collection, term, chunk_id, tf) VALUES (?, ?, ?, ?)", posting_rows
+        )
+        _adjust_stats(conn, collection_name, len(doc_rows), total_length)
+    return len(doc_rows)
+
+
+def remove_chunks(collection_name, chunk_ids):
+    """Remove chunks from the index by id."""
+    with _store.transaction() as conn:
+        return _remove_chunks(conn, collection_name, list(chunk_ids))
+
+
+def remove_source(collection_name, source_name):
+    """Remove all chunks of one source file from the index."""
+    with _store.transaction() as conn:
+        ids = [r[0] for r in conn.execute(
+            "SELECT chunk_id FROM docs WHERE collection = ? AND source = ?",
+            (collection_name, source_name)
+        )]
+        return _remove_chunks(conn, collection_name, ids)
+
+
+def drop_collection(collection_name):
+    """Remove a collection's whole index."""
+    with _store.transaction() as conn:
+        conn.execute("DELETE FROM postings WHERE collection = ?", (collection_name,))
+        conn.execute("DELETE FROM docs WHERE collection = ?", (collection_name,))
+        conn.execute("DELETE FROM collection_stats WHERE collection = ?", (collection_name,))
+
+
+def doc_count(collection_name):
+    rows = _store.query("SELECT doc_count FROM collection_stats WHERE collection = ?", (collection_name,))
+    return rows[0][0] if rows else 0
+
+
+def is_complete(collection_name):
+    """True once the index is known to cover every chunk of the collection."""
+    rows = _store.query("SELECT complete FROM collection_stats WHERE collection = ?", (collection_name,))
+    return bool(rows and rows[0][0])
+
+
+def mark_complete(collection_name):
+    with _store.transaction() as conn:
+        _adjust_stats(conn, collection_name, 0, 0)
+        conn.execute("UPDATE collection_stats SET complete = 1 WHERE collection = ?", (collection_name,))
+
+
+def rebuild_index(collection, collection_name, page_size=1000):
+    """
+    Backfill the index of a notebook ingested before it existed (or only
+    partially indexed), paging through the collection once. Returns chunks indexed.
+    """
+    drop_collection(collection_name)
+    indexed = 0
+    for offset in range(0, collection.count(), page_size):
+        page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+        indexed += index_chunks(
+            collection_name, page["ids"], [text or "" for text in page["documents"]], page["metadatas"]
+        )
+    mark_complete(collection_name)
+    print(f"🔑 Indexed {indexed} chunks of '{collection_name}' for BM25")
+    return indexed
+
+
+def score_query(collection_name, query):
+    """Score every chunk containing at least one query term. Returns dict chunk_id -> BM25 score."""
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return {}
+
+    stats = _store.query(
+        "SELECT doc_count, total_length FROM collection_stats WHERE collection = ?", (collection_name,)
+    )
+    if not stats or stats[0][0] <= 0:
+        return {}
+    n_docs, total_length = stats[0]
+    avgdl = total_length / n_docs if n_docs else 0.0
+
+    placeholders = ",".join("?" * len(terms))
+    rows = _store.query(
+        f"SELECT p.term, p.chunk_id, p.tf, d.length FROM postings p "
+        f"JOIN docs d ON d.collection = p.collection AND d.chunk_id = p.chunk_id "
+        f"WHERE p.collection = ? AND p.term IN ({placeholders})",
+        [collection_name, *terms]
+    )
+
+    postings = {}
+    for term, chunk_id, tf, length in rows:
+        postings.setdefault(term, []).append((chunk_id, tf, length))
+
+    scores = {}
+    for term, plist in postings.items():
+        df = len(plist)
+        idf = math.log((n_docs - df + 0.5) / (df + 0.5) + 1.0)
+        for chunk_id, tf, length in plist:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avgdl) if avgdl else BM25_K1
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+    return scores
+
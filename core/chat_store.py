@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import threading
+from core.storage import SQLiteStore
+
+# =============================================================================
+# APPEND-ONLY CHAT HISTORY
+# =============================================================================
+# One row per message, appended as the conversation goes (constant cost per
+# turn instead of rewriting the whole history). A partial index over user
+# messages serves "recent questions" without reading answers, and loads only
+# fetch the tail. Every CHAT_COMPACT_EVERY appends a background task folds the
+# WAL back into the database file. History is kept in full unless
+# CHAT_MAX_MESSAGES is set, which also trims each notebook to its newest messages.
+# Histories saved by older versions (database/chat_history/<notebook>.json)
+# are imported on first load.
+CHAT_DB_PATH = "database/chat_history/chat.db"
+CHAT_DIR = "database/chat_history"
+CHAT_TAIL_MESSAGES = int(os.getenv("EASYRESEARCH_CHAT_TAIL", "200"))
+CHAT_MAX_MESSAGES = int(os.getenv("EASYRESEARCH_CHAT_MAX_MESSAGES", "0"))  # 0 = keep everything
+CHAT_COMPACT_EVERY = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    notebook   TEXT NOT NULL,
+    role       TEXT NOT NULL,
+    content    TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_notebook ON messages (notebook, seq);
+CREATE INDEX IF NOT EXISTS idx_messages_questions ON messages (notebook, seq) WHERE role = 'user';
+"""
+
+_store = SQLiteStore(CHAT_DB_PATH, _SCHEMA)
+_appends = {}  # notebook -> appends since the last compaction
+_lock = threading.Lock()
+
+
+def _legacy_path(notebook_name):
+    return os.path.join(CHAT_DIR, f"{notebook_name}.json")
+
+
+def _import_legacy(notebook_name):
+    """Move a pre-append-log JSON history into the store (once)."""
+    path = _legacy_path(notebook_name)
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            messages = json.load(f) or []
+        append_messages(notebook_name, messages)
+        os.replace(path, path + ".imported")
+        print(f"💬 Imported {len(messages)} saved messages of '{notebook_name}'")
+    except Exception as e:
+        print(f"⚠️ Could not import chat history of {notebook_name}: {e}")
+
+
+def append_messages(notebook_name, messages):
+    """Append messages ({"role", "content"}) to a notebook's history."""
+    now = time.time()
+    rows = [(notebook_name, m["role"], m["content"], now) for m in messages]
+    if not rows:
+        return
+    _store.executemany(
+        "INSERT INTO messages (notebook, role, content, created_at) VALUES (?, ?, ?, ?)", rows
+    )
+    with _lock:
+        _appends[notebook_name] = _appends.get(notebook_name, 0) + len(rows)
+        due = _appends[notebook_name] >= CHAT_COMPACT_EVERY
+        if due:
+            _appends[notebook_name] = 0
+    if due:
+        from core.concurrency import submit_io
+        submit_io(_maintain, notebook_name)
+
+
+def append_message(notebook_name, role, content):
+    append_messages(notebook_name, [{"role": role, "content": content}])
+
+
+def load_messages(notebook_name, limit=CHAT_TAIL_MESSAGES, before=None):
+    """
+    The newest `limit` messages (oldest first), or None if there are none.
+    Pass before=<seq> to page further back; each message carries its "seq".
+    """
+    _import_legacy(notebook_name)
+    rows = _store.query(
+        "SELECT seq, role, content FROM messages WHERE notebook = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+        (notebook_name, before if before is not None else 2 ** 63 - 1, limit)
+    )
+    if not rows:
+        return None
+    return [{"role": role, "content": content, "seq": seq} for seq, role, content in reversed(rows)]
+
+
+def recent_questions(notebook_name, limit=5):
+    """Newest user questions first, read from the questions index."""
+    _import_legacy(notebook_name)
+    rows = _store.query(
+        "SELECT content FROM messages WHERE notebook = ? AND role = 'user' ORDER BY seq DESC LIMIT ?",
+        (notebook_name, limit)
+    )
+    return [row[0] for row in rows]
+
+
+def clear(notebook_name):
+    """Delete a notebook's history (including a not yet imported legacy file)."""
+    _store.execute("DELETE FROM messages WHERE notebook = ?", (notebook_name,))
+    path = _legacy_path(notebook_name)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def trim(notebook_name, keep=None):
+    """Drop all but the newest `keep` messages of a notebook (opt-in retention). Returns the rows removed."""
+    keep = CHAT_MAX_MESSAGES if keep is None else keep
+    if keep <= 0:
+        return 0
+    rows = _store.query(
+        "SELECT seq FROM messages WHERE notebook = ? ORDER BY seq DESC LIMIT 1 OFFSET ?",
+        (notebook_name, keep - 1)
+    )
+    if not rows:
+        return 0
+    removed = _store.execute(
+        "DELETE FROM messages WHERE notebook = ? AND seq < ?", (notebook_name, rows[0][0])
+    )
+    if removed:
+        print(f"🧹 Trimmed chat history of '{notebook_name}' ({removed} old messages removed)")
+    return removed
+
+
+def compact(vacuum=False):
+    """
+    Checkpoint the write-ahead log into the database file and truncate it; with
+    vacuum=True also rebuild the file to return pages freed by deletes. No message is removed.
+    """
+    if vacuum:
+        _store.execute("VACUUM")
+    busy, _, _ = _store.query("PRAGMA wal_checkpoint(TRUNCATE)")[0]
+    return not busy
+
+
+def _maintain(notebook_name):
+    """Background upkeep after CHAT_COMPACT_EVERY appends."""
+    removed = trim(notebook_name)
+    compact()
+    return removed
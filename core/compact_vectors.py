@@ -0,0 +1,240 @@
+import threading
+import numpy as np
+from core.storage import SQLiteStore, chunked
+
+# =============================================================================
+# COMPACT VECTOR MODE (opt-in, per notebook)
+# =============================================================================
+# Chroma keeps float32 vectors and loads its HNSW index into RAM on the first
+# query. Notebooks switched to a compact mode are searched from a quantized
+# copy instead (Chroma still holds the texts, metadata and full vectors):
+#   "float16" - half precision, 2 bytes / dim
+#   "int8"    - scalar quantization with a per-vector scale, 1 byte / dim
+#   "binary"  - sign bits, 1 bit / dim; candidates are re-scored with the
+#               float vectors fetched from Chroma
+# Migrate an existing notebook with:
+#   python -m core.compact_vectors --collection my_notebook --mode int8
+COMPACT_DB_PATH = "database/compact_vectors.db"
+VECTOR_MODES = ("float16", "int8", "binary")
+BINARY_OVERSAMPLE = 8  # binary candidates fetched per requested result before re-scoring
+_SEARCH_BLOCK = 65536  # rows decoded at a time, bounds the float32 working set
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS modes (
+    collection TEXT PRIMARY KEY,
+    mode       TEXT NOT NULL,
+    version    INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS vectors (
+    collection TEXT NOT NULL,
+    chunk_id   TEXT NOT NULL,
+    source     TEXT,
+    code       BLOB NOT NULL,
+    scale      REAL NOT NULL DEFAULT 1.0,
+    PRIMARY KEY (collection, chunk_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_compact_source ON vectors (collection, source);
+"""
+
+_store = SQLiteStore(COMPACT_DB_PATH, _SCHEMA)
+_matrices = {}  # collection -> (version, ids, codes, scales)
+_matrix_lock = threading.Lock()
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+# ---------------------------------------------------------
+# Encoding / scoring (pure NumPy, also used by the benchmark)
+# ---------------------------------------------------------
+
+def encode(vectors, mode):
+    """Quantize an (n, dim) array. Returns (codes, scales)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.ones(len(vectors), dtype=np.float32)
+    if mode == "float16":
+        return vectors.astype(np.float16), scales
+    if mode == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    if mode == "binary":
+        return np.packbits(vectors > 0, axis=1), scales
+    raise ValueError(f"Unknown vector mode: {mode}")
+
+
+def similarities(codes, scales, query, mode):
+    """Similarity of every row to a float query (higher is better; binary: -hamming)."""
+    query = np.asarray(query, dtype=np.float32)
+    if mode == "binary":
+        query_bits = np.packbits(query > 0)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), _SEARCH_BLOCK):
+            block = codes[start:start + _SEARCH_BLOCK]
+            out[start:start + len(block)] = -_POPCOUNT[np.bitwise_xor(block, query_bits)].sum(axis=1, dtype=np.int32)
+        return out
+    out = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), _SEARCH_BLOCK):
+        block = codes[start:start + _SEARCH_BLOCK].astype(np.float32)
+        out[start:start + len(block)] = block @ query
+    return out * scales if mode == "int8" else out
+
+
+def search_codes(ids, codes, scales, query, mode, k, rescore=None):
+    """
+    Top-k (chunk_id, score) pairs, best first. For binary codes, rescore(ids)
+    returns (found_ids, vectors): the float vectors of the candidates it could
+    fetch, for an exact second pass (ids it cannot find are left out).
+    """
+    from core.fusion import top_k
+    if not len(ids):
+        return []
+    sims = similarities(codes, scales, query, mode)
+    if mode == "binary" and rescore is not None:
+        candidates = top_k(sims, k * BINARY_OVERSAMPLE)
+        candidate_ids = [ids[i] for i in candidates]
+        found_ids, vectors = rescore(candidate_ids)
+        if not len(found_ids):
+            return []
+        exact = np.asarray(vectors, dtype=np.float32) @ np.asarray(query, dtype=np.float32)
+        return [(found_ids[i], float(exact[i])) for i in top_k(exact, k)]
+    return [(ids[i], float(sims[i])) for i in top_k(sims, k)]
+
+
+# ---------------------------------------------------------
+# Per-notebook storage
+# ---------------------------------------------------------
+
+def get_vector_mode(collection_name):
+    """Compact mode of a notebook, or None (plain Chroma search)."""
+    rows = _store.query("SELECT mode FROM modes WHERE collection = ?", (collection_name,))
+    return rows[0][0] if rows else None
+
+
+def _version(collection_name):
+    rows = _store.query("SELECT version FROM modes WHERE collection = ?", (collection_name,))
+    return rows[0][0] if rows else None
+
+
+def _bump(collection_name):
+    _store.execute("UPDATE modes SET version = version + 1 WHERE collection = ?", (collection_name,))
+
+
+def add_vectors(collection_name, ids, sources, vectors):
+    """Store quantized copies of freshly written vectors (no-op unless the notebook is compact)."""
+    mode = get_vector_mode(collection_name)
+    if mode is None or not ids:
+        return
+    codes, scales = encode(vectors, mode)
+    _store.executemany(
+        "INSERT OR REPLACE INTO vectors (collection, chunk_id, source, code, scale) VALUES (?, ?, ?, ?, ?)",
+        [(collection_name, chunk_id, source, code.tobytes(), float(scale))
+         for chunk_id, source, code, scale in zip(ids, sources, codes, scales)]
+    )
+    _bump(collection_name)
+
+
+def delete_vectors(collection_name, ids):
+    if get_vector_mode(collection_name) is None or not ids:
+        return
+    with _store.transaction() as conn:
+        for batch in chunked(list(ids)):
+            placeholders = ",".join("?" * len(batch))
+            conn.execute(
+                f"DELETE FROM vectors WHERE collection = ? AND chunk_id IN ({placeholders})",
+                [collection_name, *batch]
+            )
+    _bump(collection_name)
+
+
+def delete_source(collection_name, source_name):
+    if get_vector_mode(collection_name) is None:
+        return
+    _store.execute("DELETE FROM vectors WHERE collection = ? AND source = ?", (collection_name, source_name))
+    _bump(collection_name)
+
+
+def drop_collection(collection_name):
+    """Forget a notebook's compact vectors and its mode."""
+    with _store.transaction() as conn:
+        conn.execute("DELETE FROM vectors WHERE collection = ?", (collection_name,))
+        conn.execute("DELETE FROM modes WHERE collection = ?", (collection_name,))
+    with _matrix_lock:
+        _matrices.pop(collection_name, None)
+
+
+def _load_matrix(collection_name, mode):
+    """(ids, codes, scales) for a notebook, cached in memory until its version changes."""
+    version = _version(collection_name)
+    with _matrix_lock:
+        cached = _matrices.get(collection_name)
+        if cached and cached[0] == version:
+            return cached[1:]
+    rows = _store.query(
+        "SELECT chunk_id, code, scale FROM vectors WHERE collection = ? ORDER BY chunk_id", (collection_name,)
+    )
+    ids = [row[0] for row in rows]
+    dtype = {"float16": np.float16, "int8": np.int8, "binary": np.uint8}[mode]
+    if rows:
+        codes = np.stack([np.frombuffer(row[1], dtype=dtype) for row in rows])
+    else:
+        codes = np.empty((0, 0), dtype=dtype)
+    scales = np.array([row[2] for row in rows], dtype=np.float32)
+    with _matrix_lock:
+        _matrices[collection_name] = (version, ids, codes, scales)
+    return ids, codes, scales
+
+
+def search(collection_name, query_vector, k, rescore=None):
+    """Top-k (chunk_id, similarity) from the compact copy, or None if the notebook isn't compact."""
+    mode = get_vector_mode(collection_name)
+    if mode is None:
+        return None
+    ids, codes, scales = _load_matrix(collection_name, mode)
+    return search_codes(ids, codes, scales, query_vector, mode, k, rescore=rescore)
+
+
+def memory_stats(collection_name):
+    mode = get_vector_mode(collection_name)
+    if mode is None:
+        return {"mode": None}
+    ids, codes, scales = _load_matrix(collection_name, mode)
+    return {"mode": mode, "vectors": len(ids), "bytes": int(codes.nbytes + scales.nbytes)}
+
+
+def migrate_collection(collection_name, mode, page_size=1000):
+    """
+    Switch a notebook to a compact mode (or back to plain Chroma with mode=None),
+    quantizing the vectors already stored in Chroma.
+    """
+    from core.embedder import get_collection
+    drop_collection(collection_name)
+    if mode is None:
+        print(f"📦 '{collection_name}' now searched through Chroma (float32)")
+        return 0
+    if mode not in VECTOR_MODES:
+        raise ValueError(f"Unknown vector mode: {mode}")
+    collection = get_collection(collection_name)
+    if collection is None:
+        raise ValueError(f"Notebook '{collection_name}' does not exist")
+
+    _store.execute("INSERT INTO modes (collection, mode, version) VALUES (?, ?, 0)", (collection_name, mode))
+    total = collection.count()
+    migrated = 0
+    for offset in range(0, total, page_size):
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings", "metadatas"])
+        sources = [(meta or {}).get("source") for meta in page["metadatas"]]
+        add_vectors(collection_name, page["ids"], sources, page["embeddings"])
+        migrated += len(page["ids"])
+    print(f"📦 Migrated {migrated} vectors of '{collection_name}' to {mode}")
+    return migrated
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Switch a notebook's vector search to a compact mode.")
+    parser.add_argument("--collection", required=True)
+    parser.add_argument("--mode", required=True, choices=[*VECTOR_MODES, "float32"],
+                        help="float32 switches back to plain Chroma search")
+    args = parser.parse_args()
+    migrate_collection(args.collection, None if args.mode == "float32" else args.mode)
+    print(memory_stats(args.collection))
@@ -0,0 +1,34 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# =============================================================================
+# BOUNDED EXECUTORS FOR THE ASYNC API
+# =============================================================================
+# CPU-bound stages (embedding, cross-encoder, parsing/splitting) run in a small
+# pool sized to the machine — torch releases the GIL, so threads are enough and
+# the models are shared. Blocking I/O (SQLite lookups, file writes) gets its own
+# pool so it never waits behind model inference.
+CPU_WORKERS = int(os.getenv("EASYRESEARCH_CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+IO_WORKERS = int(os.getenv("EASYRESEARCH_IO_WORKERS", "16"))
+
+_cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="easyresearch-cpu")
+_io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="easyresearch-io")
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """Run a CPU-bound callable on the bounded CPU pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_cpu_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def run_io(fn, *args, **kwargs):
+    """Run a blocking I/O callable on the I/O pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, functools.partial(fn, *args, **kwargs))
+
+
+def submit_io(fn, *args, **kwargs):
+    """Submit a blocking I/O callable to the I/O pool from synchronous code. Returns a Future."""
+    return _io_executor.submit(fn, *args, **kwargs)
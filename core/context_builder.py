@@ -0,0 +1,136 @@
+import os
+import threading
+
+# =============================================================================
+# TOKEN-BUDGETED CONTEXT ASSEMBLY
+# =============================================================================
+# Children that won retrieval are resolved to their parents, then:
+#   1. deduplicated by parent (a parent keeps the rank of its best child)
+#   2. added in rank order while they fit CONTEXT_TOKEN_BUDGET
+#   3. parents adjacent in the same source file (parent_index i, i+1) are
+#      merged into one block with the splitter overlap removed
+# Tokens are counted with tiktoken when installed, else estimated from length.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("EASYRESEARCH_CONTEXT_TOKENS", "6000"))  # 0 = unlimited
+CHARS_PER_TOKEN = 4  # estimate used without tiktoken
+MAX_MERGE_OVERLAP = 1000  # longest parent overlap searched when merging neighbours
+MIN_MERGE_OVERLAP = 16    # shorter shared seams are treated as coincidence
+BLOCK_SEPARATOR = "\n\n---\n\n"
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    _encoding = False
+    return _encoding
+
+
+def count_tokens(text):
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_tokens(text, max_tokens):
+    encoding = _get_encoding()
+    if encoding:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    return text[:max_tokens * CHARS_PER_TOKEN]
+
+
+def merge_overlapping(first, second):
+    """Concatenate two consecutive parents, dropping the text they share at the seam."""
+    tail = first[-MAX_MERGE_OVERLAP:]
+    probe = second[:MIN_MERGE_OVERLAP]
+    i = tail.find(probe)
+    while len(probe) == MIN_MERGE_OVERLAP and i != -1:
+        if second.startswith(tail[i:]):
+            return first + second[len(tail) - i:]
+        i = tail.find(probe, i + 1)
+    return first + "\n" + second
+
+
+def _format_block(source, text):
+    return f"[Source: {source}]\n{text}"
+
+
+def build_context(docs, parent_map, max_tokens=None):
+    """
+    Context text for the answer prompt from ranked child docs.
+    parent_map maps parent_id -> parent text (docs without one use
+    metadata["parent_content"] or their own text). max_tokens further caps
+    CONTEXT_TOKEN_BUDGET (e.g. to a local model's window). Returns (text, info).
+    """
+    budget = CONTEXT_TOKEN_BUDGET
+    if max_tokens:
+        budget = min(budget, max_tokens) if budget else max_tokens
+
+    # 1. One entry per parent, in the rank of its best child
+    parents = {}
+    for rank, doc in enumerate(docs):
+        meta = doc.metadata
+        key = meta.get("parent_id") or doc.id or doc.page_content
+        if key in parents:
+            continue
+        text = parent_map.get(meta.get("parent_id")) or meta.get("parent_content") or doc.page_content
+        parents[key] = {
+            "rank": rank,
+            "source": meta.get("source", "Unknown"),
+            "index": meta.get("parent_index"),
+            "text": text,
+        }
+
+    # 2. Fill the budget in rank order (a smaller parent may still fit after a skip)
+    selected, used, dropped = [], 0, 0
+    for parent in parents.values():
+        tokens = count_tokens(_format_block(parent["source"], parent["text"]))
+        if budget and used + tokens > budget:
+            if selected:
+                dropped += 1
+                continue
+            parent["text"] = truncate_tokens(parent["text"], budget)
+            tokens = budget
+        selected.append(parent)
+        used += tokens
+
+    # 3. Merge neighbours of the same file into one block
+    blocks = []
+    by_source = {}
+    for parent in selected:
+        by_source.setdefault(parent["source"], []).append(parent)
+    for source, group in by_source.items():
+        indexed = sorted((p for p in group if p["index"] is not None), key=lambda p: p["index"])
+        runs = []
+        for parent in indexed:
+            if runs and parent["index"] == runs[-1][-1]["index"] + 1:
+                runs[-1].append(parent)
+            else:
+                runs.append([parent])
+        runs.extend([p] for p in group if p["index"] is None)
+        for run in runs:
+            text = run[0]["text"]
+            for parent in run[1:]:
+                text = merge_overlapping(text, parent["text"])
+            blocks.append((min(p["rank"] for p in run), _format_block(source, text)))
+
+    blocks.sort(key=lambda block: block[0])
+    context_text = BLOCK_SEPARATOR.join(text for _, text in blocks)
+    info = {
+        "children": len(docs),
+        "parents": len(parents),
+        "parents_used": len(selected),
+        "parents_dropped": dropped,
+        "blocks": len(blocks),
+        "tokens": count_tokens(context_text),
+        "token_budget": budget,
+    }
+    return context_text, info
@@ -0,0 +1,80 @@
+import zlib
+from core.storage import SQLiteStore, chunked
+
+# =============================================================================
+# PARENT DOCUMENT STORE
+# =============================================================================
+# Parent chunks are stored once per (collection, parent_id) instead of being
+# copied into the metadata of every child chunk in ChromaDB.
+DOCSTORE_PATH = "database/parent_store.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parents (
+    collection TEXT NOT NULL,
+    parent_id  TEXT NOT NULL,
+    source     TEXT,
+    content    BLOB NOT NULL,
+    PRIMARY KEY (collection, parent_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_parents_source ON parents (collection, source);
+"""
+
+_store = SQLiteStore(DOCSTORE_PATH, _SCHEMA)
+
+
+def put_parents(collection_name, parents):
+    """
+    Store parent chunks for a collection.
+    parents: dict of parent_id -> (source, content)
+    """
+    if not parents:
+        return 0
+    rows = [
+        (collection_name, parent_id, source, zlib.compress(content.encode("utf-8")))
+        for parent_id, (source, content) in parents.items()
+    ]
+    _store.executemany(
+        "INSERT OR REPLACE INTO parents (collection, parent_id, source, content) VALUES (?, ?, ?, ?)",
+        rows
+    )
+    return len(rows)
+
+
+def get_parents(collection_name, parent_ids):
+    """Resolve parent contents in one batched lookup. Returns dict parent_id -> content."""
+    unique_ids = list(dict.fromkeys(pid for pid in parent_ids if pid))
+    found = {}
+    for batch in chunked(unique_ids):
+        placeholders = ",".join("?" * len(batch))
+        rows = _store.query(
+            f"SELECT parent_id, content FROM parents WHERE collection = ? AND parent_id IN ({placeholders})",
+            [collection_name, *batch]
+        )
+        for parent_id, blob in rows:
+            found[parent_id] = zlib.decompress(blob).decode("utf-8")
+    return found
+
+
+def delete_parents(collection_name, parent_ids):
+    """Delete parents by id."""
+    deleted = 0
+    for batch in chunked(parent_ids):
+        placeholders = ",".join("?" * len(batch))
+        deleted += _store.execute(
+            f"DELETE FROM parents WHERE collection = ? AND parent_id IN ({placeholders})",
+            [collection_name, *batch]
+        )
+    return deleted
+
+
+def delete_parents_by_source(collection_name, source_name):
+    """Delete all parents of one source file."""
+    return _store.execute(
+        "DELETE FROM parents WHERE collection = ? AND source = ?",
+        (collection_name, source_name)
+    )
+
+
+def delete_collection_parents(collection_name):
+    """Delete all parents of a collection."""
+    return _store.execute("DELETE FROM parents WHERE collection = ?", (collection_name,))
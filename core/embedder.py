@@ -1,61 +1,428 @@
 import os
 import shutil
-import chromadb
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-import torch
 import time
+import threading
+from core.docstore import put_parents, delete_parents, delete_parents_by_source, delete_collection_parents
+from core import bm25_index
+from core import manifest
+from core import answer_cache
+from core import stats as notebook_stats
+
+# NOTE: chromadb, langchain_chroma, torch and sentence-transformers are imported
+# lazily so that `import core.embedder` stays fast (API health checks, stats).
 
 CHROMA_DIR = "database/chroma_db"
+EMBEDDING_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+# Persistent embedding cache (core/embedding_cache.py); EASYRESEARCH_EMBED_CACHE=0 disables it
+EMBED_CACHE_ENABLED = os.getenv("EASYRESEARCH_EMBED_CACHE", "1") == "1"
 
-DEVICE = 'cuda' if torch.cuda.is_available() else 'cpu'
-print(f"🚀 EasyResearch running on: {DEVICE.upper()}")
-
-embedding_model = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-    model_kwargs={'device': DEVICE},
-    encode_kwargs={'normalize_embeddings': True}
-)
-
-def add_to_vector_db(chunks, collection_name="default_notebook"):
-    """Add chunks to ChromaDB collection."""
-    db = Chroma(
-        collection_name=collection_name,
-        embedding_function=embedding_model,
-        persist_directory=CHROMA_DIR
-    )
-    
-    texts = [chunk.page_content for chunk in chunks]
-    metadatas = [chunk.metadata for chunk in chunks]
-    ids = [chunk.id for chunk in chunks]
+# ---------------------------------------------------------
+# Lazy model singletons
+# ---------------------------------------------------------
+_device = None
+_embedding_model = None
+_model_lock = threading.Lock()
 
-    BATCH_SIZE = 500
-    total_chunks = len(chunks)
-    
-    print(f"📥 Ingesting {total_chunks} chunks into '{collection_name}'...")
-    
-    for i in range(0, total_chunks, BATCH_SIZE):
-        end = min(i + BATCH_SIZE, total_chunks)
-        batch_texts = texts[i:end]
-        batch_metadatas = metadatas[i:end]
-        batch_ids = ids[i:end]
-        
-        db.add_texts(
-            texts=batch_texts,
-            metadatas=batch_metadatas,
-            ids=batch_ids 
+
+def get_device():
+    """Return 'cuda' or 'cpu' (imports torch on first call)."""
+    global _device
+    if _device is None:
+        import torch
+        _device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        print(f"🚀 EasyResearch running on: {_device.upper()}")
+    return _device
+
+
+def get_embedding_model():
+    """Return the shared embedding model, loading it on first use (thread-safe)."""
+    global _embedding_model
+    if _embedding_model is None:
+        with _model_lock:
+            if _embedding_model is None:
+                from langchain_huggingface import HuggingFaceEmbeddings
+                start = time.perf_counter()
+                model = HuggingFaceEmbeddings(
+                    model_name=EMBEDDING_MODEL_NAME,
+                    model_kwargs={'device': get_device()},
+                    encode_kwargs={'normalize_embeddings': True}
+                )
+                from core.batching import MICROBATCH_ENABLED, BatchedEmbeddings
+                if MICROBATCH_ENABLED:
+                    # Concurrent queries share one forward pass (cache hits never reach it)
+                    model = BatchedEmbeddings(model)
+                if EMBED_CACHE_ENABLED:
+                    from core.embedding_cache import CachedEmbeddings
+                    model = CachedEmbeddings(model, EMBEDDING_MODEL_NAME)
+                _embedding_model = model
+                print(f"🧩 Embedding model loaded in {time.perf_counter() - start:.1f}s")
+    return _embedding_model
+
+
+def is_embedding_model_loaded():
+    return _embedding_model is not None
+
+
+def warmup_embedding_model():
+    """Load the embedding model and run one tiny forward pass."""
+    get_embedding_model().embed_query("warm-up")
+
+# ---------------------------------------------------------
+# Connection manager: shared client & collection handles
+# ---------------------------------------------------------
+# One PersistentClient per process; LangChain wrappers and raw collection
+# handles are cached per collection and dropped when it is created/deleted.
+_client = None
+_vector_dbs = {}
+_collections = {}
+_conn_lock = threading.RLock()
+
+
+def get_chroma_client():
+    """Return the process-wide ChromaDB client."""
+    global _client
+    with _conn_lock:
+        if _client is None:
+            import chromadb
+            os.makedirs(CHROMA_DIR, exist_ok=True)
+            _client = chromadb.PersistentClient(path=CHROMA_DIR)
+        return _client
+
+
+def get_vector_db(collection_name):
+    """Return the shared LangChain Chroma wrapper (creates the collection if missing)."""
+    with _conn_lock:
+        db = _vector_dbs.get(collection_name)
+        if db is not None:
+            return db
+    # A cold model load takes seconds: keep it outside the lock so stats and
+    # collection lookups never wait on it
+    model = get_embedding_model()
+    with _conn_lock:
+        db = _vector_dbs.get(collection_name)
+        if db is None:
+            from langchain_chroma import Chroma
+            db = Chroma(
+                client=get_chroma_client(),
+                collection_name=collection_name,
+                embedding_function=model
+            )
+            _vector_dbs[collection_name] = db
+            _collections[collection_name] = db._collection
+        return db
+
+
+def get_collection(collection_name):
+    """Return the shared raw collection handle, or None if it does not exist."""
+    with _conn_lock:
+        collection = _collections.get(collection_name)
+        if collection is None:
+            try:
+                collection = get_chroma_client().get_collection(collection_name)
+            except Exception:
+                return None
+            _collections[collection_name] = collection
+        return collection
+
+
+def invalidate_collection(collection_name):
+    """Drop cached handles for a collection (after delete, or if another process changed it)."""
+    with _conn_lock:
+        _vector_dbs.pop(collection_name, None)
+        _collections.pop(collection_name, None)
+
+
+def _list_collection_names():
+    # chromadb 0.6 returns names, other versions return Collection objects
+    return [c if isinstance(c, str) else c.name for c in get_chroma_client().list_collections()]
+
+
+def _split_parent_content(chunks):
+    """Strip `parent_content` from chunk metadata. Returns (metadatas, parents)."""
+    metadatas = []
+    parents = {}
+    for chunk in chunks:
+        meta = dict(chunk.metadata)
+        parent_content = meta.pop("parent_content", None)
+        parent_id = meta.get("parent_id")
+        if parent_id and parent_content is not None:
+            parents[parent_id] = (meta.get("source"), parent_content)
+        metadatas.append(meta)
+    return metadatas, parents
+
+
+EMBED_BATCH_SIZE = 500
+
+
+def _lookup_embeddings(collection, content_hashes):
+    """Embeddings of chunks already stored with the given text hashes. Returns dict hash -> vector."""
+    found = {}
+    hashes = [h for h in content_hashes if h]
+    BATCH = 500
+    for i in range(0, len(hashes), BATCH):
+        result = collection.get(
+            where={"content_hash": {"$in": hashes[i:i + BATCH]}},
+            include=["embeddings", "metadatas"]
         )
-        print(f"   ✅ Processed batch {i} -> {end}")
-        
-    return db
+        for meta, embedding in zip(result["metadatas"], result["embeddings"]):
+            if meta and meta.get("content_hash") and embedding is not None:
+                found.setdefault(meta["content_hash"], [float(x) for x in embedding])
+    return found
+
+
+def _plan_file_sync(collection, collection_name, chunks):
+    """
+    Diff one file's chunks against its manifest entry.
+    Returns None if the file is unchanged, else a dict with the chunks to write,
+    ids kept as-is, orphaned ids and embeddings reusable by content hash.
+    """
+    source = chunks[0].metadata.get("source")
+    file_hash = chunks[0].metadata.get("file_hash")
+    new_ids = [chunk.id for chunk in chunks]
+
+    entry = manifest.get_file_entry(collection_name, source)
+    if entry is not None:
+        old_ids = set(entry["chunk_ids"])
+    else:
+        # First ingest or legacy notebook without a manifest: ask ChromaDB server-side
+        old_ids = set(collection.get(where={"source": source}, include=[])["ids"])
+
+    if entry and file_hash and entry["content_hash"] == file_hash and set(new_ids) == old_ids:
+        return None
+
+    kept_ids = old_ids & set(new_ids)
+    to_write = [chunk for chunk in chunks if chunk.id not in kept_ids]
+    return {
+        "source": source,
+        "file_hash": file_hash,
+        "file_size": chunks[0].metadata.get("file_size", 0),
+        "chunk_ids": new_ids,
+        "text_bytes": sum(len(chunk.page_content.encode("utf-8")) for chunk in chunks),
+        "kept": [chunk for chunk in chunks if chunk.id in kept_ids],
+        "to_write": to_write,
+        "orphan_ids": list(old_ids - set(new_ids)),
+        "reusable": _lookup_embeddings(collection, {c.metadata.get("content_hash") for c in to_write})
+    }
+
+
+def write_chunk_groups(chunk_groups, collection_name="default_notebook", progress_callback=None):
+    """
+    Pipelined, incremental ingestion for one or many documents.
+
+    chunk_groups is an iterable of per-file chunk lists (possibly produced
+    lazily by a parser pool). Each file is diffed against the manifest:
+    unchanged files are skipped, chunks whose content-addressed id is already
+    stored are kept, embeddings of identical texts already in the collection
+    are reused, and only the rest is embedded — in shared cross-document
+    batches on this thread while a writer thread upserts the previous batch.
+    Orphaned chunks of changed files are removed once everything is written;
+    on failure the chunks written by this call are rolled back.
+
+    progress_callback (optional) is called as progress_callback(per_source)
+    with cumulative {"chunks_embedded", "batches_written"} counts for every
+    source touched by the latest batch. Returns the ids written.
+    """
+    import queue
+    from core.vector_store import get_vector_store
+    db = get_vector_db(collection_name)
+    collection = db._collection
+    vector_store = get_vector_store(collection_name)
+
+    progress = {}
+    progress_lock = threading.Lock()
+
+    def _report(sources, field):
+        if not progress_callback:
+            return
+        with progress_lock:
+            for source in sources:
+                counts = progress.setdefault(source, {"chunks_embedded": 0, "batches_written": 0})
+                counts[field] += sources[source] if field == "chunks_embedded" else 1
+            snapshot = {source: dict(progress[source]) for source in sources}
+        progress_callback(snapshot)
+
+    write_queue = queue.Queue(maxsize=2)
+    write_errors = []
+
+    def _writer():
+        while True:
+            item = write_queue.get()
+            if item is None:
+                return
+            if write_errors:
+                continue
+            batch_ids, batch_texts, batch_metadatas, batch_embeddings, batch_sources = item
+            try:
+                collection.upsert(
+                    ids=batch_ids,
+                    documents=batch_texts,
+                    metadatas=batch_metadatas,
+                    embeddings=batch_embeddings
+                )
+                # Notebooks searched outside Chroma keep their own index in step
+                vector_store.add(batch_ids, [m.get("source") for m in batch_metadatas], batch_embeddings)
+                print(f"   ✅ Wrote batch of {len(batch_ids)} chunks")
+                _report(batch_sources, "batches_written")
+            except Exception as e:
+                write_errors.append(e)
+
+    writer = threading.Thread(target=_writer, name="easyresearch-chroma-writer", daemon=True)
+    writer.start()
+
+    all_ids, all_texts, all_metadatas, all_embeddings = [], [], [], []
+    plans = []
+    pending = 0
+    reused_count = 0
+
+    def _flush(start, end):
+        batch_texts = all_texts[start:end]
+        batch_metadatas = all_metadatas[start:end]
+        batch_embeddings = all_embeddings[start:end]
+        missing = [i for i, emb in enumerate(batch_embeddings) if emb is None]
+        if missing:
+            computed = get_embedding_model().embed_documents([batch_texts[i] for i in missing])
+            for i, emb in zip(missing, computed):
+                batch_embeddings[i] = emb
+        batch_sources = {}
+        for meta in batch_metadatas:
+            source = meta.get("source")
+            batch_sources[source] = batch_sources.get(source, 0) + 1
+        _report(batch_sources, "chunks_embedded")
+        write_queue.put((all_ids[start:end], batch_texts, batch_metadatas, batch_embeddings, batch_sources))
+
+    try:
+        try:
+            for chunks in chunk_groups:
+                if not chunks:
+                    continue
+                plan = _plan_file_sync(collection, collection_name, chunks)
+                if plan is None:
+                    print(f"⏭️ '{chunks[0].metadata.get('source')}' unchanged — skipped")
+                    continue
+                plans.append(plan)
+                if plan["kept"]:
+                    _report({plan["source"]: len(plan["kept"])}, "chunks_embedded")
+
+                to_write = plan["to_write"]
+                metadatas, _ = _split_parent_content(to_write)
+                for chunk, meta in zip(to_write, metadatas):
+                    all_ids.append(chunk.id)
+                    all_texts.append(chunk.page_content)
+                    all_metadatas.append(meta)
+                    embedding = plan["reusable"].get(meta.get("content_hash"))
+                    reused_count += embedding is not None
+                    all_embeddings.append(embedding)
+                print(f"📥 '{plan['source']}': {len(to_write)} new, {len(plan['kept'])} unchanged, "
+                      f"{len(plan['orphan_ids'])} orphaned chunks")
+
+                while len(all_ids) - pending >= EMBED_BATCH_SIZE and not write_errors:
+                    _flush(pending, pending + EMBED_BATCH_SIZE)
+                    pending += EMBED_BATCH_SIZE
+
+            if len(all_ids) > pending and not write_errors:
+                _flush(pending, len(all_ids))
+                pending = len(all_ids)
+        finally:
+            write_queue.put(None)
+            writer.join()
+
+        if write_errors:
+            raise write_errors[0]
+    except Exception:
+        if all_ids:
+            print(f"↩️ Rolling back {len(all_ids)} chunks written to '{collection_name}'")
+            delete_chunks(collection_name, all_ids)
+            answer_cache.bump_collection_version(collection_name)
+            notebook_stats.refresh_notebook(collection_name)
+        raise
+
+    # Everything is written: drop orphans, then store parents and refresh kept metadata
+    for plan in plans:
+        if plan["orphan_ids"]:
+            delete_chunks(collection_name, plan["orphan_ids"])
+        _, parents = _split_parent_content(plan["to_write"] + plan["kept"])
+        put_parents(collection_name, parents)
+        if plan["kept"]:
+            kept_metadatas, _ = _split_parent_content(plan["kept"])
+            BATCH = 500
+            for i in range(0, len(plan["kept"]), BATCH):
+                collection.update(
+                    ids=[c.id for c in plan["kept"][i:i + BATCH]],
+                    metadatas=kept_metadatas[i:i + BATCH]
+                )
+        manifest.upsert_file_entry(
+            collection_name, plan["source"], plan["chunk_ids"],
+            content_hash=plan["file_hash"], size=plan["file_size"], text_bytes=plan["text_bytes"]
+        )
+
+    bm25_index.index_chunks(collection_name, all_ids, all_texts, all_metadatas)
+    if plans:
+        answer_cache.bump_collection_version(collection_name)
+        notebook_stats.refresh_notebook(collection_name)
+    if reused_count:
+        print(f"♻️ Reused {reused_count} stored embeddings of identical chunks")
+    return all_ids
+
+
+def add_to_vector_db(chunks, collection_name="default_notebook", progress_callback=None):
+    """
+    Add chunks to ChromaDB collection (parent chunks go to the docstore).
+    progress_callback (optional) is called after each batch as
+    progress_callback(chunks_embedded=n, batches_written=m).
+    """
+    totals = {}
+
+    def _on_progress(per_source):
+        totals.update(per_source)
+        progress_callback(
+            chunks_embedded=sum(c["chunks_embedded"] for c in totals.values()),
+            batches_written=max(c["batches_written"] for c in totals.values())
+        )
+
+    print(f"📥 Ingesting {len(chunks)} chunks into '{collection_name}'...")
+    write_chunk_groups([chunks], collection_name, _on_progress if progress_callback else None)
+    return get_vector_db(collection_name)
+
+
+def delete_chunks(collection_name, chunk_ids):
+    """Remove specific chunks (and their parents / keyword postings) from a collection."""
+    collection = get_collection(collection_name)
+    if collection is None or not chunk_ids:
+        return 0
+    parent_ids = set()
+    BATCH = 500
+    for i in range(0, len(chunk_ids), BATCH):
+        batch = chunk_ids[i:i + BATCH]
+        result = collection.get(ids=batch, include=["metadatas"])
+        parent_ids.update(m.get("parent_id") for m in result["metadatas"] if m and m.get("parent_id"))
+        collection.delete(ids=batch)
+    delete_parents(collection_name, list(parent_ids))
+    bm25_index.remove_chunks(collection_name, chunk_ids)
+    from core.vector_store import get_vector_store
+    get_vector_store(collection_name).delete(chunk_ids)
+    return len(chunk_ids)
+
+
+def get_chunks_by_source(collection_name, source_names, limit=None):
+    """Fetch stored chunks of the given source files as Documents (insertion order)."""
+    from langchain_core.documents import Document
+    collection = get_collection(collection_name)
+    if collection is None or not source_names:
+        return []
+    result = collection.get(
+        where={"source": {"$in": list(source_names)}},
+        limit=limit,
+        include=["documents", "metadatas"]
+    )
+    return [
+        Document(id=doc_id, page_content=text, metadata=meta or {})
+        for doc_id, text, meta in zip(result["ids"], result["documents"], result["metadatas"])
+    ]
+
 
 def get_retriever(collection_name="default_notebook"):
     """Get retriever for the RAG pipeline."""
-    db = Chroma(
-        collection_name=collection_name,
-        embedding_function=embedding_model,
-        persist_directory=CHROMA_DIR
-    )
+    db = get_vector_db(collection_name)
     return db.as_retriever(
         search_type="mmr",
         search_kwargs={'k': 5, 'fetch_k': 20}
@@ -66,7 +433,10 @@ def get_retriever(collection_name="default_notebook"):
 # ---------------------------------------------------------
 
 def get_notebook_stats(notebook_name):
-    """Get detailed stats for a notebook: chunk count, source files, storage size."""
+    """
+    Get detailed stats for a notebook: chunk count, source files, storage size.
+    Served from core/stats.py caches, so repeated sidebar renders don't touch Chroma.
+    """
     stats = {
         "chunks": 0,
         "files": [],
@@ -77,59 +447,68 @@ def get_notebook_stats(notebook_name):
         if not os.path.exists(CHROMA_DIR):
             return stats
             
-        client = chromadb.PersistentClient(path=CHROMA_DIR)
-        
-        target_collection = None
-        for col in client.list_collections():
-            if col.name == notebook_name:
-                target_collection = col
-                break
-        
-        if not target_collection:
+        collection = get_collection(notebook_name)
+        if collection is None:
             return stats
         
-        collection = client.get_collection(notebook_name)
-        
-        stats["chunks"] = collection.count()
+        stats["files"] = [entry["source"] for entry in get_source_index(notebook_name, collection)]
+        stats["chunks"] = notebook_stats.notebook_counters(notebook_name)["chunks"]
         
-        if stats["chunks"] > 0:
-            result = collection.get(include=["metadatas"])
-            if result and result["metadatas"]:
-                sources = set()
-                for meta in result["metadatas"]:
-                    if meta and "source" in meta:
-                        sources.add(meta["source"])
-                stats["files"] = list(sources)
-        
-        # Calculate directory size
-        collection_uuid = str(target_collection.id)
-        dir_path = os.path.join(CHROMA_DIR, collection_uuid)
+        dir_path = os.path.join(CHROMA_DIR, str(collection.id))
         if os.path.exists(dir_path):
-            total_size = 0
-            for dirpath, dirnames, filenames in os.walk(dir_path):
-                for f in filenames:
-                    fp = os.path.join(dirpath, f)
-                    total_size += os.path.getsize(fp)
+            total_size = notebook_stats.collection_size(notebook_name, dir_path)
             stats["size_mb"] = round(total_size / (1024 * 1024), 2)
         
         return stats
         
     except Exception as e:
         print(f"⚠️ Error getting notebook stats for {notebook_name}: {e}")
+        invalidate_collection(notebook_name)
         return stats
 
+def get_source_index(notebook_name, collection=None):
+    """
+    Files of a notebook with their chunk count, text bytes and ingest time,
+    read from the manifest (backfilled once for notebooks that predate it).
+    """
+    def _load():
+        if manifest.needs_source_index(notebook_name):
+            target = collection or get_collection(notebook_name)
+            if target is not None and target.count() > 0:
+                manifest.rebuild_source_index(target, notebook_name)
+                notebook_stats.refresh_notebook(notebook_name)
+        return manifest.list_sources(notebook_name)
+    return notebook_stats.source_index(notebook_name, _load)
+
+_bm25_backfill_lock = threading.Lock()
+
+
+def ensure_bm25_index(notebook_name, collection=None):
+    """
+    Make sure the BM25 index covers the whole notebook. Notebooks that predate
+    the index (or were only partly indexed) are backfilled once; after that
+    this is a single SQLite lookup. Returns True if the index is usable.
+    """
+    if bm25_index.is_complete(notebook_name):
+        return True
+    with _bm25_backfill_lock:
+        if bm25_index.is_complete(notebook_name):
+            return True
+        target = collection or get_collection(notebook_name)
+        if target is None:
+            return False
+        if bm25_index.doc_count(notebook_name) >= target.count():
+            bm25_index.mark_complete(notebook_name)
+        else:
+            bm25_index.rebuild_index(target, notebook_name)
+    return True
+
 def get_total_db_size():
     """Get total database size in MB."""
     try:
         if not os.path.exists(CHROMA_DIR):
             return 0.0
-            
-        total_size = 0
-        for dirpath, dirnames, filenames in os.walk(CHROMA_DIR):
-            for f in filenames:
-                fp = os.path.join(dirpath, f)
-                total_size += os.path.getsize(fp)
-        return round(total_size / (1024 * 1024), 2)
+        return round(notebook_stats.chroma_size(CHROMA_DIR) / (1024 * 1024), 2)
     except Exception as e:
         print(f"⚠️ Error calculating DB size: {e}")
         return 0.0
@@ -139,10 +518,8 @@ def get_all_notebooks():
     try:
         if not os.path.exists(CHROMA_DIR):
             return []
-            
-        client = chromadb.PersistentClient(path=CHROMA_DIR)
-        collections = client.list_collections()
-        return [c.name for c in collections]
+
+        return notebook_stats.notebook_names(CHROMA_DIR, _list_collection_names)
     except Exception as e:
         print(f"⚠️ Error listing notebooks: {e}")
         return []
@@ -150,38 +527,42 @@ def get_all_notebooks():
 def delete_file_from_notebook(notebook_name, source_name):
     """Delete all chunks of a specific file from a ChromaDB collection by metadata source."""
     try:
-        client = chromadb.PersistentClient(path=CHROMA_DIR)
-        collection = client.get_collection(notebook_name)
+        collection = get_collection(notebook_name)
+        if collection is None:
+            return 0
 
-        result = collection.get(include=["metadatas"])
-        ids_to_delete = []
-        for doc_id, meta in zip(result["ids"], result["metadatas"]):
-            if meta and meta.get("source") == source_name:
-                ids_to_delete.append(doc_id)
+        # Chunk ids come from the source index; files it doesn't know are looked up server-side
+        entry = manifest.get_file_entry(notebook_name, source_name)
+        if entry is not None:
+            ids_to_delete = entry["chunk_ids"]
+        else:
+            ids_to_delete = collection.get(where={"source": source_name}, include=[])["ids"]
 
         if ids_to_delete:
-            BATCH = 500
-            for i in range(0, len(ids_to_delete), BATCH):
-                collection.delete(ids=ids_to_delete[i:i + BATCH])
+            collection.delete(where={"source": source_name})
             print(f"🗑️ Deleted {len(ids_to_delete)} chunks of '{source_name}' from '{notebook_name}'")
+        delete_parents_by_source(notebook_name, source_name)
+        bm25_index.remove_source(notebook_name, source_name)
+        from core.vector_store import get_vector_store
+        get_vector_store(notebook_name).delete_by_source(source_name)
+        manifest.delete_file_entry(notebook_name, source_name)
+        answer_cache.bump_collection_version(notebook_name)
+        notebook_stats.refresh_notebook(notebook_name)
 
         return len(ids_to_delete)
     except Exception as e:
         print(f"❌ Error deleting file {source_name}: {e}")
+        invalidate_collection(notebook_name)
         return 0
 
 
 def delete_notebook(notebook_name):
     """Delete a notebook entirely: remove from DB and delete physical directory."""
     try:
-        client = chromadb.PersistentClient(path=CHROMA_DIR)
+        client = get_chroma_client()
         
         # Find collection UUID before deleting
-        target_collection = None
-        for col in client.list_collections():
-            if col.name == notebook_name:
-                target_collection = col
-                break
+        target_collection = get_collection(notebook_name)
         
         collection_uuid = None
         if target_collection:
@@ -189,8 +570,20 @@ def delete_notebook(notebook_name):
             print(f"🔍 Found physical directory: {collection_uuid}")
 
         # Remove from DB (SQLite)
+        invalidate_collection(notebook_name)
         client.delete_collection(notebook_name)
         print(f"🗑️ Deleted collection from DB: {notebook_name}")
+        delete_collection_parents(notebook_name)
+        bm25_index.drop_collection(notebook_name)
+        from core.vector_store import drop_vector_store
+        drop_vector_store(notebook_name)
+        from core.summarizer import drop_notebook_summaries
+        drop_notebook_summaries(notebook_name)
+        manifest.drop_collection_manifest(notebook_name)
+        answer_cache.bump_collection_version(notebook_name)
+        notebook_stats.forget_notebook(
+            notebook_name, os.path.join(CHROMA_DIR, collection_uuid) if collection_uuid else None
+        )
         
         # Remove physical directory
         if collection_uuid:
@@ -206,4 +599,5 @@ def delete_notebook(notebook_name):
         return True
     except Exception as e:
         print(f"❌ Error deleting notebook {notebook_name}: {e}")
+        invalidate_collection(notebook_name)
         return False
\ No newline at end of file
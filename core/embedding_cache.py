@@ -0,0 +1,165 @@
+import os
+import re
+import time
+import struct
+import hashlib
+import threading
+import unicodedata
+from langchain_core.embeddings import Embeddings
+from core.storage import SQLiteStore, chunked
+
+# =============================================================================
+# PERSISTENT EMBEDDING CACHE
+# =============================================================================
+# Vectors keyed by (model name, normalized text hash), stored as compact
+# float16 (default) or float32 blobs, with size-bounded LRU eviction. Shared
+# by ingestion and queries across all notebooks.
+EMBED_CACHE_PATH = "database/embedding_cache.db"
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EASYRESEARCH_EMBED_CACHE_MAX_ENTRIES", "200000"))
+EMBED_CACHE_DTYPE = os.getenv("EASYRESEARCH_EMBED_CACHE_DTYPE", "float16")
+
+_STRUCT_CODES = {"float16": "e", "float32": "f"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vectors (
+    key         TEXT PRIMARY KEY,
+    model       TEXT NOT NULL,
+    dtype       TEXT NOT NULL,
+    vector      BLOB NOT NULL,
+    last_access REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_vectors_access ON vectors (last_access);
+"""
+
+_store = SQLiteStore(EMBED_CACHE_PATH, _SCHEMA)
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+_approx_entries = None  # upper bound on stored entries, recounted only when near the limit
+
+
+def normalize_text(text):
+    """NFC + collapsed whitespace, so trivially different copies share a cache entry."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def _cache_key(model_name, text):
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+def _pack(vector, dtype):
+    return struct.pack(f"<{len(vector)}{_STRUCT_CODES[dtype]}", *vector)
+
+
+def _unpack(blob, dtype):
+    code = _STRUCT_CODES[dtype]
+    return list(struct.unpack(f"<{len(blob) // struct.calcsize(code)}{code}", blob))
+
+
+def _count(field, n):
+    with _stats_lock:
+        _stats[field] += n
+
+
+def cache_stats():
+    """Hit/miss/eviction counters for this process plus the stored entry count."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["entries"] = _store.query("SELECT COUNT(*) FROM vectors")[0][0]
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    return stats
+
+
+def get_cached(model_name, texts):
+    """Look up vectors. Returns list aligned with texts (None for misses)."""
+    keys = [_cache_key(model_name, text) for text in texts]
+    found = {}
+    for batch in chunked(list(set(keys))):
+        placeholders = ",".join("?" * len(batch))
+        for key, dtype, blob in _store.query(
+            f"SELECT key, dtype, vector FROM vectors WHERE key IN ({placeholders})", batch
+        ):
+            found[key] = _unpack(blob, dtype)
+
+    if found:
+        now = time.time()
+        _store.executemany("UPDATE vectors SET last_access = ? WHERE key = ?", [(now, key) for key in found])
+
+    vectors = [found.get(key) for key in keys]
+    hits = sum(v is not None for v in vectors)
+    _count("hits", hits)
+    _count("misses", len(vectors) - hits)
+    return vectors
+
+
+def put_cached(model_name, texts, vectors):
+    """Store vectors, then evict least-recently-used entries beyond the size bound."""
+    now = time.time()
+    rows = [
+        (_cache_key(model_name, text), model_name, EMBED_CACHE_DTYPE, _pack(vector, EMBED_CACHE_DTYPE), now)
+        for text, vector in zip(texts, vectors)
+    ]
+    _store.executemany(
+        "INSERT OR REPLACE INTO vectors (key, model, dtype, vector, last_access) VALUES (?, ?, ?, ?, ?)", rows
+    )
+    _evict(len(rows))
+
+
+def _evict(added):
+    global _approx_entries
+    with _stats_lock:
+        if _approx_entries is not None:
+            _approx_entries += added
+            if _approx_entries <= EMBED_CACHE_MAX_ENTRIES:
+                return
+    total = _store.query("SELECT COUNT(*) FROM vectors")[0][0]
+    with _stats_lock:
+        _approx_entries = total
+    if total <= EMBED_CACHE_MAX_ENTRIES:
+        return
+    # Trim to 90% of the bound so eviction doesn't run on every insert
+    excess = total - int(EMBED_CACHE_MAX_ENTRIES * 0.9)
+    _store.execute(
+        "DELETE FROM vectors WHERE key IN (SELECT key FROM vectors ORDER BY last_access LIMIT ?)", (excess,)
+    )
+    with _stats_lock:
+        _approx_entries = total - excess
+    _count("evictions", excess)
+
+
+def clear_cache():
+    global _approx_entries
+    _store.execute("DELETE FROM vectors")
+    with _stats_lock:
+        _approx_entries = 0
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain Embeddings wrapper that serves repeated texts from the persistent cache."""
+
+    def __init__(self, inner, model_name):
+        self.inner = inner
+        self.model_name = model_name
+
+    def embed_documents(self, texts):
+        vectors = get_cached(self.model_name, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # Embed each distinct (normalized) missing text once
+            unique = {}
+            for i in missing:
+                unique.setdefault(normalize_text(texts[i]), texts[i])
+            unique_texts = list(unique.values())
+            computed = [list(v) for v in self.inner.embed_documents(unique_texts)]
+            put_cached(self.model_name, unique_texts, computed)
+            by_norm = dict(zip(unique.keys(), computed))
+            for i in missing:
+                vectors[i] = by_norm[normalize_text(texts[i])]
+        return vectors
+
+    def embed_query(self, text):
+        vector = get_cached(self.model_name, [text])[0]
+        if vector is None:
+            vector = list(self.inner.embed_query(text))
+            put_cached(self.model_name, [text], [vector])
+        return vector
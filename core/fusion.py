@@ -0,0 +1,122 @@
+import numpy as np
+
+# =============================================================================
+# HYBRID SCORE FUSION
+# =============================================================================
+# Candidates are keyed by chunk id and every signal (cross-encoder logits,
+# BM25, vector similarity, ...) is one NumPy array aligned with that id list.
+# Signals are normalized onto a common scale before fusion, and top-k is
+# selected with argpartition instead of sorting every candidate.
+RRF_K = 60
+
+
+def minmax(scores):
+    """Scale to [0, 1]; a constant signal maps to 0 (no information)."""
+    lo, hi = scores.min(), scores.max()
+    if hi - lo <= 1e-12:
+        return np.zeros_like(scores)
+    return (scores - lo) / (hi - lo)
+
+
+def zscore(scores):
+    std = scores.std()
+    if std <= 1e-12:
+        return np.zeros_like(scores)
+    return (scores - scores.mean()) / std
+
+
+def sigmoid(scores):
+    """For logits (e.g. cross-encoder outputs): maps onto (0, 1) independent of the batch."""
+    return 1.0 / (1.0 + np.exp(-scores))
+
+
+def identity(scores):
+    return scores
+
+
+NORMALIZERS = {
+    "minmax": minmax,
+    "zscore": zscore,
+    "sigmoid": sigmoid,
+    "none": identity,
+}
+
+
+def weighted_sum(signals, weights, normalizers=None):
+    """Sum of normalized signals. signals: name -> array; weights/normalizers: name -> value."""
+    normalizers = normalizers or {}
+    fused = None
+    for name, weight in weights.items():
+        if name not in signals or not weight:
+            continue
+        normalized = NORMALIZERS[normalizers.get(name, "minmax")](signals[name])
+        fused = weight * normalized if fused is None else fused + weight * normalized
+    if fused is None:
+        return np.zeros(len(next(iter(signals.values()))) if signals else 0)
+    return fused
+
+
+def ranks(scores):
+    """0-based rank of every candidate (0 = best), ties broken by position."""
+    order = np.argsort(-scores, kind="stable")
+    rank = np.empty(len(scores), dtype=np.int64)
+    rank[order] = np.arange(len(scores))
+    return rank
+
+
+def reciprocal_rank(signals, weights=None, rrf_k=RRF_K):
+    """
+    Reciprocal rank fusion: sum of weight / (rrf_k + rank + 1) over signals (scale-free).
+    A candidate missing from a ranked list (score -inf) gets nothing from that list.
+    """
+    weights = weights or {name: 1.0 for name in signals}
+    fused = None
+    for name, weight in weights.items():
+        if name not in signals or not weight:
+            continue
+        scores = signals[name]
+        contribution = np.where(np.isfinite(scores), weight / (rrf_k + ranks(scores) + 1.0), 0.0)
+        fused = contribution if fused is None else fused + contribution
+    if fused is None:
+        return np.zeros(len(next(iter(signals.values()))) if signals else 0)
+    return fused
+
+
+STRATEGIES = {
+    "weighted": weighted_sum,
+    "rrf": lambda signals, weights, normalizers=None: reciprocal_rank(signals, weights),
+}
+
+
+def top_k(scores, k):
+    """Indices of the k highest scores, best first (argpartition + sort of k items)."""
+    n = len(scores)
+    if n == 0 or k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def fuse(ids, signals, weights, strategy="weighted", normalizers=None, k=10, min_score=None):
+    """
+    Fuse per-candidate signals and select the top k.
+
+    ids: chunk ids (one per candidate); signals: name -> sequence aligned with ids.
+    min_score drops candidates below it, unless that would drop all of them.
+    Returns a list of (id, fused_score) pairs, best first, plus the full fused array.
+    """
+    if not ids:
+        return [], np.empty(0)
+    arrays = {name: np.asarray(values, dtype=np.float64) for name, values in signals.items()}
+    fused = STRATEGIES[strategy](arrays, weights, normalizers)
+
+    eligible = np.arange(len(ids))
+    if min_score is not None:
+        above = np.flatnonzero(fused >= min_score)
+        if len(above):
+            eligible = above
+    selected = eligible[top_k(fused[eligible], k)]
+    return [(ids[i], float(fused[i])) for i in selected], fused
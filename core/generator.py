@@ -1,25 +1,67 @@
 import os
-import torch
+import asyncio
+import time
 from dotenv import load_dotenv
-from langchain_chroma import Chroma
-from langchain_groq import ChatGroq
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import HumanMessage, AIMessage
-from sentence_transformers import CrossEncoder
 from rank_bm25 import BM25Okapi
 import re
-from core.embedder import embedding_model 
+import json
+import heapq
+import numpy as np
+from core.embedder import get_embedding_model, warmup_embedding_model, ensure_bm25_index
+from core.docstore import get_parents
+from core.context_builder import build_context
+from core import llm_pool
+from core.concurrency import run_cpu, run_io, submit_io
+from core.batching import MICROBATCH_ENABLED
+from core import bm25_index
+from core import answer_cache
+from core import fusion
+from core import reranker
+from core.vector_store import get_vector_store
 
 load_dotenv()
 
 CHROMA_DIR = "database/chroma_db"
-DEVICE = 'cuda' if torch.cuda.is_available() else 'cpu'
 
 MAX_HISTORY_MESSAGES = 10
 
-# Reranker
-reranker_model = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2', device=DEVICE)
+# Retrieval: "standard" (single vector search) or "expanded" (multi-query +
+# HyDE variants searched in parallel and fused with reciprocal rank fusion)
+RETRIEVAL_MODES = ("standard", "expanded")
+RETRIEVAL_MODE = os.getenv("EASYRESEARCH_RETRIEVAL", "standard")
+
+# Hybrid fusion of cross-encoder and BM25 scores (see core.fusion):
+# "weighted" (normalized weighted sum) or "rrf" (reciprocal rank fusion)
+def _resolve_fusion_strategy(strategy: str) -> str:
+    strategy = strategy.lower()
+    if strategy in fusion.STRATEGIES:
+        return strategy
+    print(f"⚠️ Unknown EASYRESEARCH_FUSION '{strategy}', using 'weighted'")
+    return "weighted"
+
+
+FUSION_STRATEGY = _resolve_fusion_strategy(os.getenv("EASYRESEARCH_FUSION", "weighted"))
+FUSION_WEIGHTS = {"rerank": 0.7, "bm25": 0.3}
+FUSION_NORMALIZERS = {"rerank": "sigmoid", "bm25": "minmax"}
+FUSION_MIN_SCORE = 0.1  # weighted strategy only
+
+# CRAG grading stage: "off", "parallel" (one call per doc, bounded concurrency)
+# or "batch" (all docs graded in a single structured prompt)
+CRAG_MODES = ("off", "parallel", "batch")
+CRAG_MODE = os.getenv("EASYRESEARCH_CRAG", "off")
+CRAG_CONCURRENCY = int(os.getenv("EASYRESEARCH_CRAG_CONCURRENCY", "6"))
+# Cross-encoder logits outside this band are graded locally, without the LLM
+CRAG_RELEVANT_SCORE = float(os.getenv("EASYRESEARCH_CRAG_RELEVANT_SCORE", "5.0"))
+CRAG_IRRELEVANT_SCORE = float(os.getenv("EASYRESEARCH_CRAG_IRRELEVANT_SCORE", "-5.0"))
+
+def warmup_models():
+    """Optional start-up hook: load embedding + reranker models before the first query."""
+    start = time.perf_counter()
+    warmup_embedding_model()
+    reranker.get_reranker().predict([["warm-up", "warm-up"]])
+    print(f"🔥 Models warmed up in {time.perf_counter() - start:.1f}s")
 
 # =============================================================================
 # PROMPTS
@@ -94,6 +136,24 @@ DOCUMENT CONTENT:
 GRADE:"""),
 ])
 
+# Prompt CRAG - Multi-document grading in one call
+crag_batch_grading_prompt = ChatPromptTemplate.from_messages([
+    ("system", """You are a relevance grading expert. Assess whether each numbered document is relevant to the user's question.
+
+Grades:
+- "RELEVANT" - The document clearly helps answer the question
+- "PARTIAL" - The document is somewhat related but not directly helpful
+- "IRRELEVANT" - The document does not help answer the question
+
+Respond with ONLY a JSON object mapping every document number to its grade, e.g. {{"1": "RELEVANT", "2": "IRRELEVANT"}}"""),
+    ("human", """QUESTION: {question}
+
+DOCUMENTS:
+{documents}
+
+GRADES:"""),
+])
+
 # RAG prompt with history
 rag_prompt_with_history = ChatPromptTemplate.from_messages([
     (
@@ -142,11 +202,6 @@ GUIDELINES:
 # HELPER FUNCTIONS
 # =============================================================================
 
-def _tokenize(text: str) -> list:
-    """Tokenize text for BM25."""
-    return re.findall(r'\w+', text.lower())
-
-
 def _summarize_conversation(chat_history: list, max_messages: int = MAX_HISTORY_MESSAGES) -> str:
     """Summarize conversation history."""
     if not chat_history or len(chat_history) <= 1:
@@ -162,13 +217,26 @@ def _summarize_conversation(chat_history: list, max_messages: int = MAX_HISTORY_
     return "\n".join(summary_parts)
 
 
+def _parse_multi_queries(question: str, content: str) -> list:
+    queries = [q.strip() for q in content.strip().split("\n") if q.strip()]
+    return [question] + queries[:3]  # original + 3 variants
+
+
 def _generate_multi_queries(llm, question: str) -> list:
     """Multi-Query Expansion: generate query variants."""
     try:
         chain = multi_query_prompt | llm
         result = chain.invoke({"question": question})
-        queries = [q.strip() for q in result.content.strip().split("\n") if q.strip()]
-        return [question] + queries[:3]  # original + 3 variants
+        return _parse_multi_queries(question, result.content)
+    except Exception as e:
+        print(f"⚠️ Multi-Query failed: {e}")
+        return [question]
+
+
+async def _agenerate_multi_queries(llm, question: str) -> list:
+    try:
+        result = await (multi_query_prompt | llm).ainvoke({"question": question})
+        return _parse_multi_queries(question, result.content)
     except Exception as e:
         print(f"⚠️ Multi-Query failed: {e}")
         return [question]
@@ -187,15 +255,26 @@ def _generate_hyde_document(llm, question: str) -> str:
         return question
 
 
+async def _agenerate_hyde_document(llm, question: str) -> str:
+    try:
+        result = await (hyde_prompt | llm).ainvoke({"question": question})
+        hyde_doc = result.content.strip()
+        print(f"📝 HyDE document generated: {hyde_doc[:100]}...")
+        return hyde_doc
+    except Exception as e:
+        print(f"⚠️ HyDE failed: {e}")
+        return question
+
+
 def _bm25_search(documents: list, query: str, top_k: int = 10) -> list:
     """BM25 Keyword Search."""
     if not documents:
         return []
     
-    tokenized_corpus = [_tokenize(doc.page_content) for doc in documents]
+    tokenized_corpus = [bm25_index.tokenize(doc.page_content) for doc in documents]
     bm25 = BM25Okapi(tokenized_corpus)
     
-    tokenized_query = _tokenize(query)
+    tokenized_query = bm25_index.tokenize(query)
     scores = bm25.get_scores(tokenized_query)
     
     for i, doc in enumerate(documents):
@@ -205,79 +284,218 @@ def _bm25_search(documents: list, query: str, top_k: int = 10) -> list:
     return sorted_docs[:top_k]
 
 
-def _crag_grade_documents(llm, question: str, documents: list) -> tuple:
-    """CRAG: Grade document relevance. Returns (relevant, partial, irrelevant_count)."""
-    relevant_docs = []
-    partial_docs = []
-    irrelevant_count = 0
-    
-    grading_chain = crag_grading_prompt | llm
-    
-    for doc in documents:
+def _search_by_vector(collection_name: str, vector, k: int) -> list:
+    """Vector search for one embedding through the notebook's vector index backend."""
+    return get_vector_store(collection_name).search(vector, k)
+
+
+def _keyword_retrieve(collection_name: str, query: str, vector_docs: list, top_k: int = 10) -> list:
+    """
+    Independent BM25 retriever over the persistent index, fused with vector hits.
+    Sets the raw `bm25_score` on every returned doc.
+    """
+    try:
+        indexed = ensure_bm25_index(collection_name)
+    except Exception as e:
+        print(f"⚠️ BM25 index backfill failed: {e}")
+        indexed = False
+    if not indexed:
+        # No usable index: score vector hits only
+        if vector_docs:
+            _bm25_search(vector_docs, query, top_k=len(vector_docs))
+        return vector_docs
+
+    scores = bm25_index.score_query(collection_name, query)
+    seen_ids = {doc.id for doc in vector_docs}
+    top_hits = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+    keyword_docs = get_vector_store(collection_name).get_by_ids(
+        [chunk_id for chunk_id, _ in top_hits if chunk_id not in seen_ids]
+    )
+    for doc in keyword_docs:
+        doc.metadata["retrieval_method"] = "bm25"
+
+    fused_docs = vector_docs + keyword_docs
+    for doc in fused_docs:
+        doc.metadata["bm25_score"] = scores.get(doc.id, 0.0)
+
+    print(f"🔑 BM25 index: {len(scores)} keyword matches, {len(keyword_docs)} added beyond vector hits")
+    return fused_docs
+
+
+def _parse_crag_grade(text: str) -> str:
+    grade = text.strip().upper()
+    if "RELEVANT" in grade and "IRRELEVANT" not in grade:
+        return "RELEVANT"
+    if "PARTIAL" in grade:
+        return "PARTIAL"
+    return "IRRELEVANT"
+
+
+def _shortcut_crag_grade(doc):
+    """Grade clear-cut documents from the cross-encoder score alone (None = ask the LLM)."""
+    score = doc.metadata.get("rerank_score")
+    if score is None:
+        return None
+    if score >= CRAG_RELEVANT_SCORE:
+        return "RELEVANT"
+    if score <= CRAG_IRRELEVANT_SCORE:
+        return "IRRELEVANT"
+    return None
+
+
+def _crag_inputs(question: str, documents: list, mode: str) -> list:
+    if mode == "batch":
+        numbered = "\n\n".join(f"[{i}] {doc.page_content[:500]}" for i, doc in enumerate(documents, 1))
+        return [{"question": question, "documents": numbered}]
+    return [{"question": question, "document": doc.page_content[:500]} for doc in documents]
+
+
+def _crag_grades_from_outputs(outputs: list, count: int, mode: str) -> list:
+    """Map LLM outputs (or exceptions) to one grade per document; failures count as PARTIAL."""
+    if mode == "batch":
+        output = outputs[0]
+        if isinstance(output, Exception):
+            return ["PARTIAL"] * count
+        match = re.search(r"\{.*\}", output.content, re.DOTALL)
         try:
-            doc_snippet = doc.page_content[:500]
-            result = grading_chain.invoke({
-                "question": question,
-                "document": doc_snippet
-            })
-            grade = result.content.strip().upper()
-            
-            if "RELEVANT" in grade and "IRRELEVANT" not in grade:
-                doc.metadata["crag_grade"] = "RELEVANT"
-                relevant_docs.append(doc)
-            elif "PARTIAL" in grade:
-                doc.metadata["crag_grade"] = "PARTIAL"
-                partial_docs.append(doc)
-            else:
-                doc.metadata["crag_grade"] = "IRRELEVANT"
-                irrelevant_count += 1
-                
-        except Exception as e:
-            doc.metadata["crag_grade"] = "PARTIAL"
-            partial_docs.append(doc)
-    
+            parsed = json.loads(match.group(0)) if match else {}
+        except ValueError:
+            parsed = {}
+        return [_parse_crag_grade(str(parsed.get(str(i), "PARTIAL"))) for i in range(1, count + 1)]
+    return ["PARTIAL" if isinstance(o, Exception) else _parse_crag_grade(o.content) for o in outputs]
+
+
+def _crag_split(documents: list) -> tuple:
+    relevant_docs = [d for d in documents if d.metadata["crag_grade"] == "RELEVANT"]
+    partial_docs = [d for d in documents if d.metadata["crag_grade"] == "PARTIAL"]
+    irrelevant_count = len(documents) - len(relevant_docs) - len(partial_docs)
     return relevant_docs, partial_docs, irrelevant_count
 
 
-def _hybrid_search(db, query: str, hyde_query: str, k_per_method: int = 10) -> list:
-    """Hybrid Search: Vector Search + BM25."""
-    all_docs = []
-    seen_contents = set()
-    
-    # 1. Vector Search with original query
-    vector_retriever = db.as_retriever(
-        search_type="similarity",
-        search_kwargs={"k": k_per_method}
+def _crag_pending(documents: list) -> list:
+    """Apply the cross-encoder shortcut; return the documents that still need the LLM."""
+    pending = []
+    for doc in documents:
+        grade = _shortcut_crag_grade(doc)
+        if grade:
+            doc.metadata["crag_grade"] = grade
+            doc.metadata["crag_graded_by"] = "cross_encoder"
+        else:
+            pending.append(doc)
+    return pending
+
+
+def _crag_apply_grades(pending: list, grades: list):
+    for doc, grade in zip(pending, grades):
+        doc.metadata["crag_grade"] = grade
+        doc.metadata["crag_graded_by"] = "llm"
+
+
+def _crag_grade_documents(llm, question: str, documents: list, mode: str = "parallel") -> tuple:
+    """CRAG: Grade document relevance. Returns (relevant, partial, irrelevant_count)."""
+    pending = _crag_pending(documents)
+    if pending:
+        prompt = crag_batch_grading_prompt if mode == "batch" else crag_grading_prompt
+        outputs = (prompt | llm).batch(
+            _crag_inputs(question, pending, mode),
+            config={"max_concurrency": CRAG_CONCURRENCY},
+            return_exceptions=True
+        )
+        _crag_apply_grades(pending, _crag_grades_from_outputs(outputs, len(pending), mode))
+    return _crag_split(documents)
+
+
+async def _acrag_grade_documents(llm, question: str, documents: list, mode: str = "parallel") -> tuple:
+    """Async variant of _crag_grade_documents (abatch on the event loop)."""
+    pending = _crag_pending(documents)
+    if pending:
+        prompt = crag_batch_grading_prompt if mode == "batch" else crag_grading_prompt
+        outputs = await (prompt | llm).abatch(
+            _crag_inputs(question, pending, mode),
+            config={"max_concurrency": CRAG_CONCURRENCY},
+            return_exceptions=True
+        )
+        _crag_apply_grades(pending, _crag_grades_from_outputs(outputs, len(pending), mode))
+    return _crag_split(documents)
+
+
+# =============================================================================
+# EXPANDED RETRIEVAL (multi-query + HyDE, parallel searches, RRF)
+# =============================================================================
+
+def _query_variants(queries: list, hyde_doc: str) -> tuple:
+    """Dedupe variants (original question first). Returns (variants, retrieval_method per variant)."""
+    labelled = [(q, "vector" if i == 0 else "multi_query") for i, q in enumerate(queries)]
+    labelled.append((hyde_doc, "hyde"))
+    variants, methods = [], []
+    for text, method in labelled:
+        if text and text not in variants:
+            variants.append(text)
+            methods.append(method)
+    return variants, methods
+
+
+def _fuse_variant_results(ranked_lists: list, methods: list, k: int, started: float) -> tuple:
+    # One rank signal per variant over the union of hits (keyed by chunk id), -inf where absent
+    docs = {}
+    for ranked, method in zip(ranked_lists, methods):
+        for doc in ranked:
+            doc.metadata.setdefault("retrieval_method", method)
+            docs.setdefault(doc.id or doc.page_content, doc)
+    keys = list(docs)
+    position = {key: i for i, key in enumerate(keys)}
+    signals = {}
+    for i, ranked in enumerate(ranked_lists):
+        scores = np.full(len(keys), -np.inf)
+        for rank, doc in enumerate(ranked):
+            key = doc.id or doc.page_content
+            scores[position[key]] = max(scores[position[key]], -rank)
+        signals[i] = scores
+    rrf_scores = fusion.reciprocal_rank(signals) if keys else np.empty(0)
+    fused = []
+    for j in fusion.top_k(rrf_scores, k):
+        doc = docs[keys[j]]
+        doc.metadata["rrf_score"] = float(rrf_scores[j])
+        fused.append(doc)
+    info = {
+        "retrieval_mode": "expanded",
+        "query_variants": len(methods),
+        "expansion_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+    print(f"🔀 Expanded retrieval: {len(methods)} variants → {len(fused)} fused docs in {info['expansion_ms']}ms")
+    return fused, info
+
+
+def _expanded_vector_search(llm, collection_name: str, question: str, k: int) -> tuple:
+    """
+    Multi-query and HyDE generation run concurrently, all variants are embedded
+    in one batch and searched in parallel, then fused with RRF.
+    Returns (vector_docs, info).
+    """
+    started = time.perf_counter()
+    queries_future = submit_io(_generate_multi_queries, llm, question)
+    hyde_future = submit_io(_generate_hyde_document, llm, question)
+    variants, methods = _query_variants(queries_future.result(), hyde_future.result())
+
+    vectors = get_embedding_model().embed_documents(variants)
+    futures = [submit_io(_search_by_vector, collection_name, vector, k) for vector in vectors]
+    return _fuse_variant_results([f.result() for f in futures], methods, k, started)
+
+
+async def _aexpanded_vector_search(llm, collection_name: str, question: str, k: int) -> tuple:
+    """Async variant of _expanded_vector_search."""
+    started = time.perf_counter()
+    queries, hyde_doc = await asyncio.gather(
+        _agenerate_multi_queries(llm, question),
+        _agenerate_hyde_document(llm, question)
     )
-    vector_docs = vector_retriever.invoke(query)
-    for doc in vector_docs:
-        content_hash = hash(doc.page_content[:100])
-        if content_hash not in seen_contents:
-            seen_contents.add(content_hash)
-            doc.metadata["retrieval_method"] = "vector"
-            all_docs.append(doc)
-    
-    # 2. Vector Search with HyDE document
-    hyde_docs = vector_retriever.invoke(hyde_query)
-    for doc in hyde_docs:
-        content_hash = hash(doc.page_content[:100])
-        if content_hash not in seen_contents:
-            seen_contents.add(content_hash)
-            doc.metadata["retrieval_method"] = "hyde"
-            all_docs.append(doc)
-    
-    print(f"📊 Hybrid Search: {len(vector_docs)} vector + {len(hyde_docs)} HyDE = {len(all_docs)} unique docs")
-    
-    # 3. BM25 on retrieved docs (for reranking)
-    if all_docs:
-        bm25_ranked = _bm25_search(all_docs.copy(), query, top_k=len(all_docs))
-        # Merge BM25 scores into original docs
-        bm25_scores = {hash(d.page_content[:100]): d.metadata.get("bm25_score", 0) for d in bm25_ranked}
-        for doc in all_docs:
-            doc_hash = hash(doc.page_content[:100])
-            doc.metadata["bm25_score"] = bm25_scores.get(doc_hash, 0)
-    
-    return all_docs
+    variants, methods = _query_variants(queries, hyde_doc)
+
+    vectors = await run_cpu(get_embedding_model().embed_documents, variants)
+    ranked_lists = await asyncio.gather(*[
+        run_io(_search_by_vector, collection_name, vector, k) for vector in vectors
+    ])
+    return _fuse_variant_results(list(ranked_lists), methods, k, started)
 
 
 # =============================================================================
@@ -305,186 +523,469 @@ def _needs_contextualization(question: str) -> bool:
 
 
 # =============================================================================
-# MAIN RAG FUNCTION
+# PIPELINE STAGES (shared by blocking and streaming entry points)
 # =============================================================================
 
-def query_rag_system(question: str, collection_name: str, chat_history: list = None, k_target: int = 10, user_api_key: str = None, llm_provider: str = "groq"):
-    """
-    OPTIMIZED RAG Pipeline:
-    - Vector Search + BM25 Hybrid
-    - Cross-Encoder Reranking
-    - Single LLM call for answer
-    
-    Supports: Groq (LLaMA 3.3) and Google Gemini
-    """
-    
-    # 1. API KEY & LLM INITIALIZATION
-    if llm_provider == "gemini":
-        system_key = os.getenv("GOOGLE_API_KEY")
-        final_api_key = user_api_key if user_api_key and user_api_key.strip() else system_key
-        
-        if not final_api_key:
-            return {"answer": "❌ Error: Missing Google Gemini API Key.", "sources": []}
-        
-        try:
-            llm = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash",
-                temperature=0.2,
-                max_output_tokens=1024,
-                google_api_key=final_api_key
-            )
-        except Exception as e:
-            return {"answer": f"Error initializing Gemini: {str(e)}", "sources": []}
-    else:
-        # Default: Groq
-        system_key = os.getenv("GROQ_API_KEY")
-        final_api_key = user_api_key if user_api_key and user_api_key.strip() else system_key
-        
-        if not final_api_key:
-            return {"answer": "❌ Error: Missing Groq API Key.", "sources": []}
+NO_DOCS_ANSWER = "No relevant information found in the documents."
 
-        try:
-            llm = ChatGroq(
-                model="llama-3.3-70b-versatile",
-                temperature=0.2,
-                max_tokens=1024,
-                api_key=final_api_key
-            )
-        except Exception as e:
-            return {"answer": f"Error initializing LLM: {str(e)}", "sources": []}
 
-    # 2. CONTEXTUALIZATION (only when history exists and question has pronouns/references)
-    standalone_question = question
+def _init_llm(llm_provider: str, user_api_key: str = None):
+    """Shared chat model from the client pool (core/llm_pool.py). Returns (llm, error_message)."""
+    return llm_pool.get_llm(llm_provider, user_api_key)
+
+
+def _contextualization_inputs(question: str, chat_history: list):
+    """Chain inputs for contextualization, or None when the question is self-contained."""
     has_history = chat_history and len(chat_history) > 1
     
     # Only contextualize if question shows signs of needing it
-    need_context = has_history and _needs_contextualization(question)
-    
-    if need_context:
-        try:
-            contextualize_chain = contextualize_q_prompt | llm
-            recent_history = chat_history[-MAX_HISTORY_MESSAGES:-1] if len(chat_history) > MAX_HISTORY_MESSAGES else chat_history[:-1]
-            
-            history_langchain = []
-            for msg in recent_history:
-                if msg["role"] == "user":
-                    history_langchain.append(HumanMessage(content=msg["content"]))
-                else:
-                    history_langchain.append(AIMessage(content=msg["content"]))
-            
-            standalone_question = contextualize_chain.invoke({
-                "chat_history": history_langchain,
-                "input": question
-            }).content.strip()
-            
-            print(f"✨ Contextualized: {standalone_question}")
-        except Exception as e:
-            print(f"⚠️ Contextualization failed: {e}")
-
-    # 3. DATABASE CONNECTION
-    db = Chroma(
-        collection_name=collection_name,
-        persist_directory=CHROMA_DIR,
-        embedding_function=embedding_model 
-    )
+    if not (has_history and _needs_contextualization(question)):
+        return None
 
-    # 4. VECTOR SEARCH (Single query - faster)
-    retriever = db.as_retriever(
-        search_type="similarity",
-        search_kwargs={"k": k_target * 2}
-    )
+    recent_history = chat_history[-MAX_HISTORY_MESSAGES:-1] if len(chat_history) > MAX_HISTORY_MESSAGES else chat_history[:-1]
     
-    all_docs = retriever.invoke(standalone_question)
+    history_langchain = []
+    for msg in recent_history:
+        if msg["role"] == "user":
+            history_langchain.append(HumanMessage(content=msg["content"]))
+        else:
+            history_langchain.append(AIMessage(content=msg["content"]))
+
+    return {"chat_history": history_langchain, "input": question}
+
+
+def _contextualize_question(llm, question: str, chat_history: list) -> tuple:
+    """Rewrite follow-up questions as standalone ones. Returns (standalone_question, contextualized)."""
+    inputs = _contextualization_inputs(question, chat_history)
+    if inputs is None:
+        return question, False
+
+    try:
+        standalone_question = (contextualize_q_prompt | llm).invoke(inputs).content.strip()
+        print(f"✨ Contextualized: {standalone_question}")
+        return standalone_question, True
+    except Exception as e:
+        print(f"⚠️ Contextualization failed: {e}")
+        return question, True
+
+
+async def _acontextualize_question(llm, question: str, chat_history: list) -> tuple:
+    """Async variant of _contextualize_question (non-blocking LLM call)."""
+    inputs = _contextualization_inputs(question, chat_history)
+    if inputs is None:
+        return question, False
+
+    try:
+        standalone_question = (await (contextualize_q_prompt | llm).ainvoke(inputs)).content.strip()
+        print(f"✨ Contextualized: {standalone_question}")
+        return standalone_question, True
+    except Exception as e:
+        print(f"⚠️ Contextualization failed: {e}")
+        return question, True
+
+
+def _retrieve_and_rank(collection_name: str, standalone_question: str, k_target: int, vector_docs: list = None) -> tuple:
+    """
+    Vector + BM25 retrieval, cross-encoder reranking. Returns (final_docs, pipeline_info).
+    vector_docs: precomputed vector hits (expanded retrieval); otherwise a single vector search runs.
+    """
+    started = time.perf_counter()
+
+    if vector_docs is None:
+        # VECTOR SEARCH (Single query - faster; served by the notebook's index backend)
+        query_vector = get_embedding_model().embed_query(standalone_question)
+        vector_docs = _search_by_vector(collection_name, query_vector, k_target * 2)
+        for doc in vector_docs:
+            doc.metadata["retrieval_method"] = "vector"
+
+    # BM25 KEYWORD RETRIEVAL (persistent index - corpus-wide, no LLM)
+    all_docs = _keyword_retrieve(collection_name, standalone_question, vector_docs, top_k=k_target)
     
     if not all_docs:
-        return {
-            "answer": "No relevant information found in the documents.",
-            "sources": [],
-            "raw_docs": [],
-            "pipeline_info": {"retrieval": "no_docs_found"}
-        }
-
-    # 5. BM25 SCORING (Hybrid component - no LLM)
-    bm25_ranked = _bm25_search(all_docs.copy(), standalone_question, top_k=len(all_docs))
-    bm25_scores = {hash(d.page_content[:100]): d.metadata.get("bm25_score", 0) for d in bm25_ranked}
-    
-    # Normalize BM25 scores
-    max_bm25 = max(bm25_scores.values()) if bm25_scores else 1
-    for doc in all_docs:
-        doc_hash = hash(doc.page_content[:100])
-        raw_score = bm25_scores.get(doc_hash, 0)
-        doc.metadata["bm25_score"] = raw_score / max_bm25 if max_bm25 > 0 else 0
-
-    # 6. CROSS-ENCODER RERANKING
-    pairs = [[standalone_question, doc.page_content] for doc in all_docs]
-    rerank_scores = reranker_model.predict(pairs)
-    
+        return [], {"retrieval": "no_docs_found"}
+
+    # Candidates keyed by chunk id (never by content, which collides for boilerplate)
+    docs_by_id = {}
     for i, doc in enumerate(all_docs):
-        doc.metadata["rerank_score"] = float(rerank_scores[i])
-        # Hybrid score: 0.7 * rerank + 0.3 * bm25
-        doc.metadata["hybrid_score"] = 0.7 * doc.metadata["rerank_score"] + 0.3 * doc.metadata["bm25_score"]
-    
-    # Filter và sort by hybrid score
-    min_score_threshold = 0.1
-    filtered_docs = [d for d in all_docs if d.metadata["hybrid_score"] >= min_score_threshold]
-    
-    if not filtered_docs:
-        filtered_docs = sorted(all_docs, key=lambda x: x.metadata["hybrid_score"], reverse=True)[:k_target]
+        docs_by_id.setdefault(doc.id or f"#{i}", doc)
+    all_docs = list(docs_by_id.values())
+
+    bm25_scores = [doc.metadata.get("bm25_score", 0.0) for doc in all_docs]
+    rerank_skipped = reranker.RERANK_SKIP_BELOW_K and len(all_docs) <= k_target
+    if rerank_skipped:
+        # Every candidate is kept anyway: order by retrieval rank + BM25 without the cross-encoder
+        ranked, _ = fusion.fuse(
+            list(docs_by_id),
+            {"retrieval": [-i for i in range(len(all_docs))], "bm25": bm25_scores},
+            {"retrieval": 1.0, "bm25": 1.0},
+            strategy="rrf",
+            k=k_target
+        )
     else:
-        filtered_docs = sorted(filtered_docs, key=lambda x: x.metadata["hybrid_score"], reverse=True)[:k_target]
-    
-    final_docs = filtered_docs
-    
+        # CROSS-ENCODER RERANKING (batched, truncated, score-cached — see core.reranker)
+        rerank_scores = reranker.score(standalone_question, [(doc.id, doc.page_content) for doc in all_docs])
+        for doc, score in zip(all_docs, rerank_scores):
+            doc.metadata["rerank_score"] = score
+
+        # HYBRID FUSION (logits and BM25 normalized onto one scale, top-k via argpartition)
+        ranked, _ = fusion.fuse(
+            list(docs_by_id),
+            {"rerank": rerank_scores, "bm25": bm25_scores},
+            FUSION_WEIGHTS,
+            strategy=FUSION_STRATEGY,
+            normalizers=FUSION_NORMALIZERS,
+            k=k_target,
+            min_score=FUSION_MIN_SCORE if FUSION_STRATEGY == "weighted" else None
+        )
+    final_docs = []
+    for chunk_id, score in ranked:
+        docs_by_id[chunk_id].metadata["hybrid_score"] = score
+        final_docs.append(docs_by_id[chunk_id])
+
     top_scores = [round(d.metadata["hybrid_score"], 2) for d in final_docs[:3]]
     print(f"🎯 Selected {len(final_docs)} docs (hybrid scores: {top_scores}...)")
 
     if not final_docs:
-        return {
-            "answer": "No relevant information found in the documents.",
-            "sources": [],
-            "raw_docs": [],
-            "pipeline_info": {"retrieval": "no_relevant_docs"}
-        }
+        return [], {"retrieval": "no_relevant_docs"}
+
+    return final_docs, {
+        "total_retrieved": len(all_docs),
+        "vector_hits": len(vector_docs),
+        "keyword_only_hits": len(all_docs) - len(vector_docs),
+        "final_docs": len(final_docs),
+        "rerank_skipped": rerank_skipped,
+        "retrieval_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+
+
+def _resolve_retrieval_mode(retrieval_mode: str = None) -> str:
+    mode = (retrieval_mode or RETRIEVAL_MODE).lower()
+    return mode if mode in RETRIEVAL_MODES else "standard"
+
+
+def _retrieve(llm, collection_name: str, standalone_question: str, k_target: int, retrieval_mode: str) -> tuple:
+    """Retrieval stage for the chosen mode. Returns (final_docs, pipeline_info)."""
+    vector_docs, expansion_info = None, {}
+    if retrieval_mode == "expanded":
+        vector_docs, expansion_info = _expanded_vector_search(llm, collection_name, standalone_question, k_target * 2)
+    final_docs, pipeline_info = _retrieve_and_rank(collection_name, standalone_question, k_target, vector_docs)
+    pipeline_info.update(expansion_info)
+    return final_docs, pipeline_info
+
+
+async def _aretrieve(llm, collection_name: str, standalone_question: str, k_target: int, retrieval_mode: str) -> tuple:
+    vector_docs, expansion_info = None, {}
+    if retrieval_mode == "expanded":
+        vector_docs, expansion_info = await _aexpanded_vector_search(llm, collection_name, standalone_question, k_target * 2)
+    # With micro-batching the forward passes run on the batcher threads, so this
+    # stage mostly waits; the wider I/O pool lets more requests share a batch.
+    run_stage = run_io if MICROBATCH_ENABLED else run_cpu
+    final_docs, pipeline_info = await run_stage(_retrieve_and_rank, collection_name, standalone_question, k_target, vector_docs)
+    pipeline_info.update(expansion_info)
+    return final_docs, pipeline_info
+
+
+def _resolve_crag_mode(crag_mode: str = None) -> str:
+    mode = (crag_mode or CRAG_MODE).lower()
+    return mode if mode in CRAG_MODES else "off"
+
+
+def _crag_result(final_docs: list, graded: tuple, mode: str, started: float, pipeline_info: dict) -> list:
+    """Drop IRRELEVANT docs (keeping hybrid order) and record grading stats + latency."""
+    relevant_docs, partial_docs, irrelevant_count = graded
+    kept = [d for d in final_docs if d.metadata.get("crag_grade") != "IRRELEVANT"]
+    pipeline_info["crag"] = {
+        "mode": mode,
+        "relevant": len(relevant_docs),
+        "partial": len(partial_docs),
+        "irrelevant": irrelevant_count,
+        "llm_graded": sum(d.metadata.get("crag_graded_by") == "llm" for d in final_docs),
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        # Everything graded irrelevant: answer from the ranked docs rather than from nothing
+        "fallback": not kept
+    }
+    print(f"🧪 CRAG ({mode}): {len(relevant_docs)} relevant, {len(partial_docs)} partial, "
+          f"{irrelevant_count} irrelevant in {pipeline_info['crag']['latency_ms']}ms")
+    return kept or final_docs
+
+
+def _crag_stage(llm, question: str, final_docs: list, pipeline_info: dict, mode: str) -> list:
+    started = time.perf_counter()
+    graded = _crag_grade_documents(llm, question, final_docs, mode)
+    return _crag_result(final_docs, graded, mode, started, pipeline_info)
+
+
+async def _acrag_stage(llm, question: str, final_docs: list, pipeline_info: dict, mode: str) -> list:
+    started = time.perf_counter()
+    graded = await _acrag_grade_documents(llm, question, final_docs, mode)
+    return _crag_result(final_docs, graded, mode, started, pipeline_info)
+
+
+def _build_answer_messages(question: str, chat_history: list, collection_name: str, final_docs: list,
+                           pipeline_info: dict = None, llm_provider: str = None) -> list:
+    """Assemble the answer prompt from deduplicated, token-budgeted parent contexts."""
+    # Parents are resolved in one batched docstore lookup; legacy collections
+    # still carry `parent_content` in their metadata.
+    parent_map = get_parents(collection_name, [d.metadata.get("parent_id") for d in final_docs])
+    context_text, context_info = build_context(final_docs, parent_map, llm_pool.context_budget(llm_provider))
+    if pipeline_info is not None:
+        pipeline_info["context"] = context_info
+
+    if chat_history and len(chat_history) > 1:
+        conversation_summary = _summarize_conversation(chat_history)
+        return rag_prompt_with_history.format_messages(
+            context=context_text, 
+            question=question,
+            conversation_summary=conversation_summary
+        )
+    return rag_prompt_no_history.format_messages(
+        context=context_text, 
+        question=question
+    )
 
-    # 7. GENERATE ANSWER (Single LLM call — uses Parent Content)
-    context_text = "\n\n---\n\n".join([
-        f"[Source: {d.metadata.get('source', 'Unknown')}]\n{d.metadata.get('parent_content', d.page_content)}" 
-        for d in final_docs
-    ])
+
+def _result_metadata(question: str, standalone_question: str, final_docs: list, pipeline_info: dict) -> dict:
+    """Everything in the response except the answer text."""
+    return {
+        "sources": list(set([d.metadata.get("source", "Unknown") for d in final_docs])),
+        "raw_docs": [
+            f"[Score: {d.metadata.get('hybrid_score', 0):.2f}] {d.page_content[:200]}..." 
+            for d in final_docs
+        ],
+        "standalone_question": standalone_question if standalone_question != question else None,
+        "pipeline_info": pipeline_info
+    }
+
+
+def _cached_answer(question: str, standalone_question: str, collection_name: str, scope: tuple):
+    """Cached result for this standalone question (pipeline_info["cache"] = exact/semantic), or None."""
+    start = time.perf_counter()
+    hit = answer_cache.lookup(collection_name, standalone_question, scope=scope)
+    if hit is None:
+        return None
+    result, kind = hit
+    result["standalone_question"] = standalone_question if standalone_question != question else None
+    result.setdefault("pipeline_info", {})
+    result["pipeline_info"]["cache"] = kind
+    result["pipeline_info"]["cache_lookup_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    print(f"💾 Answer cache {kind} hit for '{collection_name}'")
+    return result
+
+
+def _cached_events(result: dict):
+    """Stream events replaying a cached result."""
+    yield {"type": "metadata", **{k: v for k, v in result.items() if k != "answer"}}
+    yield {"type": "token", "content": result["answer"]}
+    yield {"type": "done", "answer": result["answer"]}
+
+
+# =============================================================================
+# MAIN RAG FUNCTION
+# =============================================================================
+
+def query_rag_system(question: str, collection_name: str, chat_history: list = None, k_target: int = 10, user_api_key: str = None, llm_provider: str = "groq", crag_mode: str = None, retrieval_mode: str = None):
+    """
+    OPTIMIZED RAG Pipeline:
+    - Vector Search + BM25 Hybrid (retrieval_mode "expanded": parallel multi-query + HyDE, RRF-fused)
+    - Cross-Encoder Reranking
+    - Optional CRAG grading (crag_mode: "off" | "parallel" | "batch", default EASYRESEARCH_CRAG)
+    - Single LLM call for answer
     
+    Supports: Groq (LLaMA 3.3) and Google Gemini
+    """
+    
+    # 1. API KEY & LLM INITIALIZATION
+    llm, error = _init_llm(llm_provider, user_api_key)
+    if error:
+        return {"answer": error, "sources": []}
+
+    # 2. CONTEXTUALIZATION (only when history exists and question has pronouns/references)
+    standalone_question, need_context = _contextualize_question(llm, question, chat_history)
+
+    # ANSWER CACHE (same notebook version + same/near-identical question → no retrieval, no LLM call)
+    crag_mode = _resolve_crag_mode(crag_mode)
+    retrieval_mode = _resolve_retrieval_mode(retrieval_mode)
+    cache_scope = (k_target, llm_provider, crag_mode, retrieval_mode)
+    cached = _cached_answer(question, standalone_question, collection_name, cache_scope)
+    if cached:
+        return cached
+
+    # 3-6. RETRIEVAL + RERANKING
+    final_docs, pipeline_info = _retrieve(llm, collection_name, standalone_question, k_target, retrieval_mode)
+    if not final_docs:
+        return {"answer": NO_DOCS_ANSWER, "sources": [], "raw_docs": [], "pipeline_info": pipeline_info}
+    pipeline_info["contextualized"] = need_context
+
+    # CRAG GRADING (optional; drops documents graded IRRELEVANT)
+    if crag_mode != "off":
+        final_docs = _crag_stage(llm, standalone_question, final_docs, pipeline_info, crag_mode)
+
+    # 7. GENERATE ANSWER (Single LLM call — uses Parent Content)
     try:
-        if has_history:
-            conversation_summary = _summarize_conversation(chat_history)
-            messages = rag_prompt_with_history.format_messages(
-                context=context_text, 
-                question=question,
-                conversation_summary=conversation_summary
-            )
-        else:
-            messages = rag_prompt_no_history.format_messages(
-                context=context_text, 
-                question=question
-            )
-        
+        messages = _build_answer_messages(question, chat_history, collection_name, final_docs, pipeline_info, llm_provider)
         response = llm.invoke(messages)
         answer_text = response.content.strip()
-            
     except Exception as e:
         answer_text = f"❌ Error calling API: {str(e)}"
 
-    source_names = list(set([d.metadata.get("source", "Unknown") for d in final_docs]))
+    result = {"answer": answer_text, **_result_metadata(question, standalone_question, final_docs, pipeline_info)}
+    answer_cache.store(collection_name, standalone_question, result, scope=cache_scope)
+    return result
 
-    return {
-        "answer": answer_text,
-        "sources": source_names,
-        "raw_docs": [
-            f"[Score: {d.metadata.get('hybrid_score', 0):.2f}] {d.page_content[:200]}..." 
-            for d in final_docs
-        ],
-        "standalone_question": standalone_question if standalone_question != question else None,
-        "pipeline_info": {
-            "total_retrieved": len(all_docs),
-            "final_docs": len(final_docs),
-            "contextualized": need_context
-        }
-    }
\ No newline at end of file
+
+def stream_rag_system(question: str, collection_name: str, chat_history: list = None, k_target: int = 10, user_api_key: str = None, llm_provider: str = "groq", crag_mode: str = None, retrieval_mode: str = None):
+    """
+    Streaming variant of query_rag_system (same pipeline stages).
+
+    Yields events as dicts:
+    - {"type": "metadata", "sources", "raw_docs", "standalone_question", "pipeline_info"} once retrieval is done
+    - {"type": "token", "content": str} for each LLM chunk as it arrives
+    - {"type": "done", "answer": str} with the full answer
+    Errors are streamed as answer text, exactly like query_rag_system returns them.
+    """
+    llm, error = _init_llm(llm_provider, user_api_key)
+    if error:
+        yield {"type": "metadata", "sources": [], "raw_docs": [], "standalone_question": None, "pipeline_info": {}}
+        yield {"type": "token", "content": error}
+        yield {"type": "done", "answer": error}
+        return
+
+    standalone_question, need_context = _contextualize_question(llm, question, chat_history)
+
+    crag_mode = _resolve_crag_mode(crag_mode)
+    retrieval_mode = _resolve_retrieval_mode(retrieval_mode)
+    cache_scope = (k_target, llm_provider, crag_mode, retrieval_mode)
+    cached = _cached_answer(question, standalone_question, collection_name, cache_scope)
+    if cached:
+        yield from _cached_events(cached)
+        return
+
+    final_docs, pipeline_info = _retrieve(llm, collection_name, standalone_question, k_target, retrieval_mode)
+    if not final_docs:
+        yield {"type": "metadata", "sources": [], "raw_docs": [], "standalone_question": None, "pipeline_info": pipeline_info}
+        yield {"type": "token", "content": NO_DOCS_ANSWER}
+        yield {"type": "done", "answer": NO_DOCS_ANSWER}
+        return
+    pipeline_info["contextualized"] = need_context
+
+    # CRAG GRADING (optional; drops documents graded IRRELEVANT)
+    if crag_mode != "off":
+        final_docs = _crag_stage(llm, standalone_question, final_docs, pipeline_info, crag_mode)
+
+    metadata = _result_metadata(question, standalone_question, final_docs, pipeline_info)
+    yield {"type": "metadata", **metadata}
+
+    parts = []
+    failed = False
+    try:
+        messages = _build_answer_messages(question, chat_history, collection_name, final_docs, pipeline_info, llm_provider)
+        for chunk in llm.stream(messages):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield {"type": "token", "content": chunk.content}
+    except Exception as e:
+        failed = True
+        error_text = f"❌ Error calling API: {str(e)}"
+        parts.append(("\n\n" if parts else "") + error_text)
+        yield {"type": "token", "content": parts[-1]}
+
+    answer_text = "".join(parts).strip()
+    if not failed:
+        answer_cache.store(collection_name, standalone_question, {"answer": answer_text, **metadata}, scope=cache_scope)
+    yield {"type": "done", "answer": answer_text}
+
+
+# =============================================================================
+# ASYNC RAG FUNCTIONS (FastAPI)
+# =============================================================================
+# Same stages as above, but LLM calls use ainvoke/astream and the CPU-bound
+# retrieval + reranking stage runs on the bounded CPU executor, so concurrent
+# requests on one event loop overlap instead of serializing.
+
+async def aquery_rag_system(question: str, collection_name: str, chat_history: list = None, k_target: int = 10, user_api_key: str = None, llm_provider: str = "groq", crag_mode: str = None, retrieval_mode: str = None):
+    """Async variant of query_rag_system."""
+    llm, error = _init_llm(llm_provider, user_api_key)
+    if error:
+        return {"answer": error, "sources": []}
+
+    standalone_question, need_context = await _acontextualize_question(llm, question, chat_history)
+
+    crag_mode = _resolve_crag_mode(crag_mode)
+    retrieval_mode = _resolve_retrieval_mode(retrieval_mode)
+    cache_scope = (k_target, llm_provider, crag_mode, retrieval_mode)
+    cached = await run_cpu(_cached_answer, question, standalone_question, collection_name, cache_scope)
+    if cached:
+        return cached
+
+    final_docs, pipeline_info = await _aretrieve(llm, collection_name, standalone_question, k_target, retrieval_mode)
+    if not final_docs:
+        return {"answer": NO_DOCS_ANSWER, "sources": [], "raw_docs": [], "pipeline_info": pipeline_info}
+    pipeline_info["contextualized"] = need_context
+
+    if crag_mode != "off":
+        final_docs = await _acrag_stage(llm, standalone_question, final_docs, pipeline_info, crag_mode)
+
+    try:
+        messages = await run_io(_build_answer_messages, question, chat_history, collection_name, final_docs, pipeline_info, llm_provider)
+        response = await llm.ainvoke(messages)
+        answer_text = response.content.strip()
+    except Exception as e:
+        answer_text = f"❌ Error calling API: {str(e)}"
+
+    result = {"answer": answer_text, **_result_metadata(question, standalone_question, final_docs, pipeline_info)}
+    await run_cpu(answer_cache.store, collection_name, standalone_question, result, cache_scope)
+    return result
+
+
+async def astream_rag_system(question: str, collection_name: str, chat_history: list = None, k_target: int = 10, user_api_key: str = None, llm_provider: str = "groq", crag_mode: str = None, retrieval_mode: str = None):
+    """Async variant of stream_rag_system (same event sequence)."""
+    llm, error = _init_llm(llm_provider, user_api_key)
+    if error:
+        yield {"type": "metadata", "sources": [], "raw_docs": [], "standalone_question": None, "pipeline_info": {}}
+        yield {"type": "token", "content": error}
+        yield {"type": "done", "answer": error}
+        return
+
+    standalone_question, need_context = await _acontextualize_question(llm, question, chat_history)
+
+    crag_mode = _resolve_crag_mode(crag_mode)
+    retrieval_mode = _resolve_retrieval_mode(retrieval_mode)
+    cache_scope = (k_target, llm_provider, crag_mode, retrieval_mode)
+    cached = await run_cpu(_cached_answer, question, standalone_question, collection_name, cache_scope)
+    if cached:
+        for event in _cached_events(cached):
+            yield event
+        return
+
+    final_docs, pipeline_info = await _aretrieve(llm, collection_name, standalone_question, k_target, retrieval_mode)
+    if not final_docs:
+        yield {"type": "metadata", "sources": [], "raw_docs": [], "standalone_question": None, "pipeline_info": pipeline_info}
+        yield {"type": "token", "content": NO_DOCS_ANSWER}
+        yield {"type": "done", "answer": NO_DOCS_ANSWER}
+        return
+    pipeline_info["contextualized"] = need_context
+
+    if crag_mode != "off":
+        final_docs = await _acrag_stage(llm, standalone_question, final_docs, pipeline_info, crag_mode)
+
+    metadata = _result_metadata(question, standalone_question, final_docs, pipeline_info)
+    yield {"type": "metadata", **metadata}
+
+    parts = []
+    failed = False
+    try:
+        messages = await run_io(_build_answer_messages, question, chat_history, collection_name, final_docs, pipeline_info, llm_provider)
+        async for chunk in llm.astream(messages):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield {"type": "token", "content": chunk.content}
+    except Exception as e:
+        failed = True
+        error_text = f"❌ Error calling API: {str(e)}"
+        parts.append(("\n\n" if parts else "") + error_text)
+        yield {"type": "token", "content": parts[-1]}
+
+    answer_text = "".join(parts).strip()
+    if not failed:
+        await run_cpu(answer_cache.store, collection_name, standalone_question, {"answer": answer_text, **metadata}, cache_scope)
+    yield {"type": "done", "answer": answer_text}
@@ -0,0 +1,80 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from core.loader import load_and_split_document
+from core.embedder import write_chunk_groups
+from core.manifest import is_file_unchanged, get_file_entry
+
+# =============================================================================
+# PARALLEL MULTI-DOCUMENT INGESTION
+# =============================================================================
+# Parsing (PyPDFLoader, docx2txt) and the two-level splitting are pure Python
+# and GIL-bound, so they run in a process pool. Parsed files stream into one
+# shared embedding stage (cross-document batches) with pipelined ChromaDB
+# writes — see core.embedder.write_chunk_groups.
+PARSE_WORKERS = int(os.getenv("EASYRESEARCH_PARSE_WORKERS", str(os.cpu_count() or 1)))
+
+
+def _parse_file(file_path):
+    """Runs in a worker process. Returns (chunks, pages_parsed)."""
+    pages = {}
+    chunks = load_and_split_document(file_path, progress_callback=lambda **counts: pages.update(counts))
+    return chunks, pages.get("pages_parsed", 0)
+
+
+def ingest_files(file_paths, collection_name, max_workers=None, progress_callback=None):
+    """
+    Ingest many files into one collection.
+
+    progress_callback (optional) is called as progress_callback(filename, **counts)
+    with pages_parsed / chunks_total after parsing and chunks_embedded /
+    batches_written as batches complete.
+
+    Returns dict filename -> number of chunks, or the Exception that file raised
+    while parsing. Errors in the embed/write stage are raised.
+    """
+    results = {}
+
+    # Skip files whose name + bytes match the manifest before paying for parsing
+    changed_paths = []
+    for path in file_paths:
+        filename = os.path.basename(path)
+        if is_file_unchanged(collection_name, path):
+            chunk_count = len(get_file_entry(collection_name, filename)["chunk_ids"])
+            results[filename] = chunk_count
+            print(f"⏭️ '{filename}' unchanged — skipped")
+            if progress_callback:
+                progress_callback(filename, chunks_total=chunk_count, chunks_embedded=chunk_count)
+        else:
+            changed_paths.append(path)
+    file_paths = changed_paths
+    if not file_paths:
+        return results
+
+    workers = max(1, min(max_workers or PARSE_WORKERS, len(file_paths)))
+
+    def _parsed_groups():
+        # spawn: forking a process that already holds torch/Chroma threads is unsafe
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(_parse_file, path): path for path in file_paths}
+            for future in as_completed(futures):
+                filename = os.path.basename(futures[future])
+                try:
+                    chunks, pages_parsed = future.result()
+                except Exception as e:
+                    print(f"❌ Failed to parse {filename}: {e}")
+                    results[filename] = e
+                    continue
+                results[filename] = len(chunks)
+                if progress_callback:
+                    progress_callback(filename, pages_parsed=pages_parsed, chunks_total=len(chunks))
+                yield chunks
+
+    def _on_batch(per_source):
+        if progress_callback:
+            for filename, counts in per_source.items():
+                progress_callback(filename, **counts)
+
+    print(f"🚚 Ingesting {len(file_paths)} files into '{collection_name}' with {workers} parser processes")
+    write_chunk_groups(_parsed_groups(), collection_name, _on_batch)
+    return results
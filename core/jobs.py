@@ -0,0 +1,274 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.storage import SQLiteStore
+from core.loader import load_and_split_document
+from core.embedder import add_to_vector_db
+from core.ingest import ingest_files
+from core.manifest import is_file_unchanged, get_file_entry
+
+# =============================================================================
+# BACKGROUND INGESTION JOBS
+# =============================================================================
+# Uploads are saved to disk and queued here; a worker pool parses, splits,
+# embeds and writes them while the caller polls the job row for progress.
+JOBS_DB_PATH = "database/jobs.db"
+UPLOAD_DIR = "uploads"
+INGEST_WORKERS = int(os.getenv("EASYRESEARCH_INGEST_WORKERS", "2"))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id              TEXT PRIMARY KEY,
+    collection      TEXT NOT NULL,
+    filename        TEXT NOT NULL,
+    file_path       TEXT NOT NULL,
+    status          TEXT NOT NULL,
+    pages_parsed    INTEGER NOT NULL DEFAULT 0,
+    chunks_total    INTEGER NOT NULL DEFAULT 0,
+    chunks_embedded INTEGER NOT NULL DEFAULT 0,
+    batches_written INTEGER NOT NULL DEFAULT 0,
+    error           TEXT,
+    worker_pid      INTEGER,
+    created_at      REAL NOT NULL,
+    updated_at      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_collection ON jobs (collection, created_at);
+"""
+
+_JOB_FIELDS = [
+    "id", "collection", "filename", "file_path", "status", "pages_parsed", "chunks_total",
+    "chunks_embedded", "batches_written", "error", "worker_pid", "created_at", "updated_at"
+]
+
+_store = SQLiteStore(JOBS_DB_PATH, _SCHEMA)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="easyresearch-ingest")
+        return _executor
+
+
+def _update_job(job_id, **fields):
+    fields["updated_at"] = time.time()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    _store.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id])
+
+
+def _run_job(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return
+    _update_job(job_id, status=JOB_RUNNING, worker_pid=os.getpid(), error=None)
+    try:
+        # Same name + same bytes as what is already ingested: nothing to do
+        if is_file_unchanged(job["collection"], job["file_path"]):
+            entry = get_file_entry(job["collection"], job["filename"])
+            chunk_count = len(entry["chunk_ids"])
+            _update_job(job_id, status=JOB_DONE, chunks_total=chunk_count, chunks_embedded=chunk_count)
+            print(f"⏭️ Job {job_id[:8]}: {job['filename']} unchanged — skipped")
+            return
+
+        chunks = load_and_split_document(
+            job["file_path"],
+            progress_callback=lambda **counts: _update_job(job_id, **counts)
+        )
+        _update_job(job_id, chunks_total=len(chunks))
+
+        # add_to_vector_db rolls back its own writes on failure
+        add_to_vector_db(
+            chunks,
+            collection_name=job["collection"],
+            progress_callback=lambda **counts: _update_job(job_id, **counts)
+        )
+        _update_job(job_id, status=JOB_DONE)
+        print(f"✅ Job {job_id[:8]} done: {job['filename']} → '{job['collection']}' ({len(chunks)} chunks)")
+    except Exception as e:
+        print(f"❌ Job {job_id[:8]} failed: {e}")
+        _update_job(job_id, status=JOB_FAILED, error=str(e))
+    finally:
+        _discard_upload(job["file_path"])
+
+
+def new_upload_path(filename):
+    """Unique path for a job's upload that keeps the original file name (used as `source`)."""
+    job_dir = os.path.join(UPLOAD_DIR, uuid.uuid4().hex)
+    os.makedirs(job_dir, exist_ok=True)
+    return os.path.join(job_dir, os.path.basename(filename))
+
+
+def _discard_upload(file_path):
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    job_dir = os.path.dirname(file_path)
+    if os.path.dirname(job_dir) == UPLOAD_DIR and os.path.isdir(job_dir) and not os.listdir(job_dir):
+        os.rmdir(job_dir)
+
+
+def _run_batch(job_ids):
+    """Run several file jobs of one collection through the parallel ingestion pipeline."""
+    jobs = [job for job in (get_job(job_id) for job_id in job_ids) if job]
+    if not jobs:
+        return
+    collection_name = jobs[0]["collection"]
+
+    # ingest_files reports per file name (the chunk `source`), so a name may only
+    # appear once per batch; submit_batch_ingest_job rejects such batches up front
+    by_filename = {}
+    for job in jobs:
+        if job["filename"] in by_filename:
+            _update_job(job["id"], status=JOB_FAILED, error=f"Duplicate file name in batch: {job['filename']}")
+            _discard_upload(job["file_path"])
+            continue
+        by_filename[job["filename"]] = job
+        _update_job(job["id"], status=JOB_RUNNING, worker_pid=os.getpid(), error=None)
+    jobs = list(by_filename.values())
+
+    def _on_progress(filename, **counts):
+        if filename in by_filename:
+            _update_job(by_filename[filename]["id"], **counts)
+
+    try:
+        results = ingest_files([job["file_path"] for job in jobs], collection_name, progress_callback=_on_progress)
+        for job in jobs:
+            outcome = results.get(job["filename"])
+            if isinstance(outcome, Exception) or outcome is None:
+                _update_job(job["id"], status=JOB_FAILED, error=str(outcome or "File was not processed"))
+            else:
+                _update_job(job["id"], status=JOB_DONE)
+        print(f"✅ Batch of {len(jobs)} jobs finished for '{collection_name}'")
+    except Exception as e:
+        # The embed/write stage is shared (and rolled back as a whole), so every file fails
+        print(f"❌ Batch ingestion failed: {e}")
+        for job in jobs:
+            _update_job(job["id"], status=JOB_FAILED, error=str(e))
+    finally:
+        for job in jobs:
+            _discard_upload(job["file_path"])
+
+
+def duplicate_filenames(names):
+    """File names (or paths) whose base name occurs more than once, in first-seen order."""
+    seen, duplicates = set(), []
+    for name in names:
+        base = os.path.basename(name)
+        if base in seen and base not in duplicates:
+            duplicates.append(base)
+        seen.add(base)
+    return duplicates
+
+
+def _insert_job(file_path, collection_name, filename=None):
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    _store.execute(
+        "INSERT INTO jobs (id, collection, filename, file_path, status, worker_pid, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (job_id, collection_name, filename or os.path.basename(file_path), file_path, JOB_QUEUED,
+         os.getpid(), now, now)
+    )
+    return job_id
+
+
+def submit_ingest_job(file_path, collection_name, filename=None):
+    """Queue a saved file for ingestion. The job owns (and finally deletes) the file. Returns job id."""
+    job_id = _insert_job(file_path, collection_name, filename)
+    _get_executor().submit(_run_job, job_id)
+    return job_id
+
+
+def submit_batch_ingest_job(file_paths, collection_name):
+    """
+    Queue many saved files as one parallel batch (process-pool parsing, shared
+    embedding batches). Each file still gets its own job row. Returns job ids.
+    File names must be unique within a batch (they become the chunk `source`).
+    """
+    duplicates = duplicate_filenames(file_paths)
+    if duplicates:
+        raise ValueError(f"Duplicate file names in batch: {', '.join(duplicates)}")
+    if len(file_paths) == 1:
+        return [submit_ingest_job(file_paths[0], collection_name)]
+    job_ids = [_insert_job(path, collection_name) for path in file_paths]
+    _get_executor().submit(_run_batch, job_ids)
+    return job_ids
+
+
+def get_job(job_id):
+    """Return a job as a dict (with a 0-1 `progress` estimate), or None."""
+    rows = _store.query(f"SELECT {', '.join(_JOB_FIELDS)} FROM jobs WHERE id = ?", (job_id,))
+    if not rows:
+        return None
+    return _job_dict(rows[0])
+
+
+def list_jobs(collection_name=None, limit=50):
+    """Most recent jobs first, optionally for one collection."""
+    if collection_name:
+        rows = _store.query(
+            f"SELECT {', '.join(_JOB_FIELDS)} FROM jobs WHERE collection = ? ORDER BY created_at DESC LIMIT ?",
+            (collection_name, limit)
+        )
+    else:
+        rows = _store.query(
+            f"SELECT {', '.join(_JOB_FIELDS)} FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+        )
+    return [_job_dict(row) for row in rows]
+
+
+def _job_dict(row):
+    job = dict(zip(_JOB_FIELDS, row))
+    if job["status"] in (JOB_DONE, JOB_FAILED):
+        job["progress"] = 1.0
+    elif job["chunks_total"]:
+        # Parsing/splitting counts as the first 10%, embedding + writing the rest
+        job["progress"] = round(0.1 + 0.9 * job["chunks_embedded"] / job["chunks_total"], 3)
+    else:
+        job["progress"] = 0.05 if job["pages_parsed"] else 0.0
+    return job
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def resume_pending_jobs():
+    """
+    Re-queue jobs left behind by a stopped process (call once on startup).
+    Jobs still owned by a live process are left alone.
+    """
+    rows = _store.query(
+        "SELECT id, status, file_path, worker_pid FROM jobs WHERE status IN (?, ?)",
+        (JOB_QUEUED, JOB_RUNNING)
+    )
+    resumed = 0
+    for job_id, _status, file_path, worker_pid in rows:
+        if worker_pid != os.getpid() and _pid_alive(worker_pid):
+            continue
+        if not os.path.exists(file_path):
+            _update_job(job_id, status=JOB_FAILED, error="Interrupted: uploaded file no longer available")
+            continue
+        _update_job(job_id, status=JOB_QUEUED, worker_pid=os.getpid())
+        _get_executor().submit(_run_job, job_id)
+        resumed += 1
+    if resumed:
+        print(f"🔁 Resumed {resumed} ingestion job(s)")
+    return resumed
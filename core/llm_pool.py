@@ -0,0 +1,356 @@
+import os
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager
+from langchain_core.runnables import Runnable
+
+# =============================================================================
+# POOLED LLM CLIENTS
+# =============================================================================
+# Chat models are created once per (provider, model, api key hash, params) and
+# reused across requests, so their HTTP connections (and TLS sessions) stay
+# alive; Groq clients additionally share one keep-alive httpx pool. Every call
+# goes through a per-provider concurrency limit and retries rate limits (429)
+# with exponential backoff and full jitter, honouring Retry-After.
+#
+# EASYRESEARCH_<PROVIDER>_BASE_URL points a provider at another endpoint (e.g.
+# the mock server in benchmarks/llm_pool_benchmark.py).
+LLM_POOL_MAX_CLIENTS = int(os.getenv("EASYRESEARCH_LLM_POOL_MAX_CLIENTS", "64"))
+LLM_RETRY_ATTEMPTS = int(os.getenv("EASYRESEARCH_LLM_RETRY_ATTEMPTS", "4"))
+LLM_RETRY_BASE_S = float(os.getenv("EASYRESEARCH_LLM_RETRY_BASE_S", "0.5"))
+LLM_RETRY_MAX_S = float(os.getenv("EASYRESEARCH_LLM_RETRY_MAX_S", "8"))
+LLM_KEEPALIVE_CONNECTIONS = int(os.getenv("EASYRESEARCH_LLM_KEEPALIVE", "20"))
+LLM_TIMEOUT_S = float(os.getenv("EASYRESEARCH_LLM_TIMEOUT", "60"))
+DEFAULT_PROVIDER = "groq"
+
+# Offline provider "local": an OpenAI-compatible server (llama.cpp server, vLLM,
+# Ollama's /v1) or, with EASYRESEARCH_LOCAL_MODEL_PATH set, a GGUF model run
+# in-process by llama-cpp-python on LOCAL_THREADS CPU threads.
+LOCAL_BASE_URL = "http://127.0.0.1:8080/v1"  # default for EASYRESEARCH_LOCAL_BASE_URL
+LOCAL_MODEL = os.getenv("EASYRESEARCH_LOCAL_MODEL", "local")
+LOCAL_MODEL_PATH = os.getenv("EASYRESEARCH_LOCAL_MODEL_PATH")
+LOCAL_CONTEXT_LENGTH = int(os.getenv("EASYRESEARCH_LOCAL_CTX", "4096"))
+LOCAL_THREADS = int(os.getenv("EASYRESEARCH_LOCAL_THREADS", str(os.cpu_count() or 4)))
+LOCAL_PROMPT_RESERVE = 1536  # tokens of the local window kept for instructions, history and the answer
+
+
+# ---------------------------------------------------------
+# Provider registry
+# ---------------------------------------------------------
+
+def _base_url(provider):
+    return os.getenv(f"EASYRESEARCH_{provider.upper()}_BASE_URL") or None
+
+
+def _create_groq(model, api_key, params):
+    from langchain_groq import ChatGroq
+    http_client, http_async_client = _http_clients("groq")
+    options = {"temperature": 0.2, "max_tokens": 1024, **params}
+    if _base_url("groq"):
+        options["base_url"] = _base_url("groq")
+    if http_client is not None:
+        options.update(http_client=http_client, http_async_client=http_async_client)
+    # Rate limits are retried here (with the provider's concurrency slot held), not in the SDK
+    return ChatGroq(model=model, api_key=api_key, max_retries=0, **options)
+
+
+def _create_gemini(model, api_key, params):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    options = {"temperature": 0.2, "max_output_tokens": 1024, **params}
+    # ResourceExhausted (429) is retried by the pool, not underneath it by the SDK
+    return ChatGoogleGenerativeAI(
+        model=model, google_api_key=api_key, timeout=LLM_TIMEOUT_S, max_retries=0, **options
+    )
+
+
+def _create_local(model, api_key, params):
+    options = {"temperature": 0.2, "max_tokens": 1024, **params}
+    if LOCAL_MODEL_PATH:
+        from langchain_community.chat_models import ChatLlamaCpp
+        return ChatLlamaCpp(
+            model_path=LOCAL_MODEL_PATH, n_ctx=LOCAL_CONTEXT_LENGTH, n_threads=LOCAL_THREADS,
+            verbose=False, **options
+        )
+    from langchain_openai import ChatOpenAI
+    http_client, http_async_client = _http_clients("local")
+    if http_client is not None:
+        options.update(http_client=http_client, http_async_client=http_async_client)
+    return ChatOpenAI(
+        model=model, base_url=_base_url("local") or LOCAL_BASE_URL, api_key=api_key or "local",
+        timeout=LLM_TIMEOUT_S, max_retries=0, **options
+    )
+
+
+PROVIDERS = {
+    "groq": {
+        "label": "Groq",
+        "env_key": "GROQ_API_KEY",
+        "model": "llama-3.3-70b-versatile",
+        "concurrency": int(os.getenv("EASYRESEARCH_GROQ_CONCURRENCY", "8")),
+        "create": _create_groq,
+    },
+    "gemini": {
+        "label": "Google Gemini",
+        "env_key": "GOOGLE_API_KEY",
+        "model": "gemini-2.5-flash",
+        "concurrency": int(os.getenv("EASYRESEARCH_GEMINI_CONCURRENCY", "8")),
+        "create": _create_gemini,
+    },
+    "local": {
+        "label": "Local LLM",
+        "env_key": None,  # no key needed; a user key is forwarded to the server if given
+        "model": LOCAL_MODEL,
+        # llama.cpp in-process runs one generation at a time
+        "concurrency": 1 if LOCAL_MODEL_PATH else int(os.getenv("EASYRESEARCH_LOCAL_CONCURRENCY", "2")),
+        "context_length": LOCAL_CONTEXT_LENGTH,
+        "create": _create_local,
+    },
+}
+
+_clients = OrderedDict()  # (provider, model, key hash, params) -> PooledChatModel
+_http = {}
+_semaphores = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+def _http_clients(provider):
+    """Shared (sync, async) httpx clients of a provider, or (None, None) without httpx."""
+    with _lock:
+        if provider not in _http:
+            try:
+                import httpx
+                limits = httpx.Limits(max_keepalive_connections=LLM_KEEPALIVE_CONNECTIONS, keepalive_expiry=60)
+                _http[provider] = (
+                    httpx.Client(limits=limits, timeout=LLM_TIMEOUT_S),
+                    httpx.AsyncClient(limits=limits, timeout=LLM_TIMEOUT_S),
+                )
+            except ImportError:
+                _http[provider] = (None, None)
+        return _http[provider]
+
+
+def _provider_stats(provider):
+    return _stats.setdefault(provider, {"calls": 0, "in_flight": 0, "rate_limited": 0, "retries": 0, "clients_created": 0})
+
+
+# ---------------------------------------------------------
+# Concurrency limits and 429 retry
+# ---------------------------------------------------------
+
+def _semaphore(provider):
+    with _lock:
+        if provider not in _semaphores:
+            _semaphores[provider] = threading.BoundedSemaphore(PROVIDERS[provider]["concurrency"])
+        return _semaphores[provider]
+
+
+def _enter(provider):
+    with _lock:
+        stats = _provider_stats(provider)
+        stats["calls"] += 1
+        stats["in_flight"] += 1
+
+
+def _leave(provider):
+    with _lock:
+        _provider_stats(provider)["in_flight"] -= 1
+
+
+@contextmanager
+def _slot(provider):
+    semaphore = _semaphore(provider)
+    semaphore.acquire()
+    _enter(provider)
+    try:
+        yield
+    finally:
+        _leave(provider)
+        semaphore.release()
+
+
+@asynccontextmanager
+async def _aslot(provider):
+    # Poll instead of blocking a thread; a cancelled waiter never holds a slot
+    semaphore = _semaphore(provider)
+    while not semaphore.acquire(blocking=False):
+        await asyncio.sleep(0.005)
+    _enter(provider)
+    try:
+        yield
+    finally:
+        _leave(provider)
+        semaphore.release()
+
+
+def _is_rate_limited(error):
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status == 429 or getattr(getattr(error, "response", None), "status_code", None) == 429:
+        return True
+    name = type(error).__name__
+    return name in ("RateLimitError", "ResourceExhausted", "TooManyRequests") or "429" in str(error)[:200]
+
+
+def _retry_delay(error, attempt):
+    """Retry-After if the server sent one, else full-jitter exponential backoff."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return min(LLM_RETRY_MAX_S, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return random.uniform(0, min(LLM_RETRY_MAX_S, LLM_RETRY_BASE_S * 2 ** attempt))
+
+
+def _should_retry(provider, error, attempt):
+    if not _is_rate_limited(error):
+        return None
+    with _lock:
+        stats = _provider_stats(provider)
+        stats["rate_limited"] += 1
+        if attempt + 1 >= LLM_RETRY_ATTEMPTS:
+            return None
+        stats["retries"] += 1
+    delay = _retry_delay(error, attempt)
+    print(f"⏳ {PROVIDERS[provider]['label']} rate limited, retrying in {delay:.2f}s")
+    return delay
+
+
+class PooledChatModel(Runnable):
+    """A shared chat model behind its provider's concurrency limit and 429 retry."""
+
+    def __init__(self, provider, model, llm):
+        self.provider = provider
+        self.model = model
+        self.llm = llm
+
+    @property
+    def InputType(self):
+        return self.llm.InputType
+
+    @property
+    def OutputType(self):
+        return self.llm.OutputType
+
+    def invoke(self, input, config=None, **kwargs):
+        with _slot(self.provider):
+            for attempt in range(LLM_RETRY_ATTEMPTS):
+                try:
+                    return self.llm.invoke(input, config, **kwargs)
+                except Exception as e:
+                    delay = _should_retry(self.provider, e, attempt)
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        async with _aslot(self.provider):
+            for attempt in range(LLM_RETRY_ATTEMPTS):
+                try:
+                    return await self.llm.ainvoke(input, config, **kwargs)
+                except Exception as e:
+                    delay = _should_retry(self.provider, e, attempt)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+
+    def stream(self, input, config=None, **kwargs):
+        # Only a stream that failed before its first token is retried
+        with _slot(self.provider):
+            for attempt in range(LLM_RETRY_ATTEMPTS):
+                started = False
+                try:
+                    for chunk in self.llm.stream(input, config, **kwargs):
+                        started = True
+                        yield chunk
+                    return
+                except Exception as e:
+                    delay = None if started else _should_retry(self.provider, e, attempt)
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+
+    async def astream(self, input, config=None, **kwargs):
+        async with _aslot(self.provider):
+            for attempt in range(LLM_RETRY_ATTEMPTS):
+                started = False
+                try:
+                    async for chunk in self.llm.astream(input, config, **kwargs):
+                        started = True
+                        yield chunk
+                    return
+                except Exception as e:
+                    delay = None if started else _should_retry(self.provider, e, attempt)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+
+
+# ---------------------------------------------------------
+# Public API
+# ---------------------------------------------------------
+
+def get_llm(provider=DEFAULT_PROVIDER, api_key=None, model=None, **params):
+    """
+    Shared chat model for a provider. The user's key wins over the provider's
+    environment key. Returns (llm, error_message).
+    """
+    provider = provider if provider in PROVIDERS else DEFAULT_PROVIDER
+    spec = PROVIDERS[provider]
+    if not (api_key and api_key.strip()):
+        api_key = os.getenv(spec["env_key"]) if spec["env_key"] else None
+    if spec["env_key"] and not api_key:
+        return None, f"❌ Error: Missing {spec['label']} API Key."
+
+    model = model or spec["model"]
+    key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    cache_key = (provider, model, key_hash, tuple(sorted(params.items())))
+    with _lock:
+        llm = _clients.get(cache_key)
+        if llm is not None:
+            _clients.move_to_end(cache_key)
+            return llm, None
+
+    try:
+        llm = PooledChatModel(provider, model, spec["create"](model, api_key, params))
+    except Exception as e:
+        return None, f"Error initializing {spec['label']}: {str(e)}"
+    with _lock:
+        llm = _clients.setdefault(cache_key, llm)
+        _clients.move_to_end(cache_key)
+        _provider_stats(provider)["clients_created"] += 1
+        while len(_clients) > LLM_POOL_MAX_CLIENTS:
+            _clients.popitem(last=False)
+    return llm, None
+
+
+def context_budget(provider):
+    """Most context tokens a provider's window allows, or None if it has no small window."""
+    context_length = PROVIDERS.get(provider, {}).get("context_length")
+    if not context_length:
+        return None
+    return max(256, context_length - LOCAL_PROMPT_RESERVE)
+
+
+def describe_provider(provider):
+    """One-line description of where a provider's answers come from (for the UI)."""
+    if provider != "local":
+        return PROVIDERS.get(provider, PROVIDERS[DEFAULT_PROVIDER])["label"]
+    if LOCAL_MODEL_PATH:
+        return (f"llama.cpp in-process · {os.path.basename(LOCAL_MODEL_PATH)} "
+                f"(ctx {LOCAL_CONTEXT_LENGTH}, {LOCAL_THREADS} threads)")
+    return f"OpenAI-compatible server · {_base_url('local') or LOCAL_BASE_URL} ({LOCAL_MODEL})"
+
+
+def pool_stats():
+    """Per-provider call counters, pooled clients and concurrency limits."""
+    with _lock:
+        stats = {}
+        for provider, spec in PROVIDERS.items():
+            counts = dict(_provider_stats(provider))
+            counts["clients"] = sum(1 for key in _clients if key[0] == provider)
+            counts["concurrency"] = spec["concurrency"]
+            stats[provider] = counts
+        return stats
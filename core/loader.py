@@ -1,5 +1,6 @@
 import hashlib
 import os
+from core.manifest import file_content_hash, text_hash
 from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter, Language
 
@@ -40,13 +41,26 @@ def get_splitting_strategy(file_path):
         return 2000, 400, 200, 50, ["\n\n", "\n", " ", ""]
 
 
-def load_and_split_document(file_path, use_parent_retrieval=True):
+def _content_id(seen, scope, content_hash):
+    """Stable id from scope + content hash; repeats of the same content in one scope get an occurrence suffix."""
+    occurrence = seen.get(content_hash, 0)
+    seen[content_hash] = occurrence + 1
+    return hashlib.sha256(f"{scope}\0{content_hash}\0{occurrence}".encode()).hexdigest()
+
+
+def load_and_split_document(file_path, use_parent_retrieval=True, progress_callback=None):
     """
     Load and split document with Parent Document Retrieval support.
+    progress_callback (optional) is called as progress_callback(pages_parsed=n).
     
     When use_parent_retrieval=True:
     - Creates small chunks (child) for precise search
-    - Stores parent content in metadata for broader AI context
+    - Links each child to its parent via `parent_id`; the parent content is
+      carried in `parent_content` only until add_to_vector_db moves it into
+      the parent docstore (it is never persisted in ChromaDB)
+
+    Chunk and parent ids are content-addressed (file name + content hash), so
+    unchanged content keeps its id across re-uploads and edits.
     """
     ext = os.path.splitext(file_path)[1].lower()
     if ext == ".pdf":
@@ -62,6 +76,9 @@ def load_and_split_document(file_path, use_parent_retrieval=True):
     
     docs = loader.load()
     filename = os.path.basename(file_path)
+    file_info = {"file_hash": file_content_hash(file_path), "file_size": os.path.getsize(file_path)}
+    if progress_callback:
+        progress_callback(pages_parsed=len(docs))
 
     parent_size, child_size, parent_overlap, child_overlap, separators = get_splitting_strategy(file_path)
     
@@ -76,12 +93,13 @@ def load_and_split_document(file_path, use_parent_retrieval=True):
         )
         splits = splitter.split_documents(docs)
         
+        seen = {}
         for i, split in enumerate(splits):
             split.metadata["source"] = filename
             split.metadata["chunk_index"] = i
-            split.metadata["parent_content"] = split.page_content
-            unique_string = f"{filename}_{i}"
-            split.id = hashlib.sha256(unique_string.encode()).hexdigest()
+            split.metadata["content_hash"] = text_hash(split.page_content)
+            split.metadata.update(file_info)
+            split.id = _content_id(seen, filename, split.metadata["content_hash"])
         
         return splits
 
@@ -102,9 +120,12 @@ def load_and_split_document(file_path, use_parent_retrieval=True):
     )
     
     all_child_chunks = []
+    seen_parents = {}
     
     for parent_idx, parent_doc in enumerate(parent_docs):
         parent_content = parent_doc.page_content
+        parent_id = _content_id(seen_parents, filename, text_hash(parent_content))
+        seen_children = {}
         
         from langchain_core.documents import Document
         temp_doc = Document(page_content=parent_content, metadata=parent_doc.metadata.copy())
@@ -116,13 +137,15 @@ def load_and_split_document(file_path, use_parent_retrieval=True):
             child_chunk.metadata["child_index"] = child_idx
             child_chunk.metadata["chunk_index"] = len(all_child_chunks)
             
-            # Store parent content for retrieval
+            # Link to parent (content is moved to the docstore on ingest)
+            child_chunk.metadata["parent_id"] = parent_id
             child_chunk.metadata["parent_content"] = parent_content
             child_chunk.metadata["parent_page"] = parent_doc.metadata.get("page", 0)
+            child_chunk.metadata["content_hash"] = text_hash(child_chunk.page_content)
+            child_chunk.metadata.update(file_info)
             
-            # Unique ID for child
-            unique_string = f"{filename}_p{parent_idx}_c{child_idx}"
-            child_chunk.id = hashlib.sha256(unique_string.encode()).hexdigest()
+            # Content-addressed ID for child (stable while its parent is unchanged)
+            child_chunk.id = _content_id(seen_children, parent_id, child_chunk.metadata["content_hash"])
             
             all_child_chunks.append(child_chunk)
     
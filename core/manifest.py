@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import hashlib
+from core.storage import SQLiteStore
+
+# =============================================================================
+# PER-NOTEBOOK FILE MANIFEST
+# =============================================================================
+# One row per (collection, source file): size, content hash and the ids of the
+# chunks it produced. Lets re-ingestion skip unchanged files, embed only new
+# chunks and delete orphaned ones. It doubles as the notebook's source index
+# (chunk count, text bytes, ingest time), so file lists and per-file deletes
+# never scan the Chroma collection.
+MANIFEST_PATH = "database/manifest.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    collection   TEXT NOT NULL,
+    source       TEXT NOT NULL,
+    path         TEXT,
+    size         INTEGER NOT NULL DEFAULT 0,
+    content_hash TEXT,
+    chunk_ids    TEXT NOT NULL DEFAULT '[]',
+    chunk_count  INTEGER,
+    text_bytes   INTEGER,
+    ingested_at  REAL NOT NULL,
+    PRIMARY KEY (collection, source)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_files_hash ON files (collection, content_hash);
+"""
+
+_FIELDS = ["collection", "source", "path", "size", "content_hash", "chunk_ids",
+           "chunk_count", "text_bytes", "ingested_at"]
+_SOURCE_FIELDS = ["source", "size", "chunk_count", "text_bytes", "ingested_at"]
+
+# Manifests written before the source index existed get the columns as NULL
+_store = SQLiteStore(MANIFEST_PATH, _SCHEMA, columns={
+    "files": [("chunk_count", "INTEGER"), ("text_bytes", "INTEGER")]
+})
+
+
+def file_content_hash(file_path):
+    """SHA-256 of a file's bytes (streamed)."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_hash(text):
+    """SHA-256 of a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _entry(row):
+    entry = dict(zip(_FIELDS, row))
+    entry["chunk_ids"] = json.loads(entry["chunk_ids"])
+    return entry
+
+
+def get_file_entry(collection_name, source_name):
+    """Manifest entry for a file as a dict, or None."""
+    rows = _store.query(
+        f"SELECT {', '.join(_FIELDS)} FROM files WHERE collection = ? AND source = ?",
+        (collection_name, source_name)
+    )
+    return _entry(rows[0]) if rows else None
+
+
+def list_file_entries(collection_name):
+    """All manifest entries of a collection."""
+    rows = _store.query(
+        f"SELECT {', '.join(_FIELDS)} FROM files WHERE collection = ? ORDER BY source",
+        (collection_name,)
+    )
+    return [_entry(row) for row in rows]
+
+
+def list_sources(collection_name):
+    """Source index of a collection: one small dict per file (no chunk ids), by name."""
+    rows = _store.query(
+        f"SELECT {', '.join(_SOURCE_FIELDS)} FROM files WHERE collection = ? ORDER BY source",
+        (collection_name,)
+    )
+    return [dict(zip(_SOURCE_FIELDS, row)) for row in rows]
+
+
+def source_totals(collection_name):
+    """Aggregate counters of a collection's source index: files, chunks and text bytes."""
+    rows = _store.query(
+        "SELECT COUNT(*), COALESCE(SUM(chunk_count), 0), COALESCE(SUM(text_bytes), 0) "
+        "FROM files WHERE collection = ?",
+        (collection_name,)
+    )
+    files, chunks, text_bytes = rows[0]
+    return {"files": files, "chunks": chunks, "text_bytes": text_bytes}
+
+
+def needs_source_index(collection_name):
+    """True if the collection has no manifest rows or rows written before the source index."""
+    rows = _store.query(
+        "SELECT COUNT(*), SUM(chunk_count IS NULL) FROM files WHERE collection = ?", (collection_name,)
+    )
+    count, legacy = rows[0]
+    return count == 0 or bool(legacy)
+
+
+def upsert_file_entry(collection_name, source_name, chunk_ids, content_hash=None, size=0, path=None,
+                      text_bytes=0):
+    chunk_ids = list(chunk_ids)
+    _store.execute(
+        "INSERT OR REPLACE INTO files "
+        "(collection, source, path, size, content_hash, chunk_ids, chunk_count, text_bytes, ingested_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (collection_name, source_name, path, size, content_hash, json.dumps(chunk_ids),
+         len(chunk_ids), text_bytes, time.time())
+    )
+
+
+def rebuild_source_index(collection, collection_name, page_size=1000):
+    """
+    Backfill the source index of a notebook ingested before it existed, paging
+    through the collection once. Hashes and sizes of existing entries are kept.
+    Returns the number of sources indexed.
+    """
+    sources = {}
+    for offset in range(0, collection.count(), page_size):
+        page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+        for chunk_id, text, meta in zip(page["ids"], page["documents"], page["metadatas"]):
+            source = (meta or {}).get("source")
+            if source is None:
+                continue
+            entry = sources.setdefault(source, {"chunk_ids": [], "text_bytes": 0})
+            entry["chunk_ids"].append(chunk_id)
+            entry["text_bytes"] += len((text or "").encode("utf-8"))
+
+    existing = {entry["source"]: entry for entry in list_file_entries(collection_name)}
+    now = time.time()
+    rows = []
+    for source, entry in sources.items():
+        old = existing.get(source, {})
+        rows.append((
+            collection_name, source, old.get("path"), old.get("size") or 0, old.get("content_hash"),
+            json.dumps(entry["chunk_ids"]), len(entry["chunk_ids"]), entry["text_bytes"],
+            old.get("ingested_at") or now
+        ))
+    with _store.transaction() as conn:
+        conn.execute("DELETE FROM files WHERE collection = ?", (collection_name,))
+        conn.executemany(
+            "INSERT INTO files "
+            "(collection, source, path, size, content_hash, chunk_ids, chunk_count, text_bytes, ingested_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+    print(f"🗂️ Indexed {len(rows)} sources of '{collection_name}'")
+    return len(rows)
+
+
+def delete_file_entry(collection_name, source_name):
+    return _store.execute(
+        "DELETE FROM files WHERE collection = ? AND source = ?", (collection_name, source_name)
+    )
+
+
+def drop_collection_manifest(collection_name):
+    return _store.execute("DELETE FROM files WHERE collection = ?", (collection_name,))
+
+
+def is_file_unchanged(collection_name, file_path):
+    """True if this exact file (same name, size and content hash) is already ingested."""
+    entry = get_file_entry(collection_name, os.path.basename(file_path))
+    if not entry or not entry["chunk_ids"]:
+        return False
+    if entry["size"] != os.path.getsize(file_path):
+        return False
+    return entry["content_hash"] == file_content_hash(file_path)
@@ -0,0 +1,140 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from core.embedder import get_device
+from core.batching import MicroBatcher, MICROBATCH_ENABLED
+
+# =============================================================================
+# CROSS-ENCODER RERANKER
+# =============================================================================
+# One shared CrossEncoder per backend, loaded lazily (sentence-transformers
+# pulls in torch). Pairs are truncated to RERANK_MAX_LENGTH tokens and scored in
+# RERANK_BATCH_SIZE batches; scores are cached per (query, chunk) so repeated
+# questions and overlapping candidate sets skip the forward pass.
+#
+# Backends:
+#   "torch" - fp32 (or the GPU when available)
+#   "int8"  - torch dynamic int8 quantization of the Linear layers (CPU)
+#   "onnx"  - ONNX Runtime via sentence-transformers (needs `optimum[onnxruntime]`)
+RERANKER_MODEL_NAME = 'cross-encoder/ms-marco-MiniLM-L-6-v2'
+RERANK_BACKENDS = ("torch", "int8", "onnx")
+RERANK_BACKEND = os.getenv("EASYRESEARCH_RERANK_BACKEND", "torch")
+RERANK_MAX_LENGTH = int(os.getenv("EASYRESEARCH_RERANK_MAX_LENGTH", "256"))
+RERANK_BATCH_SIZE = int(os.getenv("EASYRESEARCH_RERANK_BATCH_SIZE", "32"))
+RERANK_CACHE_SIZE = int(os.getenv("EASYRESEARCH_RERANK_CACHE_SIZE", "4096"))
+# When no more than k candidates were retrieved, all of them reach the LLM anyway
+RERANK_SKIP_BELOW_K = os.getenv("EASYRESEARCH_RERANK_SKIP_BELOW_K", "1") == "1"
+
+_models = {}
+_model_lock = threading.Lock()
+_batchers = {}
+_fallbacks = {}  # requested backend -> backend actually serving it
+_score_cache = OrderedDict()  # (backend, query hash, chunk key) -> score
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _load_model(backend):
+    from sentence_transformers import CrossEncoder
+    if backend == "onnx":
+        return CrossEncoder(RERANKER_MODEL_NAME, device="cpu", max_length=RERANK_MAX_LENGTH, backend="onnx")
+    if backend == "int8":
+        import torch
+        model = CrossEncoder(RERANKER_MODEL_NAME, device="cpu", max_length=RERANK_MAX_LENGTH)
+        model.model = torch.quantization.quantize_dynamic(model.model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+    return CrossEncoder(RERANKER_MODEL_NAME, device=get_device(), max_length=RERANK_MAX_LENGTH)
+
+
+def get_reranker(backend=None):
+    """Return the shared CrossEncoder for a backend, loading it on first use (thread-safe)."""
+    backend = backend or RERANK_BACKEND
+    if backend not in _models:
+        with _model_lock:
+            if backend not in _models:
+                start = time.perf_counter()
+                try:
+                    model = _load_model(backend)
+                except Exception as e:
+                    if backend == "torch":
+                        raise
+                    print(f"⚠️ Reranker backend '{backend}' unavailable ({e}), falling back to torch")
+                    # Still holding _model_lock: load torch directly instead of re-entering
+                    if "torch" not in _models:
+                        _models["torch"] = _load_model("torch")
+                    model = _models["torch"]
+                    _fallbacks[backend] = "torch"
+                _models[backend] = model
+                print(f"🧩 Reranker ({backend}) loaded in {time.perf_counter() - start:.1f}s")
+    return _models[backend]
+
+
+def _predict(backend, pairs):
+    """Forward pass; with micro-batching on, concurrent queries share one batch."""
+    if not MICROBATCH_ENABLED:
+        return get_reranker(backend).predict(pairs, batch_size=RERANK_BATCH_SIZE, show_progress_bar=False)
+    if backend not in _batchers:
+        with _model_lock:
+            if backend not in _batchers:
+                _batchers[backend] = MicroBatcher(
+                    f"rerank-{backend}",
+                    lambda items: get_reranker(backend).predict(items, batch_size=RERANK_BATCH_SIZE, show_progress_bar=False)
+                )
+    return _batchers[backend].submit(pairs)
+
+
+def loaded_backend(backend=None):
+    """Backend actually serving `backend` (differs when it fell back to torch)."""
+    backend = backend or RERANK_BACKEND
+    return _fallbacks.get(backend, backend)
+
+
+def is_reranker_loaded():
+    return bool(_models)
+
+
+def _cache_key(backend, query_hash, chunk_id, text):
+    return backend, query_hash, chunk_id or hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def score(query, candidates, backend=None, use_cache=True):
+    """
+    Cross-encoder scores (logits) for (chunk_id, text) candidates, in order.
+    chunk_id may be None; the text hash is used as the cache key then.
+    """
+    backend = backend or RERANK_BACKEND
+    query_hash = hashlib.sha1(query.encode("utf-8")).hexdigest()
+    keys = [_cache_key(backend, query_hash, chunk_id, text) for chunk_id, text in candidates]
+
+    scores = [None] * len(candidates)
+    if use_cache:
+        with _cache_lock:
+            for i, key in enumerate(keys):
+                if key in _score_cache:
+                    _score_cache.move_to_end(key)
+                    scores[i] = _score_cache[key]
+    missing = [i for i, value in enumerate(scores) if value is None]
+
+    if missing:
+        pairs = [[query, candidates[i][1]] for i in missing]
+        computed = _predict(backend, pairs)
+        for i, value in zip(missing, computed):
+            scores[i] = float(value)
+        if use_cache:
+            with _cache_lock:
+                for i in missing:
+                    _score_cache[keys[i]] = scores[i]
+                while len(_score_cache) > RERANK_CACHE_SIZE:
+                    _score_cache.popitem(last=False)
+
+    with _cache_lock:
+        _stats["hits"] += len(candidates) - len(missing)
+        _stats["misses"] += len(missing)
+    return scores
+
+
+def cache_stats():
+    with _cache_lock:
+        return {**_stats, "entries": len(_score_cache), "backend": RERANK_BACKEND}
@@ -0,0 +1,101 @@
+import os
+import threading
+from core import manifest
+from core import answer_cache
+
+# =============================================================================
+# CACHED NOTEBOOK STATS
+# =============================================================================
+# The Streamlit sidebar reads notebook stats on every rerun. Values are memoized
+# with a cheap signature and recomputed only when it changes:
+#   counters (files / chunks / text bytes) - the collection version that every
+#       ingest/delete bumps (shared in SQLite, so other processes' writes count)
+#   directory sizes                         - the directory mtime plus the files
+#       Chroma rewrites on every write (chroma.sqlite3 and its WAL)
+#   notebook list                           - chroma.sqlite3 / WAL mtimes
+# Writers in this process call refresh_notebook() so the next render is warm.
+_cache = {}  # key -> (signature, value)
+_lock = threading.Lock()
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _cached(key, signature, compute):
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None and hit[0] == signature:
+            return hit[1]
+    value = compute()
+    with _lock:
+        _cache[key] = (signature, value)
+    return value
+
+
+def _chroma_signature(chroma_dir):
+    sqlite_path = os.path.join(chroma_dir, "chroma.sqlite3")
+    return _mtime(chroma_dir), _mtime(sqlite_path), _mtime(sqlite_path + "-wal")
+
+
+def directory_size(path, signature=()):
+    """Total size in bytes of a directory tree, walked only when its signature changes."""
+    def _walk():
+        total = 0
+        for dirpath, _, filenames in os.walk(path):
+            for name in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, name))
+                except OSError:
+                    pass  # removed while walking
+        return total
+    return _cached(("size", path), (_mtime(path), *signature), _walk)
+
+
+def chroma_size(chroma_dir):
+    """Size of the whole Chroma directory."""
+    return directory_size(chroma_dir, _chroma_signature(chroma_dir))
+
+
+def collection_size(collection_name, path):
+    """Size of one collection's segment directory."""
+    return directory_size(path, (answer_cache.get_collection_version(collection_name),))
+
+
+def notebook_counters(collection_name):
+    """{"files", "chunks", "text_bytes"} of a notebook from its source index."""
+    return dict(_cached(
+        ("counters", collection_name),
+        answer_cache.get_collection_version(collection_name),
+        lambda: manifest.source_totals(collection_name)
+    ))
+
+
+def notebook_names(chroma_dir, list_names):
+    """Collection names, re-listed through list_names() only when Chroma's files change."""
+    return list(_cached(("notebooks", chroma_dir), _chroma_signature(chroma_dir), list_names))
+
+
+def refresh_notebook(collection_name):
+    """Drop a notebook's cached values after a write and recompute its counters."""
+    with _lock:
+        for key in [k for k in _cache if k[0] == "notebooks" or k[1] == collection_name]:
+            del _cache[key]
+    notebook_counters(collection_name)
+
+
+def forget_notebook(collection_name, path=None):
+    """Drop everything cached for a deleted notebook."""
+    with _lock:
+        for key in [k for k in _cache if k[0] == "notebooks" or k[1] in (collection_name, path)]:
+            del _cache[key]
+
+
+def source_index(collection_name, load):
+    """A notebook's per-file source index, reloaded through load() when the notebook changes."""
+    return list(_cached(
+        ("sources", collection_name), answer_cache.get_collection_version(collection_name), load
+    ))
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """
+    Small thread-safe wrapper around a single SQLite file.
+
+    The connection is opened lazily on first use (so importing a module that
+    declares a store never touches the disk) and every statement runs under a
+    lock, which makes one store safe to share across Streamlit reruns and the
+    FastAPI worker pool.
+
+    `columns` maps a table to (name, declaration) pairs added to databases
+    created before those columns existed. `migrate(conn)` runs once per
+    connection after the schema, for upgrades that need more than a column;
+    it must check the database's state itself and be a no-op once applied.
+    """
+
+    def __init__(self, path, schema, columns=None, migrate=None):
+        self.path = path
+        self.schema = schema
+        self.columns = columns or {}
+        self.migrate = migrate
+        self._conn = None
+        self._lock = threading.RLock()
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.schema)
+            for table, columns in self.columns.items():
+                existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                for name, declaration in columns:
+                    if name not in existing:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {declaration}")
+            if self.migrate is not None:
+                self.migrate(conn)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def execute(self, sql, params=()):
+        """Run a single write statement and commit."""
+        with self._lock:
+            conn = self._connect()
+            cur = conn.execute(sql, params)
+            conn.commit()
+            return cur.rowcount
+
+    def executemany(self, sql, rows):
+        """Run a write statement for many rows in one transaction."""
+        with self._lock:
+            conn = self._connect()
+            cur = conn.executemany(sql, rows)
+            conn.commit()
+            return cur.rowcount
+
+    def query(self, sql, params=()):
+        """Run a read statement and return all rows."""
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def transaction(self):
+        """Context manager yielding the raw connection inside a locked transaction."""
+        return _Transaction(self)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class _Transaction:
+    def __init__(self, store):
+        self.store = store
+
+    def __enter__(self):
+        self.store._lock.acquire()
+        try:
+            return self.store._connect()
+        except Exception:
+            self.store._lock.release()
+            raise
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.store._conn.commit()
+            else:
+                self.store._conn.rollback()
+        finally:
+            self.store._lock.release()
+        return False
+
+
+def chunked(items, size=500):
+    """Yield successive slices of `items` (keeps SQL `IN (...)` lists under SQLite's limit)."""
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
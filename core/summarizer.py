@@ -1,41 +1,266 @@
 import os
-from langchain_groq import ChatGroq
-from langchain_google_genai import ChatGoogleGenerativeAI
+import time
+import hashlib
 from langchain_core.prompts import ChatPromptTemplate
+from core import llm_pool
+from core import manifest
+from core.storage import SQLiteStore
+from core.docstore import get_parents
+from core.context_builder import count_tokens, truncate_tokens
 
-def generate_notebook_summary(chunks, api_key=None, llm_provider="groq"):
-    """Generate a summary of notebook content from initial chunks."""
-    sample_context = "\n\n".join([chunk.page_content for chunk in chunks[:10]])
-
-    if llm_provider == "gemini":
-        final_api_key = api_key if api_key else os.getenv("GOOGLE_API_KEY")
-        if not final_api_key:
-            return "⚠️ Missing Google Gemini API Key for summarization."
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash",
-            temperature=0.2,
-            google_api_key=final_api_key
+# =============================================================================
+# MAP-REDUCE NOTEBOOK SUMMARY
+# =============================================================================
+# Every file is summarized from all of its parent chunks: parents are packed
+# into batches of at most SUMMARY_BATCH_TOKENS, the batches are summarized in
+# parallel (map), and the partial summaries are merged the same way until one
+# is left per file (reduce). File summaries are cached by content hash, so
+# adding a file only summarizes that file before the final notebook overview.
+# The LLM calls of all files in a round go out as one batch, bounded by
+# SUMMARY_CONCURRENCY (and the provider's limit in core/llm_pool.py).
+SUMMARY_DB_PATH = "database/summaries.db"
+SUMMARY_BATCH_TOKENS = int(os.getenv("EASYRESEARCH_SUMMARY_BATCH_TOKENS", "3000"))
+SUMMARY_CONCURRENCY = int(os.getenv("EASYRESEARCH_SUMMARY_CONCURRENCY", "4"))
+SUMMARY_SEPARATOR = "\n\n---\n\n"
+# Summary calls use their own model and no output cap where the provider allows
+# (other providers get the chat model's defaults from core/llm_pool.py)
+SUMMARY_LLM_OPTIONS = {
+    "groq": {"max_tokens": None},
+    "gemini": {"model": "gemini-2.0-flash", "max_output_tokens": None},
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS summary_cache (
+    collection TEXT NOT NULL,
+    source     TEXT NOT NULL,
+    provider   TEXT NOT NULL,
+    model      TEXT NOT NULL,
+    signature  TEXT NOT NULL,
+    summary    TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (collection, source, provider, model)
+) WITHOUT ROWID;
+"""
+
+
+def _migrate_provider_keyed_cache(conn):
+    """
+    Move summaries cached before the model was part of the key (table
+    file_summaries) into summary_cache. They were written with each provider's
+    default chat model. Runs only while the old table exists.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'file_summaries'"
+    ).fetchone()
+    if not exists:
+        return
+    for provider, spec in llm_pool.PROVIDERS.items():
+        conn.execute(
+            "INSERT OR IGNORE INTO summary_cache (collection, source, provider, model, signature, summary, created_at) "
+            "SELECT collection, source, provider, ?, signature, summary, created_at FROM file_summaries "
+            "WHERE provider = ?",
+            (spec["model"], provider)
         )
-    else:
-        final_api_key = api_key if api_key else os.getenv("GROQ_API_KEY")
-        if not final_api_key:
-            return "⚠️ Missing API Key for summarization."
-        llm = ChatGroq(
-            model="llama-3.3-70b-versatile",
-            temperature=0.2,
-            api_key=final_api_key
+    conn.execute("DROP TABLE file_summaries")
+
+
+_store = SQLiteStore(SUMMARY_DB_PATH, _SCHEMA, migrate=_migrate_provider_keyed_cache)
+
+map_prompt = ChatPromptTemplate.from_messages([
+    ("system", "You are an expert research assistant. Summarize the key points, findings and terminology of the "
+               "following excerpts from one document in a few dense paragraphs. "
+               "Answer in the language of the text (Vietnamese or English)."),
+    ("human", "Excerpts:\n{context}")
+])
+
+reduce_prompt = ChatPromptTemplate.from_messages([
+    ("system", "You are an expert research assistant. Merge the following partial summaries of consecutive parts "
+               "of a document into one summary. Keep every distinct point, drop repetition. "
+               "Answer in the language of the text (Vietnamese or English)."),
+    ("human", "Partial summaries:\n{context}")
+])
+
+overview_prompt = ChatPromptTemplate.from_messages([
+    ("system", "You are an expert research assistant. Summarize the following document summaries into a concise overview. "
+               "Focus on: Main Topic, Key Objectives, and Target Audience. "
+               "Answer in the language of the text (Vietnamese or English)."),
+    ("human", "Context to summarize:\n{context}")
+])
+
+
+# ---------------------------------------------------------
+# Per-file summary cache
+# ---------------------------------------------------------
+
+def _file_signature(collection_name, source):
+    entry = manifest.get_file_entry(collection_name, source)
+    if entry is None:
+        return None
+    if entry["content_hash"]:
+        return entry["content_hash"]
+    return hashlib.sha256("\n".join(sorted(entry["chunk_ids"])).encode("utf-8")).hexdigest()
+
+
+def _cached_summaries(collection_name, provider, model):
+    rows = _store.query(
+        "SELECT source, signature, summary FROM summary_cache WHERE collection = ? AND provider = ? AND model = ?",
+        (collection_name, provider, model)
+    )
+    return {source: (signature, summary) for source, signature, summary in rows}
+
+
+def _store_summaries(collection_name, provider, model, summaries):
+    now = time.time()
+    _store.executemany(
+        "INSERT OR REPLACE INTO summary_cache (collection, source, provider, model, signature, summary, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(collection_name, source, provider, model, signature, summary, now)
+         for source, (signature, summary) in summaries.items()]
+    )
+
+
+def _prune_summaries(collection_name, sources):
+    """Forget cached summaries of files no longer in the notebook."""
+    keep = set(sources)
+    rows = _store.query("SELECT DISTINCT source FROM summary_cache WHERE collection = ?", (collection_name,))
+    stale = [(collection_name, row[0]) for row in rows if row[0] not in keep]
+    if stale:
+        _store.executemany("DELETE FROM summary_cache WHERE collection = ? AND source = ?", stale)
+
+
+def drop_notebook_summaries(collection_name):
+    return _store.execute("DELETE FROM summary_cache WHERE collection = ?", (collection_name,))
+
+
+# ---------------------------------------------------------
+# Map-reduce
+# ---------------------------------------------------------
+
+def _file_texts(collection_name, source):
+    """A file's parent chunks in document order (child texts for notebooks without parents)."""
+    from core.embedder import get_chunks_by_source
+    chunks = get_chunks_by_source(collection_name, [source])
+    chunks.sort(key=lambda c: (c.metadata.get("parent_index", 0), c.metadata.get("start_index", 0)))
+    order, fallback = [], {}
+    for chunk in chunks:
+        key = chunk.metadata.get("parent_id") or chunk.page_content
+        if key not in fallback:
+            order.append(key)
+            fallback[key] = chunk.metadata.get("parent_content") or chunk.page_content
+    parents = get_parents(collection_name, [c.metadata.get("parent_id") for c in chunks])
+    return [parents.get(key) or fallback[key] for key in order]
+
+
+def _token_batches(texts, budget):
+    """
+    Pack texts into consecutive batches of at most `budget` tokens. Every batch
+    holds at least two texts (so each reduce round makes progress); a single
+    text is cut to half the budget to keep such pairs within it.
+    """
+    batches, current, used = [], [], 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if tokens > budget // 2:
+            text = truncate_tokens(text, budget // 2)
+            tokens = count_tokens(text)
+        if current and used + tokens > budget and len(current) >= 2:
+            batches.append(current)
+            current, used = [], 0
+        current.append(text)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _summarize_rounds(llm, texts_by_key, budget, first_prompt):
+    """
+    Map-reduce several documents at once: each round sends the batches of every
+    unfinished document as one bounded-concurrency LLM batch. Returns key -> summary;
+    a document whose call failed is left out (the others still finish).
+    """
+    done, failed = {}, set()
+    level = dict(texts_by_key)
+    prompt = first_prompt
+    first_round = True
+    while level:
+        jobs = []
+        for key, texts in level.items():
+            if not first_round and len(texts) == 1:
+                done[key] = texts[0]
+                continue
+            jobs.extend((key, batch) for batch in _token_batches(texts, budget))
+        if not jobs:
+            break
+        outputs = (prompt | llm).batch(
+            [{"context": SUMMARY_SEPARATOR.join(batch)} for _, batch in jobs],
+            config={"max_concurrency": SUMMARY_CONCURRENCY},
+            return_exceptions=True
         )
+        level = {}
+        for (key, _), output in zip(jobs, outputs):
+            if isinstance(output, Exception):
+                if key not in failed:
+                    print(f"⚠️ Summary of '{key}' failed: {output}")
+                failed.add(key)
+                continue
+            level.setdefault(key, []).append(output.content.strip())
+        level = {key: texts for key, texts in level.items() if key not in failed}
+        prompt = reduce_prompt
+        first_round = False
+    return done
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are an expert research assistant. Summarize the following document snippets into a concise overview. "
-                   "Focus on: Main Topic, Key Objectives, and Target Audience. "
-                   "Answer in the language of the text (Vietnamese or English)."),
-        ("human", "Context to summarize:\n{context}")
-    ])
+
+def summarize_notebook(collection_name, api_key=None, llm_provider="groq"):
+    """Summary of a whole notebook, built from cached per-file map-reduce summaries."""
+    from core.embedder import get_source_index
+    llm, error = llm_pool.get_llm(llm_provider, api_key, **SUMMARY_LLM_OPTIONS.get(llm_provider, {}))
+    if error:
+        return error
+    budget = min(SUMMARY_BATCH_TOKENS, llm_pool.context_budget(llm_provider) or SUMMARY_BATCH_TOKENS)
 
     try:
-        messages = prompt.format_messages(context=sample_context)
-        response = llm.invoke(messages)
-        return response.content.strip()
+        start = time.perf_counter()
+        sources = [entry["source"] for entry in get_source_index(collection_name)]
+        if not sources:
+            return "⚠️ Nothing to summarize yet."
+        _prune_summaries(collection_name, sources)
+        cached = _cached_summaries(collection_name, llm.provider, llm.model)
+
+        file_summaries, pending, signatures = {}, {}, {}
+        for source in sources:
+            signatures[source] = _file_signature(collection_name, source)
+            hit = cached.get(source)
+            if hit and signatures[source] and hit[0] == signatures[source]:
+                file_summaries[source] = hit[1]
+            else:
+                texts = _file_texts(collection_name, source)
+                if texts:
+                    pending[source] = texts
+
+        fresh = {}
+        if pending:
+            fresh = _summarize_rounds(llm, pending, budget, map_prompt)
+            file_summaries.update(fresh)
+            _store_summaries(collection_name, llm.provider, llm.model, {
+                source: (signatures[source], summary) for source, summary in fresh.items() if signatures[source]
+            })
+        print(f"📝 Summarized {len(pending)} of {len(sources)} files of '{collection_name}' "
+              f"({len(sources) - len(pending)} cached, {len(pending) - len(fresh)} failed)")
+
+        # Reduce file summaries until they fit one overview call
+        labelled = [f"[{source}]\n{file_summaries[source]}" for source in sources if source in file_summaries]
+        if not labelled:
+            return "❌ Summary error: no file could be summarized"
+        if len(labelled) > 1 and sum(count_tokens(text) for text in labelled) > budget:
+            merged = _summarize_rounds(llm, {"notebook": labelled}, budget, reduce_prompt)
+            if "notebook" not in merged:
+                return "❌ Summary error: merging file summaries failed (file summaries are cached, try again)"
+            labelled = [merged["notebook"]]
+
+        messages = overview_prompt.format_messages(context=SUMMARY_SEPARATOR.join(labelled))
+        summary = llm.invoke(messages).content.strip()
+        print(f"📝 Notebook summary of '{collection_name}' in {time.perf_counter() - start:.1f}s")
+        return summary
     except Exception as e:
-        return f"❌ Summary error: {str(e)}"
\ No newline at end of file
+        return f"❌ Summary error: {str(e)}"
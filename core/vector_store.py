@@ -0,0 +1,540 @@
+import os
+import json
+import shutil
+import threading
+import numpy as np
+from core.storage import SQLiteStore, chunked
+from core import compact_vectors
+
+# =============================================================================
+# PER-NOTEBOOK VECTOR INDEX BACKENDS
+# =============================================================================
+# Chroma stays the record store of every notebook (texts, metadata, float32
+# vectors). A VectorStore decides where the notebook's vector *search* is
+# served from and keeps that index in sync with ingestion and deletes:
+#   "chroma"  - Chroma's own HNSW index (default)
+#   compact   - a float16 / int8 / binary copy (see core.compact_vectors)
+#   "flat"    - exact search over a memory-mapped float32 matrix
+#   "hnsw"    - hnswlib graph with tunable M / ef_construction / ef (needs `hnswlib`)
+# Switch a notebook (the index is built from the vectors already in Chroma):
+#   python -m core.vector_store --collection my_notebook --backend hnsw --ef 128
+VECTOR_INDEX_DIR = "database/vector_index"
+VECTOR_INDEX_DB_PATH = "database/vector_index.db"
+LOCAL_BACKENDS = ("flat", "hnsw")
+HNSW_DEFAULTS = {"M": 16, "ef_construction": 200, "ef": 64}
+# Deleted rows are compacted out of the flat file once they exceed this share
+FLAT_COMPACT_RATIO = 0.25
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS backends (
+    collection TEXT PRIMARY KEY,
+    backend    TEXT NOT NULL,
+    params     TEXT NOT NULL DEFAULT '{}',
+    dim        INTEGER,
+    version    INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS rows (
+    collection TEXT NOT NULL,
+    row        INTEGER NOT NULL,
+    chunk_id   TEXT NOT NULL,
+    source     TEXT,
+    deleted    INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (collection, row)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_rows_chunk ON rows (collection, chunk_id);
+CREATE INDEX IF NOT EXISTS idx_rows_source ON rows (collection, source);
+"""
+
+_store = SQLiteStore(VECTOR_INDEX_DB_PATH, _SCHEMA)
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+class VectorStore:
+    """Vector index of one notebook. Records (texts, metadata) always come from Chroma."""
+
+    backend = None
+
+    def __init__(self, collection_name):
+        self.collection_name = collection_name
+
+    def _collection(self):
+        from core.embedder import get_collection
+        return get_collection(self.collection_name)
+
+    def add(self, ids, sources, embeddings):
+        """Index freshly written chunks (already upserted into Chroma)."""
+
+    def delete(self, ids):
+        """Remove chunks from the index."""
+
+    def delete_by_source(self, source_name):
+        """Remove every chunk of a source file from the index."""
+
+    def search(self, vector, k):
+        """Top-k Documents for a query embedding, best first."""
+        raise NotImplementedError
+
+    def get_by_ids(self, ids):
+        """Documents for chunk ids, in the order given (missing ids are skipped)."""
+        from langchain_core.documents import Document
+        collection = self._collection()
+        if collection is None or not ids:
+            return []
+        result = collection.get(ids=list(ids), include=["documents", "metadatas"])
+        by_id = {
+            doc_id: Document(id=doc_id, page_content=text, metadata=meta or {})
+            for doc_id, text, meta in zip(result["ids"], result["documents"], result["metadatas"])
+        }
+        return [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+
+    def get_embeddings(self, ids):
+        """(found_ids, vectors): float vectors of chunks from Chroma, in the order given (missing ids are skipped)."""
+        collection = self._collection()
+        if collection is None or not ids:
+            return [], []
+        result = collection.get(ids=list(ids), include=["embeddings"])
+        by_id = dict(zip(result["ids"], result["embeddings"]))
+        found = [chunk_id for chunk_id in ids if chunk_id in by_id]
+        return found, [by_id[chunk_id] for chunk_id in found]
+
+    def stats(self):
+        collection = self._collection()
+        return {"backend": self.backend, "vectors": collection.count() if collection else 0}
+
+    def drop(self):
+        """Forget the index (the Chroma collection itself is deleted by the caller)."""
+
+    def _ranked_docs(self, hits):
+        docs = {doc.id: doc for doc in self.get_by_ids([chunk_id for chunk_id, _ in hits])}
+        ranked = []
+        for chunk_id, score in hits:
+            if chunk_id in docs:
+                docs[chunk_id].metadata["vector_score"] = score
+                ranked.append(docs[chunk_id])
+        return ranked
+
+
+class ChromaVectorStore(VectorStore):
+    """Search through Chroma's own index (nothing extra to maintain)."""
+
+    backend = "chroma"
+
+    def search(self, vector, k):
+        from core.embedder import get_vector_db
+        return get_vector_db(self.collection_name).similarity_search_by_vector(vector, k=k)
+
+
+class CompactVectorStore(VectorStore):
+    """Search a quantized copy; see core.compact_vectors."""
+
+    backend = "compact"
+
+    def add(self, ids, sources, embeddings):
+        compact_vectors.add_vectors(self.collection_name, ids, sources, embeddings)
+
+    def delete(self, ids):
+        compact_vectors.delete_vectors(self.collection_name, ids)
+
+    def delete_by_source(self, source_name):
+        compact_vectors.delete_source(self.collection_name, source_name)
+
+    def search(self, vector, k):
+        hits = compact_vectors.search(self.collection_name, vector, k, rescore=self.get_embeddings) or []
+        return self._ranked_docs(hits)
+
+    def stats(self):
+        return {"backend": self.backend, **compact_vectors.memory_stats(self.collection_name)}
+
+    def drop(self):
+        compact_vectors.drop_collection(self.collection_name)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Shared bookkeeping for on-disk indexes: row numbers, chunk ids and sources
+    live in SQLite; a version counter tells every process when to reload.
+    """
+
+    def __init__(self, collection_name, params):
+        super().__init__(collection_name)
+        self.params = params
+        self.dir = os.path.join(VECTOR_INDEX_DIR, _dirname(collection_name))
+        self._lock = threading.RLock()
+        self._loaded_version = None
+        self._row_ids = {}  # row -> chunk_id (live rows only)
+
+    def _version(self):
+        rows = _store.query("SELECT version, dim FROM backends WHERE collection = ?", (self.collection_name,))
+        return rows[0] if rows else (None, None)
+
+    def _bump(self, dim=None):
+        """Announce a change to other processes. Returns the new (version, dim)."""
+        if dim is not None:
+            _store.execute(
+                "UPDATE backends SET version = version + 1, dim = ? WHERE collection = ?", (dim, self.collection_name)
+            )
+        else:
+            _store.execute("UPDATE backends SET version = version + 1 WHERE collection = ?", (self.collection_name,))
+        return self._version()
+
+    def _allocate_rows(self, conn, ids, sources):
+        """
+        Claim the next row numbers for ids. Takes SQLite's write lock first, so
+        no other process can read the same MAX(row) before this commits.
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT MAX(row) FROM rows WHERE collection = ?", (self.collection_name,)).fetchone()
+        start = row[0] + 1 if row and row[0] is not None else 0
+        rows = list(range(start, start + len(ids)))
+        conn.executemany(
+            "INSERT INTO rows (collection, row, chunk_id, source) VALUES (?, ?, ?, ?)",
+            [(self.collection_name, row, chunk_id, source) for row, chunk_id, source in zip(rows, ids, sources)]
+        )
+        return rows
+
+    def _rows_for_ids(self, ids):
+        found = []
+        for batch in chunked(list(ids)):
+            placeholders = ",".join("?" * len(batch))
+            found.extend(row for (row,) in _store.query(
+                f"SELECT row FROM rows WHERE collection = ? AND deleted = 0 AND chunk_id IN ({placeholders})",
+                [self.collection_name, *batch]
+            ))
+        return found
+
+    def _mark_deleted(self, rows):
+        with _store.transaction() as conn:
+            for batch in chunked(rows):
+                placeholders = ",".join("?" * len(batch))
+                conn.execute(
+                    f"UPDATE rows SET deleted = 1 WHERE collection = ? AND row IN ({placeholders})",
+                    [self.collection_name, *batch]
+                )
+
+    def _refresh(self):
+        """Reload the index if another process changed it. Returns the current dim."""
+        version, dim = self._version()
+        if version != self._loaded_version:
+            self._reload_rows()
+            self._load(dim)
+            self._loaded_version = version
+        return dim
+
+    def _reload_rows(self):
+        self._row_ids = dict(_store.query(
+            "SELECT row, chunk_id FROM rows WHERE collection = ? AND deleted = 0", (self.collection_name,)
+        ))
+
+    def _written(self, version_dim):
+        """Our own change is already applied in memory: adopt the new version without a reload."""
+        self._loaded_version = version_dim[0]
+        self._after_write(version_dim[1])
+
+    def _remove_rows(self, rows):
+        self._mark_deleted(rows)
+        for row in rows:
+            self._row_ids.pop(row, None)
+        self._drop_rows(rows)
+
+    def add(self, ids, sources, embeddings):
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            self._refresh()
+            # Upserted chunks replace their previous row
+            replaced = self._rows_for_ids(ids)
+            if replaced:
+                self._remove_rows(replaced)
+            # The index file is appended under the same lock, so its row order matches
+            with _store.transaction() as conn:
+                rows = self._allocate_rows(conn, ids, sources)
+                self._append(rows, vectors)
+            self._row_ids.update(zip(rows, ids))
+            self._written(self._bump(dim=vectors.shape[1]))
+
+    def delete(self, ids):
+        with self._lock:
+            self._refresh()
+            rows = self._rows_for_ids(ids)
+            if rows:
+                self._remove_rows(rows)
+                self._written(self._bump())
+
+    def delete_by_source(self, source_name):
+        with self._lock:
+            self._refresh()
+            rows = [row for (row,) in _store.query(
+                "SELECT row FROM rows WHERE collection = ? AND source = ? AND deleted = 0",
+                (self.collection_name, source_name)
+            )]
+            if rows:
+                self._remove_rows(rows)
+                self._written(self._bump())
+
+    def search(self, vector, k):
+        with self._lock:
+            if self._refresh() is None or not self._row_ids:
+                return []
+            hits = self._search_rows(np.asarray(vector, dtype=np.float32), k)
+            hits = [(self._row_ids[row], score) for row, score in hits if row in self._row_ids]
+        return self._ranked_docs(hits)
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            size = sum(
+                os.path.getsize(os.path.join(self.dir, name)) for name in os.listdir(self.dir)
+            ) if os.path.isdir(self.dir) else 0
+            return {"backend": self.backend, "params": self.params, "vectors": len(self._row_ids), "bytes": size}
+
+    def drop(self):
+        with self._lock:
+            _store.execute("DELETE FROM rows WHERE collection = ?", (self.collection_name,))
+            shutil.rmtree(self.dir, ignore_errors=True)
+            self._loaded_version = None
+            self._row_ids = {}
+
+    # Backend-specific hooks
+    def _load(self, dim):
+        raise NotImplementedError
+
+    def _append(self, rows, vectors):
+        raise NotImplementedError
+
+    def _drop_rows(self, rows):
+        raise NotImplementedError
+
+    def _after_write(self, dim):
+        pass
+
+    def _search_rows(self, query, k):
+        raise NotImplementedError
+
+
+class FlatVectorStore(LocalVectorStore):
+    """Exact inner-product search over an append-only float32 file, memory-mapped."""
+
+    backend = "flat"
+
+    def __init__(self, collection_name, params):
+        super().__init__(collection_name, params)
+        self.path = os.path.join(self.dir, "vectors.f32")
+        self._matrix = None
+        self._live = None
+
+    def _load(self, dim):
+        self._matrix, self._live = None, None
+        if not dim or not os.path.exists(self.path):
+            return
+        count = os.path.getsize(self.path) // (4 * dim)
+        if count:
+            self._matrix = np.memmap(self.path, dtype=np.float32, mode="r", shape=(count, dim))
+            self._live = np.zeros(count, dtype=bool)
+            self._live[[row for row in self._row_ids if row < count]] = True
+
+    def _append(self, rows, vectors):
+        # Rows are file positions: pad if compaction ever left a gap
+        os.makedirs(self.dir, exist_ok=True)
+        self._matrix = None  # release the map before growing the file
+        existing = os.path.getsize(self.path) // (4 * vectors.shape[1]) if os.path.exists(self.path) else 0
+        with open(self.path, "ab") as f:
+            if rows[0] > existing:
+                f.write(np.zeros((rows[0] - existing, vectors.shape[1]), dtype=np.float32).tobytes())
+            f.write(vectors.tobytes())
+
+    def _drop_rows(self, rows):
+        total = _store.query("SELECT COUNT(*), SUM(deleted) FROM rows WHERE collection = ?", (self.collection_name,))[0]
+        if total[0] and (total[1] or 0) / total[0] > FLAT_COMPACT_RATIO:
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the file without deleted rows and renumber the live ones."""
+        _, dim = self._version()
+        live = _store.query(
+            "SELECT row, chunk_id, source FROM rows WHERE collection = ? AND deleted = 0 ORDER BY row",
+            (self.collection_name,)
+        )
+        count = os.path.getsize(self.path) // (4 * dim) if dim and os.path.exists(self.path) else 0
+        matrix = np.memmap(self.path, dtype=np.float32, mode="r", shape=(count, dim)) if count else None
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for batch in chunked(live, 4096):
+                f.write(np.asarray(matrix[[row for row, _, _ in batch]], dtype=np.float32).tobytes())
+        del matrix
+        self._matrix = None
+        os.replace(tmp_path, self.path)
+        with _store.transaction() as conn:
+            conn.execute("DELETE FROM rows WHERE collection = ?", (self.collection_name,))
+            conn.executemany(
+                "INSERT INTO rows (collection, row, chunk_id, source) VALUES (?, ?, ?, ?)",
+                [(self.collection_name, i, chunk_id, source) for i, (_, chunk_id, source) in enumerate(live)]
+            )
+        self._reload_rows()
+        print(f"🧹 Compacted flat index of '{self.collection_name}' to {len(live)} rows")
+
+    def _after_write(self, dim):
+        self._load(dim)  # re-map: the file grew or was compacted
+
+    def _search_rows(self, query, k):
+        from core.fusion import top_k
+        if self._matrix is None:
+            return []
+        scores = np.asarray(self._matrix @ query, dtype=np.float32)
+        scores[~self._live] = -np.inf
+        k = min(k, int(self._live.sum()))
+        return [(int(row), float(scores[row])) for row in top_k(scores, k)]
+
+
+class HnswVectorStore(LocalVectorStore):
+    """Approximate search with hnswlib (inner product on normalized vectors)."""
+
+    backend = "hnsw"
+
+    def __init__(self, collection_name, params):
+        super().__init__(collection_name, {**HNSW_DEFAULTS, **params})
+        self.path = os.path.join(self.dir, "index.bin")
+        self._index = None
+
+    def _new_index(self, dim, capacity):
+        import hnswlib
+        index = hnswlib.Index(space="ip", dim=dim)
+        index.init_index(
+            max_elements=capacity, M=self.params["M"],
+            ef_construction=self.params["ef_construction"], allow_replace_deleted=False
+        )
+        index.set_ef(self.params["ef"])
+        return index
+
+    def _load(self, dim):
+        self._index = None
+        if not dim or not os.path.exists(self.path):
+            return
+        import hnswlib
+        index = hnswlib.Index(space="ip", dim=dim)
+        index.load_index(self.path)
+        index.set_ef(self.params["ef"])
+        self._index = index
+
+    def _save(self):
+        os.makedirs(self.dir, exist_ok=True)
+        self._index.save_index(self.path)
+
+    def _append(self, rows, vectors):
+        if self._index is None:
+            self._index = self._new_index(vectors.shape[1], max(1024, 2 * len(rows)))
+        needed = self._index.get_current_count() + len(rows)
+        if needed > self._index.get_max_elements():
+            self._index.resize_index(max(needed, 2 * self._index.get_max_elements()))
+        self._index.add_items(vectors, np.asarray(rows, dtype=np.int64))
+        self._save()
+
+    def _drop_rows(self, rows):
+        if self._index is not None:
+            for row in rows:
+                try:
+                    self._index.mark_deleted(row)
+                except RuntimeError:
+                    pass  # already deleted
+            self._save()
+
+    def _search_rows(self, query, k):
+        if self._index is None:
+            return []
+        k = min(k, len(self._row_ids))
+        labels, distances = self._index.knn_query(query, k=k)
+        # "ip" distance is 1 - inner product
+        return [(int(row), 1.0 - float(distance)) for row, distance in zip(labels[0], distances[0])]
+
+
+def _dirname(collection_name):
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in collection_name)
+
+
+def get_backend(collection_name):
+    """(backend, params) of a notebook; compact notebooks report their mode."""
+    rows = _store.query("SELECT backend, params FROM backends WHERE collection = ?", (collection_name,))
+    if rows:
+        return rows[0][0], json.loads(rows[0][1])
+    mode = compact_vectors.get_vector_mode(collection_name)
+    return (mode, {}) if mode else ("chroma", {})
+
+
+def get_vector_store(collection_name):
+    """The VectorStore serving a notebook's searches (shared per process)."""
+    backend, params = get_backend(collection_name)
+    key = (backend, json.dumps(params, sort_keys=True))
+    with _instances_lock:
+        cached = _instances.get(collection_name)
+        if cached is None or cached[0] != key:
+            store_class = _store_class(backend)
+            if issubclass(store_class, LocalVectorStore):
+                store = store_class(collection_name, params)
+            else:
+                store = store_class(collection_name)
+            _instances[collection_name] = (key, store)
+        return _instances[collection_name][1]
+
+
+def _store_class(backend):
+    if backend == "flat":
+        return FlatVectorStore
+    if backend == "hnsw":
+        return HnswVectorStore
+    if backend in compact_vectors.VECTOR_MODES:
+        return CompactVectorStore
+    return ChromaVectorStore
+
+
+def drop_vector_store(collection_name):
+    """Forget every index of a notebook (on notebook deletion)."""
+    get_vector_store(collection_name).drop()
+    compact_vectors.drop_collection(collection_name)
+    _store.execute("DELETE FROM backends WHERE collection = ?", (collection_name,))
+    with _instances_lock:
+        _instances.pop(collection_name, None)
+
+
+def set_backend(collection_name, backend, page_size=1000, **params):
+    """
+    Serve a notebook's searches from another backend ("chroma", a compact mode,
+    "flat" or "hnsw"), building the new index from the vectors stored in Chroma.
+    """
+    drop_vector_store(collection_name)
+    if backend == "chroma":
+        print(f"📦 '{collection_name}' now searched through Chroma")
+        return get_vector_store(collection_name)
+    if backend in compact_vectors.VECTOR_MODES:
+        compact_vectors.migrate_collection(collection_name, backend, page_size=page_size)
+        return get_vector_store(collection_name)
+    if backend not in LOCAL_BACKENDS:
+        raise ValueError(f"Unknown vector backend: {backend}")
+
+    from core.embedder import get_collection
+    collection = get_collection(collection_name)
+    if collection is None:
+        raise ValueError(f"Notebook '{collection_name}' does not exist")
+    _store.execute(
+        "INSERT INTO backends (collection, backend, params) VALUES (?, ?, ?)",
+        (collection_name, backend, json.dumps(params))
+    )
+    store = get_vector_store(collection_name)
+    for offset in range(0, collection.count(), page_size):
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings", "metadatas"])
+        store.add(page["ids"], [(meta or {}).get("source") for meta in page["metadatas"]], page["embeddings"])
+    print(f"📦 Built {backend} index for '{collection_name}': {store.stats()}")
+    return store
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Choose the vector index backend of a notebook.")
+    parser.add_argument("--collection", required=True)
+    parser.add_argument("--backend", required=True, choices=["chroma", *compact_vectors.VECTOR_MODES, *LOCAL_BACKENDS])
+    parser.add_argument("--M", type=int, help="hnsw: graph degree")
+    parser.add_argument("--ef-construction", type=int, help="hnsw: build-time candidate list size")
+    parser.add_argument("--ef", type=int, help="hnsw: query-time candidate list size")
+    args = parser.parse_args()
+    hnsw_params = {"M": args.M, "ef_construction": args.ef_construction, "ef": args.ef}
+    set_backend(args.collection, args.backend, **{name: value for name, value in hnsw_params.items() if value})
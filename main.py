@@ -1,16 +1,40 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
-import shutil
 import os
+import json
+import threading
+import time
 
-from core.generator import query_rag_system
+# Import-time budget: core modules load models lazily, so importing them
+# should stay well under this (seconds). Override with EASYRESEARCH_IMPORT_BUDGET.
+IMPORT_TIME_BUDGET_S = float(os.getenv("EASYRESEARCH_IMPORT_BUDGET", "3.0"))
+_import_start = time.perf_counter()
+
+from core.generator import aquery_rag_system, astream_rag_system, warmup_models
+from core.reranker import is_reranker_loaded
 from core.loader import load_and_split_document
-from core.embedder import add_to_vector_db
+from core.embedder import add_to_vector_db, is_embedding_model_loaded
+from core.concurrency import run_cpu, run_io
+from core.embedding_cache import cache_stats as embedding_cache_stats
+from core.answer_cache import cache_stats as answer_cache_stats
+from core.reranker import cache_stats as rerank_cache_stats
+from core.batching import batcher_stats
+from core.llm_pool import pool_stats as llm_pool_stats
+from core.manifest import is_file_unchanged, get_file_entry
+from core.jobs import submit_ingest_job, submit_batch_ingest_job, duplicate_filenames, get_job, list_jobs, new_upload_path, resume_pending_jobs
+
+CORE_IMPORT_TIME_S = round(time.perf_counter() - _import_start, 3)
+if CORE_IMPORT_TIME_S > IMPORT_TIME_BUDGET_S:
+    print(f"⚠️ Core import took {CORE_IMPORT_TIME_S}s (budget {IMPORT_TIME_BUDGET_S}s)")
+else:
+    print(f"⏱️ Core import took {CORE_IMPORT_TIME_S}s")
 
 app = FastAPI(title="EasyResearch API")
 
 UPLOAD_DIR = "uploads"
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
 if not os.path.exists(UPLOAD_DIR):
     os.makedirs(UPLOAD_DIR)
 
@@ -24,48 +48,149 @@ class QueryRequest(BaseModel):
     chat_history: Optional[List[ChatMessage]] = None
     k_target: int = 10
     api_key: Optional[str] = None
+    llm_provider: str = "groq"  # "groq" | "gemini" | "local" (offline, see core/llm_pool.py)
+    crag_mode: Optional[str] = None  # "off" | "parallel" | "batch" (default: EASYRESEARCH_CRAG)
+    retrieval_mode: Optional[str] = None  # "standard" | "expanded" (default: EASYRESEARCH_RETRIEVAL)
+
+
+@app.on_event("startup")
+def start_model_warmup():
+    """Optional warm-up (EASYRESEARCH_WARMUP=1): load models in the background so
+    the server accepts requests (and health checks) immediately."""
+    if os.getenv("EASYRESEARCH_WARMUP", "0") == "1":
+        threading.Thread(target=warmup_models, name="model-warmup", daemon=True).start()
+
+
+@app.on_event("startup")
+def start_pending_jobs():
+    """Resume ingestion jobs interrupted by a previous shutdown."""
+    resume_pending_jobs()
+
+
+@app.get("/health")
+def health():
+    """Liveness check — never loads a model."""
+    return {
+        "status": "ok",
+        "core_import_time_s": CORE_IMPORT_TIME_S,
+        "import_budget_s": IMPORT_TIME_BUDGET_S,
+        "models_loaded": {
+            "embedding": is_embedding_model_loaded(),
+            "reranker": is_reranker_loaded()
+        },
+        "microbatching": batcher_stats(),
+        "llm_pool": llm_pool_stats()
+    }
+
+
+@app.get("/cache/embeddings")
+def read_embedding_cache_stats():
+    """Persistent embedding cache counters (hits, misses, evictions, entries)."""
+    return embedding_cache_stats()
+
+
+@app.get("/cache/answers")
+def read_answer_cache_stats():
+    """Answer cache counters (exact/semantic hits, misses, entries) for this process."""
+    return answer_cache_stats()
+
+
+@app.get("/cache/rerank")
+def read_rerank_cache_stats():
+    """Reranker score cache counters and the active backend."""
+    return rerank_cache_stats()
 
 
 # Endpoint 1: Question & Answer
 @app.post("/ask")
-def ask_question(request: QueryRequest):
+async def ask_question(request: QueryRequest):
     """Send a question and receive a RAG-powered answer."""
     try:
         history = None
         if request.chat_history:
             history = [{"role": msg.role, "content": msg.content} for msg in request.chat_history]
         
-        result = query_rag_system(
+        result = await aquery_rag_system(
             request.question, 
             request.collection_name,
             chat_history=history,
             k_target=request.k_target,
-            user_api_key=request.api_key
+            user_api_key=request.api_key,
+            llm_provider=request.llm_provider,
+            crag_mode=request.crag_mode,
+            retrieval_mode=request.retrieval_mode
         )
         return result
     except Exception as e:
         print(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Endpoint 1b: Question & Answer (Server-Sent Events)
+@app.post("/ask/stream")
+async def ask_question_stream(request: QueryRequest):
+    """Stream the answer as Server-Sent Events: one `metadata` event, then `token` events, then `done`."""
+    history = None
+    if request.chat_history:
+        history = [{"role": msg.role, "content": msg.content} for msg in request.chat_history]
+
+    async def event_stream():
+        try:
+            async for event in astream_rag_system(
+                request.question,
+                request.collection_name,
+                chat_history=history,
+                k_target=request.k_target,
+                user_api_key=request.api_key,
+                llm_provider=request.llm_provider,
+                crag_mode=request.crag_mode,
+                retrieval_mode=request.retrieval_mode
+            ):
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _save_upload(file: UploadFile, file_location: str):
+    """Stream the upload to disk in chunks (never blocks the event loop)."""
+    buffer = await run_io(open, file_location, "wb")
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await run_io(buffer.write, chunk)
+    finally:
+        await run_io(buffer.close)
+
 # Endpoint 2: Upload & Process File
 @app.post("/upload")
 async def upload_file(collection_name: str, file: UploadFile = File(...)):
     """Upload file -> Save -> Split (Loader) -> Vectorize (Embedder)"""
-    file_location = f"{UPLOAD_DIR}/{file.filename}"
+    file_location = f"{UPLOAD_DIR}/{os.path.basename(file.filename)}"
     
     try:
+        await _save_upload(file, file_location)
 
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
+        if await run_io(is_file_unchanged, collection_name, file_location):
+            await run_io(os.remove, file_location)
+            entry = await run_io(get_file_entry, collection_name, os.path.basename(file_location))
+            return {
+                "status": "unchanged",
+                "filename": file.filename,
+                "chunks_processed": 0,
+                "chunks_total": len(entry["chunk_ids"]),
+                "collection": collection_name
+            }
 
-        chunks = load_and_split_document(file_location)
-        
+        # Parsing/splitting and embedding are CPU-bound → bounded executor
+        chunks = await run_cpu(load_and_split_document, file_location)
 
-        add_to_vector_db(chunks, collection_name)
-        
+        await run_cpu(add_to_vector_db, chunks, collection_name)
 
-        os.remove(file_location)
+        await run_io(os.remove, file_location)
         
         return {
             "status": "success", 
@@ -78,4 +203,55 @@ async def upload_file(collection_name: str, file: UploadFile = File(...)):
         print(f"Upload error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Endpoint 3: Background ingestion jobs
+@app.post("/jobs", status_code=202)
+async def create_ingest_job(collection_name: str, file: UploadFile = File(...)):
+    """Save the file and queue it for ingestion. Returns immediately with a job id."""
+    try:
+        file_location = await run_io(new_upload_path, file.filename)
+        await _save_upload(file, file_location)
+        job_id = await run_io(submit_ingest_job, file_location, collection_name, file.filename)
+        return {"job_id": job_id, "status": "queued", "filename": file.filename, "collection": collection_name}
+    except Exception as e:
+        print(f"Job submit error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/jobs/batch", status_code=202)
+async def create_batch_ingest_job(collection_name: str, files: List[UploadFile] = File(...)):
+    """Queue many files as one parallel ingestion batch. Returns one job id per file."""
+    duplicates = duplicate_filenames([file.filename for file in files])
+    if duplicates:
+        raise HTTPException(status_code=400, detail=f"Duplicate file names in batch: {', '.join(duplicates)}")
+    try:
+        file_locations = []
+        for file in files:
+            file_location = await run_io(new_upload_path, file.filename)
+            await _save_upload(file, file_location)
+            file_locations.append(file_location)
+        job_ids = await run_io(submit_batch_ingest_job, file_locations, collection_name)
+        return {
+            "jobs": [{"job_id": job_id, "filename": file.filename} for job_id, file in zip(job_ids, files)],
+            "status": "queued",
+            "collection": collection_name
+        }
+    except Exception as e:
+        print(f"Batch submit error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/jobs/{job_id}")
+async def read_ingest_job(job_id: str):
+    """Job status and progress counters (pages parsed, chunks embedded, batches written)."""
+    job = await run_io(get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/jobs")
+async def read_ingest_jobs(collection_name: Optional[str] = None, limit: int = 50):
+    """Most recent ingestion jobs, optionally filtered by collection."""
+    return await run_io(list_jobs, collection_name, limit)
+
 # Run: uvicorn main:app --reload
\ No newline at end of file
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from core import answer_cache
+from core.storage import SQLiteStore
+
+VECTORS = {
+    "what is rag": [1.0, 0.0, 0.0],
+    "what is rag exactly": [0.99, 0.141, 0.0],
+    "how do i install it": [0.0, 0.0, 1.0],
+}
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(answer_cache, "_store", SQLiteStore(str(tmp_path / "answer_cache.db"), answer_cache._SCHEMA))
+    monkeypatch.setattr(answer_cache, "_entries", answer_cache.OrderedDict())
+    monkeypatch.setattr(answer_cache, "_stats", {"exact_hits": 0, "semantic_hits": 0, "misses": 0})
+    monkeypatch.setattr(answer_cache, "_embed", lambda question: VECTORS[answer_cache.normalize_question(question)])
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_SIMILARITY", 0.95)
+    return answer_cache
+
+
+def test_semantic_hit_picks_most_similar_entry(cache):
+    cache.store("nb", "What is RAG?", {"answer": "retrieval"})
+    cache.store("nb", "How do I install it?", {"answer": "pip"})
+    assert isinstance(cache._entries[next(iter(cache._entries))]["embedding"], np.ndarray)
+
+    result, kind = cache.lookup("nb", "What is RAG exactly?")
+    assert (result["answer"], kind) == ("retrieval", "semantic")
+    assert cache.cache_stats()["semantic_hits"] == 1
+
+
+def test_below_threshold_is_a_miss(cache, monkeypatch):
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_SIMILARITY", 0.999)
+    cache.store("nb", "What is RAG?", {"answer": "retrieval"})
+    assert cache.lookup("nb", "What is RAG exactly?") is None
+    assert cache.lookup("nb", "what is rag") == ({"answer": "retrieval"}, "exact")
+
+
+def test_version_bump_invalidates(cache):
+    cache.store("nb", "What is RAG?", {"answer": "retrieval"})
+    cache.bump_collection_version("nb")
+    assert cache.lookup("nb", "What is RAG?") is None
@@ -0,0 +1,53 @@
+import pytest
+from core import bm25_index
+from core.storage import SQLiteStore
+
+
+class FakeCollection:
+    """Chroma-style collection: get(limit, offset) pages over ids/documents/metadatas."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, limit=None, offset=0, include=None):
+        page = self.rows[offset:offset + limit]
+        return {
+            "ids": [row[0] for row in page],
+            "documents": [row[1] for row in page],
+            "metadatas": [{"source": row[2]} for row in page],
+        }
+
+
+@pytest.fixture
+def index(monkeypatch, tmp_path):
+    store = SQLiteStore(str(tmp_path / "bm25.db"), bm25_index._SCHEMA, columns=bm25_index._store.columns)
+    monkeypatch.setattr(bm25_index, "_store", store)
+    return bm25_index
+
+
+def test_rebuild_indexes_legacy_chunks(index):
+    legacy = [(f"old-{i}", f"legacy chunk {i} about transformers", "old.pdf") for i in range(5)]
+    collection = FakeCollection(legacy)
+
+    # A new file was ingested after the index existed; the old ones were not
+    index.index_chunks("nb", ["new-0"], ["fresh chunk about diffusion"], [{"source": "new.pdf"}])
+    collection.rows = legacy + [("new-0", "fresh chunk about diffusion", "new.pdf")]
+    assert not index.is_complete("nb")
+    assert index.score_query("nb", "transformers") == {}
+
+    assert index.rebuild_index(collection, "nb", page_size=2) == 6
+    assert index.is_complete("nb")
+    assert index.doc_count("nb") == 6
+    assert set(index.score_query("nb", "transformers")) == {f"old-{i}" for i in range(5)}
+    assert set(index.score_query("nb", "diffusion")) == {"new-0"}
+
+
+def test_drop_collection_clears_complete_flag(index):
+    index.index_chunks("nb", ["a"], ["alpha"], [{"source": "a.txt"}])
+    index.mark_complete("nb")
+    index.drop_collection("nb")
+    assert not index.is_complete("nb")
+    assert index.doc_count("nb") == 0
@@ -0,0 +1,48 @@
+import os
+import pytest
+from core import chat_store
+from core.storage import SQLiteStore
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    db = SQLiteStore(str(tmp_path / "chat.db"), chat_store._SCHEMA)
+    monkeypatch.setattr(chat_store, "_store", db)
+    monkeypatch.setattr(chat_store, "CHAT_DIR", str(tmp_path))
+    monkeypatch.setattr(chat_store, "_appends", {})
+    return db
+
+
+def _fill(n):
+    chat_store.append_messages("nb", [{"role": "user", "content": f"q{i}"} for i in range(n)])
+
+
+def test_history_is_kept_by_default(store):
+    assert chat_store.CHAT_MAX_MESSAGES == 0
+    _fill(30)
+    assert chat_store.trim("nb") == 0
+    assert len(chat_store.load_messages("nb", limit=100)) == 30
+
+
+def test_trim_keeps_newest_messages(store):
+    _fill(30)
+    assert chat_store.trim("nb", keep=10) == 20
+    assert [m["content"] for m in chat_store.load_messages("nb", limit=100)] == [f"q{i}" for i in range(20, 30)]
+
+
+def test_compact_checkpoints_without_deleting(store):
+    _fill(30)
+    assert os.path.getsize(store.path + "-wal") > 0
+    assert chat_store.compact(vacuum=True)
+    assert os.path.getsize(store.path + "-wal") == 0
+    assert len(chat_store.load_messages("nb", limit=100)) == 30
+
+
+def test_recent_questions_imports_legacy_history(store, tmp_path):
+    import json
+    with open(tmp_path / "nb.json", "w", encoding="utf-8") as f:
+        json.dump([{"role": "user", "content": "old question"}, {"role": "assistant", "content": "answer"}], f)
+
+    assert chat_store.recent_questions("nb") == ["old question"]
+    assert not (tmp_path / "nb.json").exists()
+    assert len(chat_store.load_messages("nb")) == 2
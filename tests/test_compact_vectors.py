@@ -0,0 +1,26 @@
+import numpy as np
+from core import compact_vectors
+
+
+def test_binary_rescore_skips_ids_without_vectors():
+    vectors = np.eye(4, dtype=np.float32)
+    ids = ["a", "b", "c", "d"]
+    codes, scales = compact_vectors.encode(vectors, "binary")
+    by_id = dict(zip(ids, vectors))
+
+    def rescore(candidate_ids):
+        # "a" was deleted from the record store but is still in the compact copy
+        found = [chunk_id for chunk_id in candidate_ids if chunk_id != "a"]
+        return found, [by_id[chunk_id] for chunk_id in found]
+
+    hits = compact_vectors.search_codes(ids, codes, scales, vectors[2], "binary", 2, rescore=rescore)
+    assert hits[0] == ("c", 1.0)
+    assert "a" not in [chunk_id for chunk_id, _ in hits]
+
+
+def test_binary_rescore_with_no_vectors_left():
+    vectors = np.eye(2, dtype=np.float32)
+    codes, scales = compact_vectors.encode(vectors, "binary")
+    hits = compact_vectors.search_codes(["a", "b"], codes, scales, vectors[0], "binary", 1,
+                                        rescore=lambda candidate_ids: ([], []))
+    assert hits == []
@@ -0,0 +1,33 @@
+import threading
+from core import embedder
+
+
+def test_collection_lookups_do_not_wait_on_model_load(monkeypatch):
+    loading, release = threading.Event(), threading.Event()
+
+    def slow_model():
+        loading.set()
+        release.wait(5)
+        return object()
+
+    monkeypatch.setattr(embedder, "get_embedding_model", slow_model)
+    monkeypatch.setattr(embedder, "_vector_dbs", {})
+    monkeypatch.setattr(embedder, "_collections", {"nb": "cached-collection"})
+
+    def _open_other():
+        try:
+            embedder.get_vector_db("other")
+        except ImportError:
+            pass  # langchain_chroma is not needed for this test
+
+    worker = threading.Thread(target=_open_other, daemon=True)
+    worker.start()
+    assert loading.wait(5)
+
+    looked_up = []
+    reader = threading.Thread(target=lambda: looked_up.append(embedder.get_collection("nb")), daemon=True)
+    reader.start()
+    reader.join(timeout=1)
+    release.set()
+    assert looked_up == ["cached-collection"], "get_collection blocked while the embedding model loaded"
+    worker.join(timeout=5)
@@ -0,0 +1,14 @@
+import numpy as np
+from core import fusion
+
+
+def test_reciprocal_rank_skips_candidates_missing_from_a_list():
+    signals = {
+        "first": np.array([0.0, -1.0, -np.inf]),
+        "second": np.array([-np.inf, 0.0, -1.0]),
+    }
+    fused = fusion.reciprocal_rank(signals)
+    k = fusion.RRF_K
+    np.testing.assert_allclose(fused, [1 / (k + 1), 1 / (k + 2) + 1 / (k + 1), 1 / (k + 2)])
+    assert list(fusion.top_k(fused, 2)) == [1, 0]
+
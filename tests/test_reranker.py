@@ -0,0 +1,44 @@
+import threading
+import pytest
+from core import reranker
+
+
+class FakeCrossEncoder:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def predict(self, pairs, **kwargs):
+        return [float(len(text)) for _, text in pairs]
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    def _load(backend):
+        if backend != "torch":
+            raise ImportError(f"{backend} runtime not installed")
+        return FakeCrossEncoder(backend)
+
+    monkeypatch.setattr(reranker, "_load_model", _load)
+    monkeypatch.setattr(reranker, "_models", {})
+    monkeypatch.setattr(reranker, "_fallbacks", {})
+    monkeypatch.setattr(reranker, "_batchers", {})
+    monkeypatch.setattr(reranker, "MICROBATCH_ENABLED", False)
+
+
+def test_unavailable_backend_falls_back_to_torch(fake_models):
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(model=reranker.get_reranker("onnx")), daemon=True)
+    worker.start()
+    worker.join(timeout=5)
+    assert not worker.is_alive(), "get_reranker deadlocked on the torch fallback"
+
+    assert result["model"].backend == "torch"
+    assert reranker.get_reranker("torch") is result["model"]
+    assert reranker.loaded_backend("onnx") == "torch"
+    assert reranker.loaded_backend("torch") == "torch"
+
+
+def test_score_uses_fallback_model(fake_models):
+    scores = reranker.score("q", [("a", "xx"), ("b", "xxxx")], backend="int8", use_cache=False)
+    assert scores == [2.0, 4.0]
+    assert reranker.loaded_backend("int8") == "torch"
@@ -0,0 +1,40 @@
+import sqlite3
+from core import llm_pool, summarizer
+from core.storage import SQLiteStore
+
+LEGACY_SCHEMA = """
+CREATE TABLE file_summaries (
+    collection TEXT NOT NULL,
+    source     TEXT NOT NULL,
+    provider   TEXT NOT NULL,
+    signature  TEXT NOT NULL,
+    summary    TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (collection, source, provider)
+) WITHOUT ROWID;
+"""
+
+
+def _open(path):
+    return SQLiteStore(path, summarizer._SCHEMA, migrate=summarizer._migrate_provider_keyed_cache)
+
+
+def test_provider_keyed_cache_is_migrated_once(tmp_path):
+    path = str(tmp_path / "summaries.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.execute("INSERT INTO file_summaries VALUES ('nb', 'a.pdf', 'gemini', 'h1', 'old summary', 1.0)")
+    conn.commit()
+    conn.close()
+
+    store = _open(path)
+    rows = store.query("SELECT provider, model, summary FROM summary_cache")
+    assert rows == [("gemini", llm_pool.PROVIDERS["gemini"]["model"], "old summary")]
+    assert not store.query("SELECT name FROM sqlite_master WHERE name = 'file_summaries'")
+    store.close()
+
+    # Later starts leave the migrated cache alone
+    store = _open(path)
+    store.execute("INSERT INTO summary_cache VALUES ('nb', 'b.pdf', 'groq', 'm', 'h2', 'new', 2.0)")
+    store.close()
+    assert len(_open(path).query("SELECT * FROM summary_cache")) == 2
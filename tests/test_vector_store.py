@@ -0,0 +1,202 @@
+import os
+import threading
+import numpy as np
+import pytest
+from core import compact_vectors, embedder, vector_store
+from core.storage import SQLiteStore
+
+DIM = 8
+BACKENDS = ["chroma", "int8", "binary", "flat", "hnsw"]
+INDEXED_BACKENDS = ["int8", "binary", "flat", "hnsw"]
+
+
+def unit(i):
+    vector = np.zeros(DIM, dtype=np.float32)
+    vector[i] = 1.0
+    return vector
+
+
+class FakeCollection:
+    """In-memory stand-in for the Chroma record store (ids, documents, metadatas, embeddings)."""
+
+    def __init__(self):
+        self.records = {}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        for chunk_id, embedding, text, meta in zip(ids, embeddings, documents, metadatas):
+            self.records[chunk_id] = (text, meta, [float(x) for x in embedding])
+
+    def delete(self, ids=None, where=None):
+        if where is not None:
+            ids = [i for i, (_, meta, _) in self.records.items() if meta.get("source") == where["source"]]
+        for chunk_id in ids or []:
+            self.records.pop(chunk_id, None)
+
+    def count(self):
+        return len(self.records)
+
+    def get(self, ids=None, limit=None, offset=0, include=(), where=None):
+        keys = [i for i in ids if i in self.records] if ids is not None else list(self.records)
+        if ids is None:
+            keys = keys[offset:offset + limit if limit else None]
+        return {
+            "ids": keys,
+            "documents": [self.records[i][0] for i in keys],
+            "metadatas": [self.records[i][1] for i in keys],
+            "embeddings": [self.records[i][2] for i in keys],
+        }
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    if request.param == "hnsw":
+        pytest.importorskip("hnswlib")
+    if request.param == "chroma":
+        pytest.importorskip("chromadb")
+        pytest.importorskip("langchain_chroma")
+    return request.param
+
+
+@pytest.fixture
+def records(backend, monkeypatch, tmp_path):
+    """The notebook's record store: real Chroma for the chroma backend, a fake for the others."""
+    monkeypatch.setattr(vector_store, "_store", SQLiteStore(str(tmp_path / "vector_index.db"), vector_store._SCHEMA))
+    monkeypatch.setattr(vector_store, "VECTOR_INDEX_DIR", str(tmp_path / "vector_index"))
+    monkeypatch.setattr(vector_store, "_instances", {})
+    monkeypatch.setattr(compact_vectors, "_store", SQLiteStore(str(tmp_path / "compact.db"), compact_vectors._SCHEMA))
+    monkeypatch.setattr(compact_vectors, "_matrices", {})
+
+    if backend == "chroma":
+        class FixedEmbeddings:
+            def embed_documents(self, texts):
+                return [unit(0).tolist() for _ in texts]
+
+            def embed_query(self, text):
+                return unit(0).tolist()
+
+        monkeypatch.setattr(embedder, "CHROMA_DIR", str(tmp_path / "chroma"))
+        monkeypatch.setattr(embedder, "_client", None)
+        monkeypatch.setattr(embedder, "_vector_dbs", {})
+        monkeypatch.setattr(embedder, "_collections", {})
+        monkeypatch.setattr(embedder, "get_embedding_model", lambda: FixedEmbeddings())
+        embedder.get_vector_db("nb")
+        return embedder.get_collection("nb")
+
+    collection = FakeCollection()
+    monkeypatch.setattr(embedder, "get_collection", lambda name: collection if name == "nb" else None)
+    return collection
+
+
+@pytest.fixture
+def store(backend, records):
+    return vector_store.set_backend("nb", backend)
+
+
+def write(store, records, chunks):
+    """Upsert chunks into the record store, then the index (what add_to_vector_db does)."""
+    ids = [chunk_id for chunk_id, _, _ in chunks]
+    vectors = [unit(i) for _, i, _ in chunks]
+    sources = [source for _, _, source in chunks]
+    records.upsert(ids=ids, embeddings=[v.tolist() for v in vectors], documents=[f"text {i}" for i in ids],
+                   metadatas=[{"source": source} for source in sources])
+    store.add(ids, sources, vectors)
+
+
+def remove(store, records, ids):
+    records.delete(ids=ids)
+    store.delete(ids)
+
+
+def hit_ids(store, i, k):
+    return [doc.id for doc in store.search(unit(i).tolist(), k)]
+
+
+def test_add_search_and_get_by_ids(store, records):
+    write(store, records, [("a", 0, "x.pdf"), ("b", 1, "x.pdf"), ("c", 2, "y.pdf"), ("d", 3, "y.pdf")])
+
+    for i, chunk_id in enumerate("abcd"):
+        assert hit_ids(store, i, 1) == [chunk_id]
+    assert sorted(hit_ids(store, 0, 10)) == ["a", "b", "c", "d"]
+    assert [doc.id for doc in store.get_by_ids(["d", "missing", "a"])] == ["d", "a"]
+
+
+def test_upsert_replaces_row(store, records):
+    write(store, records, [("a", 0, "x.pdf"), ("b", 1, "x.pdf"), ("c", 2, "x.pdf")])
+    write(store, records, [("a", 3, "x.pdf")])
+
+    assert hit_ids(store, 3, 1) == ["a"]
+    # "a"'s old vector is gone: a query near it now prefers "b"
+    near_old = unit(0) + 0.1 * unit(1)
+    hits = [doc.id for doc in store.search((near_old / np.linalg.norm(near_old)).tolist(), 10)]
+    assert sorted(hits) == ["a", "b", "c"]
+    assert hits[0] == "b"
+    assert store.stats()["vectors"] == 3
+
+
+def test_delete_and_delete_by_source(store, records):
+    write(store, records, [("a", 0, "x.pdf"), ("b", 1, "x.pdf"), ("c", 2, "y.pdf"), ("d", 3, "y.pdf")])
+
+    remove(store, records, ["a"])
+    assert sorted(hit_ids(store, 0, 10)) == ["b", "c", "d"]
+
+    records.delete(where={"source": "y.pdf"})
+    store.delete_by_source("y.pdf")
+    assert hit_ids(store, 2, 10) == ["b"]
+    assert store.stats()["vectors"] == 1
+
+
+@pytest.mark.parametrize("backend", ["flat"], indirect=True)
+def test_flat_compaction_renumbers_rows(store, records):
+    write(store, records, [(f"c{i}", i, "x.pdf") for i in range(DIM)])
+    remove(store, records, ["c1", "c3", "c5"])
+
+    rows = vector_store._store.query("SELECT row, chunk_id FROM rows WHERE collection = ? ORDER BY row", ("nb",))
+    assert rows == [(0, "c0"), (1, "c2"), (2, "c4"), (3, "c6"), (4, "c7")]
+    assert os.path.getsize(store.path) == 5 * DIM * 4
+    for i in (0, 2, 4, 6, 7):
+        assert hit_ids(store, i, 1) == [f"c{i}"]
+
+    # New rows continue after the compacted ones
+    write(store, records, [("c1", 1, "x.pdf")])
+    assert hit_ids(store, 1, 1) == ["c1"]
+    assert vector_store._store.query("SELECT MAX(row) FROM rows WHERE collection = ?", ("nb",)) == [(5,)]
+
+
+@pytest.mark.parametrize("backend", INDEXED_BACKENDS, indirect=True)
+def test_reload_after_version_bump_from_another_instance(backend, store, records):
+    write(store, records, [("a", 0, "x.pdf"), ("b", 1, "x.pdf")])
+    assert hit_ids(store, 1, 1) == ["b"]
+
+    # Another process writing to the same notebook: a separate instance over the same files
+    store_class = vector_store._store_class(backend)
+    if issubclass(store_class, vector_store.LocalVectorStore):
+        other = store_class("nb", dict(store.params))
+    else:
+        other = store_class("nb")
+    write(other, records, [("c", 2, "y.pdf")])
+    remove(other, records, ["a"])
+
+    assert hit_ids(store, 2, 1) == ["c"]
+    assert sorted(hit_ids(store, 0, 10)) == ["b", "c"]
+
+
+
+@pytest.mark.parametrize("backend", ["flat"], indirect=True)
+def test_row_allocation_waits_for_other_writer(store, records):
+    # A second process: its own connection to the same index database
+    other_db = SQLiteStore(vector_store._store.path, vector_store._SCHEMA)
+    allocated = {}
+
+    def _allocate_other():
+        with other_db.transaction() as conn:
+            allocated["other"] = store._allocate_rows(conn, ["y0", "y1"], ["y.pdf", "y.pdf"])
+
+    with vector_store._store.transaction() as conn:
+        allocated["first"] = store._allocate_rows(conn, ["x0", "x1"], ["x.pdf", "x.pdf"])
+        worker = threading.Thread(target=_allocate_other)
+        worker.start()
+        worker.join(timeout=0.5)
+        assert worker.is_alive(), "second writer read MAX(row) while the first was uncommitted"
+    worker.join(timeout=5)
+
+    assert allocated == {"first": [0, 1], "other": [2, 3]}